@@ -5,10 +5,12 @@ Admin endpoints - REST API for bus and trip management.
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, Field
 from typing import List
+from datetime import datetime, timezone
 
+from app.core.config import settings
 from app.core.dependencies import require_admin
 from app.db.session import AsyncSessionLocal
-from app.schemas.admin import BusCreate, BusResponse, TripCreate, TripResponse, ChargeWalletRequest
+from app.schemas.admin import BusCreate, BusResponse, TripCreate, TripResponse, ChargeWalletRequest, BulkRegisterRequest
 from app.services.admin_queries import (
     CHECK_BUS_PLATE,
     CREATE_BUS,
@@ -19,9 +21,16 @@ from app.services.admin_queries import (
     CREATE_SEAT,
     LIST_BUSES,
     GET_USER_BY_MOBILE,
-    CHARGE_WALLET,
-    GET_WALLET_BALANCE
+    LOCK_TRIP_FOR_CANCELLATION,
+    MARK_TRIP_CANCELLED,
+    CANCEL_TRIP_BOOKINGS
 )
+from app.services.auth_service import register_users_bulk
+from app.services.booking_cache import bump_user_bookings_versions
+from app.services.seat_inventory import load_trip_inventory, drop_trip_inventory
+from app.services.trip_events import trips_changed
+from app.services.waitlist import clear_waitlist
+from app.services.wallet_service import credit_wallet, get_wallet_balance
 
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
@@ -61,24 +70,70 @@ async def create_trip(trip: TripCreate, current_user=Depends(require_admin)):
             if trip.arrival_time <= trip.departure_time:
                 raise HTTPException(status_code=400, detail="Arrival time must be after departure time.")
 
+            capacity_result = await db.execute(GET_BUS_CAPACITY, {"bid": trip.bus_id})
+            capacity = capacity_result.scalar_one()
+
             result = await db.execute(CREATE_TRIP, {
                 "r": trip.route_id,
                 "b": trip.bus_id,
                 "d": trip.departure_time,
                 "a": trip.arrival_time,
-                "p": trip.price
+                "p": trip.price,
+                "seats": capacity
             })
             trip_id = result.scalar_one()
 
-            capacity_result = await db.execute(GET_BUS_CAPACITY, {"bid": trip.bus_id})
-            capacity = capacity_result.scalar_one()
-
             for seat_number in range(1, capacity + 1):
                 await db.execute(CREATE_SEAT, {"tid": trip_id, "sn": seat_number})
 
+        # Warm the seat bitmap so the first buyers don't pay for the load
+        if settings.SEAT_INVENTORY_ENABLED:
+            await load_trip_inventory(trip_id)
+        await trips_changed([trip_id])
+
         return TripResponse(id=trip_id, **trip.dict())
 
 
+# Cancel a whole trip and refund every passenger (Admin only)
+@router.post("/trip/{trip_id}/cancel")
+async def cancel_trip(trip_id: int, current_user=Depends(require_admin)):
+    """
+    Cancel a trip (e.g. bus breakdown): all bookings are cancelled, every
+    affected wallet is credited and all seats are released in one set-based
+    transaction, no matter how full the trip is.
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            trip_row = (await db.execute(LOCK_TRIP_FOR_CANCELLATION, {"tid": trip_id})).fetchone()
+            if not trip_row:
+                raise HTTPException(status_code=404, detail="Trip not found.")
+
+            if trip_row.cancelled_at is not None:
+                raise HTTPException(status_code=400, detail="This trip has already been cancelled.")
+
+            if trip_row.departure_time <= datetime.now(timezone.utc):
+                raise HTTPException(status_code=400, detail="A trip that has already departed cannot be cancelled.")
+
+            await db.execute(MARK_TRIP_CANCELLED, {"tid": trip_id})
+            counts = (await db.execute(CANCEL_TRIP_BOOKINGS, {"tid": trip_id})).fetchone()
+
+    # Rebuilt lazily with every seat taken, so buyers are turned away in Redis
+    if settings.SEAT_INVENTORY_ENABLED:
+        await drop_trip_inventory(trip_id)
+    await clear_waitlist(trip_id)
+    await trips_changed([trip_id])
+    await bump_user_bookings_versions(counts.user_ids or [])
+
+    return {
+        "message": f"Trip {trip_id} cancelled and all passengers refunded.",
+        "trip_id": trip_id,
+        "bookings_cancelled": counts.bookings_cancelled,
+        "wallets_credited": counts.wallets_credited,
+        "total_refunded": counts.total_refunded,
+        "seats_released": counts.seats_released
+    }
+
+
 # List all buses (Admin only)
 @router.get("/buses", response_model=List[BusResponse])
 async def list_buses(current_user=Depends(require_admin)):
@@ -112,15 +167,17 @@ async def charge_wallet(
 
             user_id = user[0]
 
-            await db.execute(CHARGE_WALLET, {
-                "amount": request.amount,
-                "uid": user_id
-            })
+            await credit_wallet(db, user_id, request.amount, "top_up", f"admin:{current_user.id}")
 
-            new_balance_result = await db.execute(GET_WALLET_BALANCE, {"uid": user_id})
-            new_balance = new_balance_result.scalar_one()
+            new_balance = await get_wallet_balance(db, user_id)
 
             return {
                 "message": f"Wallet for {request.mobile} successfully charged with {request.amount:,} IRR.",
                 "new_balance": new_balance
-            }
\ No newline at end of file
+            }
+
+
+@router.post("/users/bulk")
+async def bulk_register_users(request: BulkRegisterRequest, current_user=Depends(require_admin)):
+    """Onboard a partner's customer list; already registered mobiles are skipped."""
+    return await register_users_bulk(request.mobiles, request.role)
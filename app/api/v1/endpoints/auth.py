@@ -1,8 +1,9 @@
 # app/api/v1/endpoints/auth.py
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from app.core.dependencies import Principal, forget_token, get_current_user, oauth2_scheme
 from app.schemas.auth import RegisterRequest, LoginRequest, TokenResponse
-from app.services.auth_service import register_user, login_user
-from app.services.rate_limit import check_rate_limit
+from app.services.auth_service import register_user, login_user, revoke_token
+from app.services.rate_limit import RateLimit, enforce_rate_limits
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -15,20 +16,37 @@ def get_client_ip(request: Request) -> str:
 
 
 @router.post("/register", response_model=dict)
-async def register(request: RegisterRequest, req: Request):
+async def register(request: RegisterRequest, req: Request, response: Response):
     # Rate limit: 10 requests per minute per IP and phone
     ip = get_client_ip(req)
-    await check_rate_limit(f"register_ip:{ip}", limit=10, window_seconds=60)
-    await check_rate_limit(f"register_phone:{request.mobile}", limit=10, window_seconds=60)
-    
+    await enforce_rate_limits(
+        RateLimit(f"register_ip:{ip}", limit=10, window_seconds=60),
+        RateLimit(f"register_phone:{request.mobile}", limit=10, window_seconds=60),
+        response=response
+    )
+
     return await register_user(request.mobile, request.role)
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(request: LoginRequest, req: Request):
+async def login(request: LoginRequest, req: Request, response: Response):
     # Rate limit: 10 requests per minute per IP and phone
     ip = get_client_ip(req)
-    await check_rate_limit(f"login_ip:{ip}", limit=10, window_seconds=60)
-    await check_rate_limit(f"login_phone:{request.mobile}", limit=10, window_seconds=60)
-    
-    return await login_user(request.mobile, request.password)
\ No newline at end of file
+    await enforce_rate_limits(
+        RateLimit(f"login_ip:{ip}", limit=10, window_seconds=60),
+        RateLimit(f"login_phone:{request.mobile}", limit=10, window_seconds=60),
+        response=response
+    )
+
+    return await login_user(request.mobile, request.password)
+
+
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme), current_user: Principal = Depends(get_current_user)):
+    """Revoke the current access token (denylisted in Redis until it expires)."""
+    if current_user.jti is None:
+        raise HTTPException(status_code=400, detail="This token cannot be revoked; it expires on its own.")
+
+    await revoke_token(current_user.jti, current_user.expires_at)
+    forget_token(token)
+    return {"message": "Logged out."}
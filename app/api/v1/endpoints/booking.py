@@ -1,137 +1,255 @@
 
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
 from datetime import datetime, timezone
-
-from app.schemas.booking import ReserveRequest
-from app.services.booking_service import reserve_seat
+from typing import Optional
+
+from app.schemas.booking import (
+    ReserveRequest,
+    GroupReserveRequest,
+    AutoReserveRequest,
+    HoldRequest,
+    ConfirmHoldRequest,
+    WaitlistRequest
+)
+from app.services.booking_service import (
+    reserve_seat,
+    reserve_group_seats,
+    reserve_best_available,
+    hold_seats,
+    confirm_hold
+)
+from app.services.booking_cache import get_user_bookings, user_bookings_version
+from app.services.idempotency import run_idempotent
+from app.services.waitlist import join_waitlist, get_waitlist_status, leave_waitlist
 from app.services.booking_queries import (
-    GET_USER_BOOKINGS,
     GET_BOOKING_FOR_CANCELLATION,
-    REFUND_TO_WALLET,
-    MARK_BOOKING_CANCELLED,
-    RELEASE_SEAT
+    ENQUEUE_REFUND
 )
-from app.core.dependencies import get_current_user
+from app.core.conditional import conditional_get, make_etag
+from app.core.dependencies import Principal, get_current_user
 from app.db.session import AsyncSessionLocal
-from app.models.user import User
 
 
 router = APIRouter(prefix="/booking", tags=["Booking"])
 
-
-# Background task to refund money and cancel booking
-async def refund_money(booking_id: int, amount: int, user_id: int):
-    """Background task to process refund and cancellation."""
-    async with AsyncSessionLocal() as db:
-        async with db.begin():
-            await db.execute(REFUND_TO_WALLET, {"amount": amount, "uid": user_id})
-            await db.execute(MARK_BOOKING_CANCELLED, {"bid": booking_id})
-            await db.execute(RELEASE_SEAT, {"bid": booking_id})
+# Optional client-generated key; retries with the same key get the first response back
+IdempotencyKey = Header(None, alias="Idempotency-Key", max_length=100)
 
 
 @router.post("/reserve", status_code=status.HTTP_201_CREATED)
 async def reserve(
     request: ReserveRequest,
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: Optional[str] = IdempotencyKey
 ):
     """
     Reserve a seat for a trip.
     Includes Redis lock for concurrency safety and daily rate limiting (20 bookings/day).
+    Send an Idempotency-Key header to make retries safe.
     """
-    result = await reserve_seat(
-        user_id=current_user.id,
-        trip_id=request.trip_id,
-        seat_number=request.seat_number
-    )
+    async def _reserve():
+        result = await reserve_seat(
+            user_id=current_user.id,
+            trip_id=request.trip_id,
+            seat_number=request.seat_number
+        )
+
+        return {
+            "message": "Ticket successfully reserved",
+            "booking_id": result["booking_id"],
+            "trip_id": request.trip_id,
+            "seat_number": request.seat_number,
+            "price_paid": result["price_paid"]
+        }
+
+    return await run_idempotent("reserve", current_user.id, idempotency_key, request, _reserve, response)
+
+
+@router.post("/reserve-group", status_code=status.HTTP_201_CREATED)
+async def reserve_group(
+    request: GroupReserveRequest,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: Optional[str] = IdempotencyKey
+):
+    """
+    Reserve several seats of the same trip in one request (families, agencies).
+    All-or-nothing: either every seat is booked or none is. Each seat counts
+    towards the daily booking limit.
+    """
+    async def _reserve():
+        return await reserve_group_seats(
+            user_id=current_user.id,
+            trip_id=request.trip_id,
+            seat_numbers=request.seat_numbers
+        )
+
+    return await run_idempotent("reserve-group", current_user.id, idempotency_key, request, _reserve, response)
+
+
+@router.post("/reserve-auto", status_code=status.HTTP_201_CREATED)
+async def reserve_auto(
+    request: AutoReserveRequest,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: Optional[str] = IdempotencyKey
+):
+    """
+    Reserve the best available seat(s) on a trip without choosing seat numbers.
+    Optional preferences: window seats, adjacent seats. Concurrent buyers are
+    assigned different seats instead of conflicting on the same one.
+    """
+    async def _reserve():
+        return await reserve_best_available(
+            user_id=current_user.id,
+            trip_id=request.trip_id,
+            seat_count=request.seat_count,
+            window=request.window,
+            adjacent=request.adjacent
+        )
+
+    return await run_idempotent("reserve-auto", current_user.id, idempotency_key, request, _reserve, response)
+
+
+@router.post("/hold", status_code=status.HTTP_201_CREATED)
+async def hold(
+    request: HoldRequest,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: Optional[str] = IdempotencyKey
+):
+    """
+    Hold seats in the cart for a few minutes without paying.
+    Nobody else can take them until the hold is confirmed or expires.
+    """
+    async def _hold():
+        return await hold_seats(
+            user_id=current_user.id,
+            trip_id=request.trip_id,
+            seat_numbers=request.seat_numbers
+        )
+
+    return await run_idempotent("hold", current_user.id, idempotency_key, request, _hold, response)
+
+
+@router.post("/hold/confirm", status_code=status.HTTP_201_CREATED)
+async def confirm(
+    request: ConfirmHoldRequest,
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: Optional[str] = IdempotencyKey
+):
+    """
+    Pay for held seats and turn the hold into bookings.
+    Returns 410 if the hold has expired.
+    """
+    async def _confirm():
+        return await confirm_hold(
+            user_id=current_user.id,
+            trip_id=request.trip_id,
+            seat_numbers=request.seat_numbers
+        )
+
+    return await run_idempotent("hold-confirm", current_user.id, idempotency_key, request, _confirm, response)
+
+
+@router.post("/waitlist", status_code=status.HTTP_201_CREATED)
+async def waitlist_join(request: WaitlistRequest, current_user: Principal = Depends(get_current_user)):
+    """
+    Join the waitlist of a sold-out trip instead of polling for free seats.
+    When a seat is freed, it is held for the first user in line; confirm it
+    with /booking/hold/confirm before the hold expires.
+    """
+    return await join_waitlist(current_user.id, request.trip_id)
 
-    return {
-        "message": "Ticket successfully reserved",
-        "booking_id": result["booking_id"],
-        "trip_id": request.trip_id,
-        "seat_number": request.seat_number,
-        "price_paid": result["price_paid"]
-    }
+
+@router.get("/waitlist/{trip_id}")
+async def waitlist_status(trip_id: int, current_user: Principal = Depends(get_current_user)):
+    """Place in line, or the seat held for you once you have been promoted."""
+    return await get_waitlist_status(current_user.id, trip_id)
+
+
+@router.delete("/waitlist/{trip_id}")
+async def waitlist_leave(trip_id: int, current_user: Principal = Depends(get_current_user)):
+    """Leave the waitlist of a trip."""
+    await leave_waitlist(current_user.id, trip_id)
+    return {"message": "You have left the waitlist.", "trip_id": trip_id}
 
 
 @router.get("/my-bookings")
-async def my_bookings(current_user: User = Depends(get_current_user)):
+async def my_bookings(request: Request, response: Response, current_user: Principal = Depends(get_current_user)):
     """
     Get current user's booking history.
     Returns all confirmed and cancelled bookings.
+    Supports If-None-Match: an unchanged history is answered with 304.
     """
-    async with AsyncSessionLocal() as db:
-        result = await db.execute(GET_USER_BOOKINGS, {"user_id": current_user.id})
-        rows = result.fetchall()
-
-        bookings = [
-            {
-                "id": row[0],
-                "origin": row[1],
-                "destination": row[2],
-                "departure_time": row[3].isoformat() if row[3] else None,
-                "seat_number": row[4],
-                "price_paid": row[5],
-                "status": row[6] or "pending",
-                "can_cancel": bool(row[7])
-            }
-            for row in rows
-        ]
-
-        return {
-            "bookings": bookings,
-            "total": len(bookings)
-        }
+    version = await user_bookings_version(current_user.id)
+    return await conditional_get(
+        request,
+        response,
+        make_etag("my-bookings", current_user.id, version),
+        lambda: get_user_bookings(current_user.id, version),
+    )
 
 
 @router.post("/cancel/{booking_id}")
 async def cancel_booking(
     booking_id: int,
-    background_tasks: BackgroundTasks,
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    current_user: Principal = Depends(get_current_user),
+    idempotency_key: Optional[str] = IdempotencyKey
 ):
     """
     Cancel a booking.
-    Only allowed before departure time. Refund is processed in background.
-    """
-    async with AsyncSessionLocal() as db:
-        async with db.begin():
-            result = await db.execute(
-                GET_BOOKING_FOR_CANCELLATION,
-                {"bid": booking_id, "uid": current_user.id}
-            )
-
-            row = result.fetchone()
-            if not row:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Booking not found or does not belong to you."
-                )
-
-            price_paid, departure_time, current_status, booking_user_id = row
-            
-            # Additional security check: verify booking belongs to current user
-            if booking_user_id != current_user.id:
-                raise HTTPException(
-                    status_code=403,
-                    detail="You do not have permission to cancel this booking."
-                )
-
-            if current_status == 'cancelled':
-                raise HTTPException(
-                    status_code=400,
-                    detail="This booking has already been cancelled."
-                )
-
-            if departure_time <= datetime.now(timezone.utc):
-                raise HTTPException(
-                    status_code=400,
-                    detail="Sorry, cancellation is not allowed after the bus has departed. We wish you a safe trip."
+    Only allowed before departure time. The refund is queued in the same
+    transaction and applied by the refund worker.
+    Send an Idempotency-Key header to make retries safe.
+    """
+    async def _cancel():
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                result = await db.execute(
+                    GET_BOOKING_FOR_CANCELLATION,
+                    {"bid": booking_id, "uid": current_user.id}
                 )
 
-            # Schedule refund and cleanup in background
-            background_tasks.add_task(refund_money, booking_id, price_paid, current_user.id)
+                row = result.fetchone()
+                if not row:
+                    raise HTTPException(
+                        status_code=404,
+                        detail="Booking not found or does not belong to you."
+                    )
 
-            return {
-                "message": "Cancellation request received. The amount will be refunded to your wallet shortly.",
-                "booking_id": booking_id
-            }
\ No newline at end of file
+                price_paid, departure_time, current_status, booking_user_id = row
+            
+                # Additional security check: verify booking belongs to current user
+                if booking_user_id != current_user.id:
+                    raise HTTPException(
+                        status_code=403,
+                        detail="You do not have permission to cancel this booking."
+                    )
+
+                if current_status == 'cancelled':
+                    raise HTTPException(
+                        status_code=400,
+                        detail="This booking has already been cancelled."
+                    )
+
+                if departure_time <= datetime.now(timezone.utc):
+                    raise HTTPException(
+                        status_code=400,
+                        detail="Sorry, cancellation is not allowed after the bus has departed. We wish you a safe trip."
+                    )
+
+                # Queue refund and cleanup for the refund worker (durable, applied in batches)
+                await db.execute(ENQUEUE_REFUND, {"bid": booking_id})
+
+                return {
+                    "message": "Cancellation request received. The amount will be refunded to your wallet shortly.",
+                    "booking_id": booking_id
+                }
+
+    return await run_idempotent(
+        "cancel", current_user.id, idempotency_key, {"booking_id": booking_id}, _cancel, response
+    )
\ No newline at end of file
@@ -2,9 +2,9 @@
 from datetime import date
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from app.core.conditional import with_etag
 from app.core.dependencies import require_admin
-from app.db.session import AsyncSessionLocal
 from app.services.report_service import (
     get_current_hour_report,
     get_daily_hourly_breakdown_report,
@@ -18,33 +18,34 @@ router = APIRouter(prefix="/admin/reports", tags=["Reports"])
 
 
 @router.get("/top-driver")
-async def top_driver(_=Depends(require_admin)):
+async def top_driver(request: Request, response: Response, _=Depends(require_admin)):
     """
     Returns the most active bus (by number of confirmed bookings).
     """
-    async with AsyncSessionLocal() as db:
-        report = await get_top_driver_report(db)
-        if not report:
-            return {
-                "message": "No bookings found",
-                "top_driver_bus": None,
-                "total_bookings": 0
-            }
+    report, etag = await get_top_driver_report()
+    if not report:
+        return {
+            "message": "No bookings found",
+            "top_driver_bus": None,
+            "total_bookings": 0
+        }
 
-        return report
+    return with_etag(request, response, report, etag)
 
 
 @router.get("/bus-monthly-income")
-async def bus_monthly_income(_=Depends(require_admin)):
+async def bus_monthly_income(request: Request, response: Response, _=Depends(require_admin)):
     """
     Monthly booking count and total income per bus.
     """
-    async with AsyncSessionLocal() as db:
-        return await get_bus_monthly_income_report(db)
+    report, etag = await get_bus_monthly_income_report()
+    return with_etag(request, response, report, etag)
 
 
 @router.get("/hourly-success-bookings")
 async def hourly_success_bookings(
+    request: Request,
+    response: Response,
     target_date: Optional[date] = Query(
         None, alias="date", description="Date in YYYY-MM-DD format"
     ),
@@ -65,11 +66,11 @@ async def hourly_success_bookings(
             detail="When 'hour' is provided, 'date' must also be provided."
         )
 
-    async with AsyncSessionLocal() as db:
-        if target_date is None:
-            return await get_current_hour_report(db)
+    if target_date is None:
+        report, etag = await get_current_hour_report()
+    elif hour is None:
+        report, etag = await get_daily_hourly_breakdown_report(target_date)
+    else:
+        report, etag = await get_hourly_booking_report(target_date=target_date, hour=hour)
 
-        if hour is None:
-            return await get_daily_hourly_breakdown_report(db, target_date)
-
-        return await get_hourly_booking_report(db, target_date=target_date, hour=hour)
\ No newline at end of file
+    return with_etag(request, response, report, etag)
\ No newline at end of file
@@ -1,33 +1,188 @@
 # app/api/v1/endpoints/trip.py
-from fastapi import APIRouter, Query
-from app.core.redis import redis_client as redis
-import json
+import math
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 
-from app.services.trip_service import list_available_trips
+from app.core.conditional import conditional_get, make_etag
+from app.core.config import settings
+from app.schemas.trip import TripSearchFilters
+from app.services.connection_search import search_connections
+from app.services.fare_calendar import get_fare_calendar
+from app.services.trip_cache import search_cache_namespace, seat_map_version, trip_search_cache
+from app.services.trip_service import get_seat_map, list_available_trips, search_trips
 
 router = APIRouter(prefix="/trips", tags=["Trips"])
 
+# "Not departed yet" is checked against the current time rounded up to this many
+# seconds, so searches in the same window share cache entries. Rounding up never
+# lists a trip that has left; it only hides ones leaving within the next window.
+DEPARTED_CHECK_GRANULARITY_SECONDS = 300
+
+FARE_CALENDAR_DEFAULT_DAYS = 90
+FARE_CALENDAR_MAX_DAYS = 120
+
+
+def _departure_cutoff() -> datetime:
+    windows = math.ceil(datetime.now(timezone.utc).timestamp() / DEPARTED_CHECK_GRANULARITY_SECONDS)
+    return datetime.fromtimestamp(windows * DEPARTED_CHECK_GRANULARITY_SECONDS, tz=timezone.utc)
+
+
 @router.get("/available")
 async def get_available_trips(
+    request: Request,
+    response: Response,
     origin: Optional[str] = Query(None),
     destination: Optional[str] = Query(None),
+    departure_from: Optional[datetime] = Query(None, description="Earliest departure (inclusive)"),
+    departure_to: Optional[datetime] = Query(None, description="Latest departure (exclusive)"),
+    min_seats: Optional[int] = Query(None, ge=1, description="Only trips with at least this many free seats"),
+    min_price: Optional[int] = Query(None, ge=0),
+    max_price: Optional[int] = Query(None, ge=0),
+    include_departed: bool = Query(False, description="Also list trips that have already departed"),
     sort: str = Query("cheapest", regex="^(cheapest|expensive)$"),
-    page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None, max_length=200, description="next_cursor from the previous page"),
+    include_total: bool = Query(False, description="Add a cached (approximate) total count"),
+    page: Optional[int] = Query(None, ge=1, description="Legacy offset pagination; prefer cursor"),
     per_page: int = Query(20, ge=1, le=100),
 ):
-    cache_key = f"trips:{origin or '*'}:{destination or '*'}:{sort}:{page}:{per_page}"
-    cached = await redis.get(cache_key)
-    if cached:
-        return json.loads(cached)
+    """
+    Open trips sorted by price. Pages are walked with `cursor` (pass back
+    `next_cursor` until it is null). Passing `page` switches to the legacy
+    offset mode with an exact total. Departed trips are hidden by default.
+    Supports If-None-Match: the ETag is derived from the versioned cache key.
+    """
+    if departure_from and departure_to and departure_to <= departure_from:
+        raise HTTPException(status_code=400, detail="departure_to must be after departure_from.")
+
+    if min_price is not None and max_price is not None and max_price < min_price:
+        raise HTTPException(status_code=400, detail="max_price must not be lower than min_price.")
+
+    filters = TripSearchFilters(
+        origin=origin,
+        destination=destination,
+        departure_from=departure_from,
+        departure_to=departure_to,
+        min_seats=min_seats,
+        min_price=min_price,
+        max_price=max_price,
+        not_before=None if include_departed else _departure_cutoff(),
+    )
+
+    if page is not None:
+        page_key = f"page={page}"
+    else:
+        page_key = f"cursor={cursor or ''}:total={int(include_total)}"
+
+    # Versioned per route: bookings and trip changes bump the version instead of deleting keys
+    namespace = await search_cache_namespace(origin, destination)
+    cache_key = f"{namespace}:{filters.cache_key()}:{sort}:{page_key}:{per_page}"
+
+    async def _load():
+        if page is not None:
+            return await list_available_trips(
+                filters=filters,
+                sort=sort,
+                page=page,
+                per_page=per_page,
+            )
+        return await search_trips(
+            filters=filters,
+            sort=sort,
+            per_page=per_page,
+            cursor=cursor,
+            include_total=include_total,
+        )
+
+    # The versioned key identifies the page, so it is also its ETag.
+    # In-process first, then Redis; concurrent misses share one query
+    return await conditional_get(
+        request, response, make_etag(cache_key), lambda: trip_search_cache.get_or_load(cache_key, _load)
+    )
+
+
+@router.get("/calendar")
+async def get_trip_calendar(
+    origin: str = Query(...),
+    destination: str = Query(...),
+    start_date: Optional[date] = Query(None, description="First day (UTC); defaults to today"),
+    end_date: Optional[date] = Query(None, description=f"Last day (inclusive); defaults to {FARE_CALENDAR_DEFAULT_DAYS} days"),
+):
+    """
+    Cheapest bookable price and free seats per day for one route, served from
+    the precomputed route_day_fares summary (may lag bookings by a few seconds).
+    """
+    start_date = start_date or datetime.now(timezone.utc).date()
+    end_date = end_date or start_date + timedelta(days=FARE_CALENDAR_DEFAULT_DAYS - 1)
+
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date.")
+
+    if (end_date - start_date).days >= FARE_CALENDAR_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"The calendar covers at most {FARE_CALENDAR_MAX_DAYS} days.")
+
+    return await get_fare_calendar(origin, destination, start_date, end_date)
+
 
-    response = await list_available_trips(
+@router.get("/connections")
+async def get_trip_connections(
+    origin: str = Query(...),
+    destination: str = Query(...),
+    departure_from: Optional[datetime] = Query(None, description="Earliest first-leg departure; defaults to now"),
+    departure_to: Optional[datetime] = Query(None, description="Latest first-leg departure; defaults to 24h later"),
+    max_legs: int = Query(2, ge=1, le=3),
+    min_layover_minutes: Optional[int] = Query(None, ge=0, le=24 * 60),
+    max_layover_minutes: Optional[int] = Query(None, ge=1, le=48 * 60),
+    seats: int = Query(1, ge=1, le=10),
+    sort: str = Query("cheapest", regex="^(cheapest|earliest_arrival)$"),
+    limit: int = Query(20, ge=1, le=50),
+):
+    """
+    Itineraries of up to `max_legs` trips (direct trips included). Each leg
+    departs at least `min_layover_minutes` after the previous one arrives.
+    Ranked by total price or by arrival time.
+    """
+    departure_from = departure_from or datetime.now(timezone.utc)
+    departure_to = departure_to or departure_from + timedelta(days=1)
+    if departure_to <= departure_from:
+        raise HTTPException(status_code=400, detail="departure_to must be after departure_from.")
+
+    if origin == destination:
+        raise HTTPException(status_code=400, detail="origin and destination must differ.")
+
+    min_layover = settings.CONNECTION_MIN_LAYOVER_MINUTES if min_layover_minutes is None else min_layover_minutes
+    max_layover = max_layover_minutes or settings.CONNECTION_MAX_LAYOVER_MINUTES
+    if max_layover < min_layover:
+        raise HTTPException(status_code=400, detail="max_layover_minutes must not be lower than min_layover_minutes.")
+
+    return await search_connections(
         origin=origin,
         destination=destination,
+        departure_from=departure_from,
+        departure_to=departure_to,
+        max_legs=max_legs,
+        min_layover_minutes=min_layover,
+        max_layover_minutes=max_layover,
         sort=sort,
-        page=page,
-        per_page=per_page,
+        seats=seats,
+        limit=limit,
     )
 
-    await redis.setex(cache_key, 60, json.dumps(response, default=str))
-    return response
\ No newline at end of file
+
+@router.get("/{trip_id}/seats")
+async def get_trip_seat_map(trip_id: int, request: Request, response: Response):
+    """
+    Full occupancy of a trip as `[first, last]` ranges of free, held and
+    reserved seats. Send the returned ETag back in `If-None-Match`: an
+    unchanged map is answered with 304 and no body.
+    """
+    version = await seat_map_version(trip_id)
+
+    async def _load():
+        seat_map = await get_seat_map(trip_id, version)
+        if seat_map is None:
+            raise HTTPException(status_code=404, detail="Trip not found.")
+        return seat_map
+
+    return await conditional_get(request, response, make_etag("seatmap", trip_id, version), _load)
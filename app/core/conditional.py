@@ -0,0 +1,61 @@
+# app/core/conditional.py
+"""
+Conditional GET helpers (ETag / If-None-Match).
+Versioned resources build their ETag from the cache key and version counters,
+so an unchanged resource is answered with 304 before anything is loaded.
+Unversioned cache entries (reports) use a hash of the cached payload, computed
+once when the entry is stored, never per request.
+"""
+import hashlib
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+
+# Clients must revalidate every time, but may reuse their copy on 304
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag for the given parts (cache key and versions, or a cached payload)."""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    etag: Optional[str],
+    load: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    Return 304 if the client already has `etag`, otherwise the result of
+    `load()` with the ETag header set. With etag=None the body is always loaded.
+    """
+    if etag is not None and etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL})
+
+    return with_etag(request, response, await load(), etag)
+
+
+def with_etag(request: Request, response: Response, result: Any, etag: Optional[str]) -> Any:
+    """
+    Same as conditional_get for a result that is already at hand (e.g. served
+    from a cache that knows the ETag of its entries).
+    """
+    if etag is None:
+        return result
+
+    headers = {"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return result
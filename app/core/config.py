@@ -1,4 +1,6 @@
 # app/core/config.py
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,4 +9,78 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "super-secret-jwt-key-2025-saeid-shojaei"
     ALGORITHM: str = "HS256"
 
-settings = Settings(_env_file=".env")
\ No newline at end of file
+    # Verified access tokens are cached in-process (per worker) for this long;
+    # also the longest a revoked token can still be accepted by another process
+    AUTH_TOKEN_CACHE_SECONDS: int = 30
+    AUTH_TOKEN_CACHE_SIZE: int = 10_000
+
+    # Password hashing runs on a small thread pool; logins beyond PASSWORD_HASH_MAX_PENDING
+    # queued hashes get 503. Changing BCRYPT_ROUNDS rehashes passwords on their next login.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # Claim seats in a per-trip Redis bitmap before touching Postgres
+    SEAT_INVENTORY_ENABLED: bool = False
+
+    # "single_statement" runs all reservation checks and writes in one CTE round trip
+    RESERVATION_MODE: Literal["classic", "single_statement"] = "classic"
+
+    # Hold/confirm flow: how long a held seat stays in the cart, and sweeper batching
+    SEAT_HOLD_MINUTES: int = 10
+    HOLD_SWEEP_INTERVAL_SECONDS: int = 15
+    HOLD_SWEEP_BATCH_SIZE: int = 500
+
+    # Refund worker draining the refund_outbox table
+    REFUND_BATCH_SIZE: int = 200
+    REFUND_POLL_INTERVAL_SECONDS: float = 1.0
+
+    # Wallet snapshot worker: wallets.balance is refreshed from the buckets incrementally,
+    # with a full pass every WALLET_SNAPSHOT_FULL_EVERY runs
+    WALLET_SNAPSHOT_INTERVAL_SECONDS: int = 30
+    WALLET_SNAPSHOT_FULL_EVERY: int = 120
+
+    # In-process cache in front of Redis for hot read keys (see app/services/cache.py)
+    L1_CACHE_TTL_SECONDS: int = 5
+    L1_CACHE_MAX_ENTRIES: int = 2048
+
+    # Trip search pages are invalidated through versioned keys, so they can live long
+    TRIP_SEARCH_CACHE_SECONDS: int = 3600
+
+    # Serve origin/destination searches from a Redis sorted-set index of upcoming trips,
+    # rebuilt from Postgres by the trip index worker (see app/services/trip_index.py)
+    TRIP_INDEX_ENABLED: bool = False
+    TRIP_INDEX_REBUILD_INTERVAL_SECONDS: int = 600
+
+    # How often trips.seats_available is checked against the seats table
+    SEAT_COUNTER_RECONCILE_INTERVAL_SECONDS: int = 3600
+
+    # Fare calendar worker: route-days touched by bookings are recomputed in batches,
+    # with a full rebuild of all upcoming days every FARE_CALENDAR_FULL_EVERY runs
+    FARE_CALENDAR_REFRESH_INTERVAL_SECONDS: int = 5
+    FARE_CALENDAR_BATCH_SIZE: int = 500
+    FARE_CALENDAR_FULL_EVERY: int = 720
+    # Today's rows are recomputed every FARE_CALENDAR_TODAY_EVERY runs to drop departed trips
+    FARE_CALENDAR_TODAY_EVERY: int = 12
+
+    # Connection search keeps the next CONNECTION_INDEX_HORIZON_DAYS of trips in memory,
+    # adds new trips every CONNECTION_INDEX_REFRESH_SECONDS and rebuilds it periodically
+    CONNECTION_INDEX_HORIZON_DAYS: int = 30
+    CONNECTION_INDEX_REFRESH_SECONDS: int = 30
+    CONNECTION_INDEX_FULL_RELOAD_SECONDS: int = 900
+    CONNECTION_MIN_LAYOVER_MINUTES: int = 30
+    CONNECTION_MAX_LAYOVER_MINUTES: int = 720
+
+    # Bulk registration (POST /admin/users/bulk) inserts this many users per statement
+    BULK_REGISTER_CHUNK_SIZE: int = 1000
+
+    # Per-worker pre-limiter: once this process has forwarded PRE_LIMITER_FACTOR x an
+    # identifier's limit to Redis within the window, it rejects it without asking Redis.
+    # Counts live in a count-min sketch of PRE_LIMITER_DEPTH x PRE_LIMITER_WIDTH counters
+    # per window length.
+    PRE_LIMITER_ENABLED: bool = True
+    PRE_LIMITER_FACTOR: float = 2.0
+    PRE_LIMITER_WIDTH: int = 4096
+    PRE_LIMITER_DEPTH: int = 4
+
+settings = Settings(_env_file=".env")
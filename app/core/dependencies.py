@@ -1,50 +1,109 @@
 # app/core/dependencies.py
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 
 from app.crud.user import get_user_by_mobile
 from app.core.config import settings
+from app.services.auth_service import is_token_revoked
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/v1/auth/login")
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    """
-    Decode JWT token and return the authenticated user.
-    Raises 401 if token is invalid, expired, or user not found.
-    """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Invalid or expired token",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+class Principal(NamedTuple):
+    """The authenticated caller, taken from the access token's claims."""
+    id: int
+    mobile: str
+    roles: Tuple[str, ...]
+    jti: Optional[str]
+    expires_at: float
+
+
+# token -> (principal, cached_until). Skips signature checks and the denylist lookup
+# for tokens seen recently; a revoked token is therefore rejected by other processes
+# within AUTH_TOKEN_CACHE_SECONDS.
+_verified_tokens: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
 
+
+def forget_token(token: str) -> None:
+    _verified_tokens.pop(token, None)
+
+
+async def _resolve_principal(token: str) -> Optional[Principal]:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        mobile: str | None = payload.get("sub")
-        if mobile is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        return None
+
+    mobile: str | None = payload.get("sub")
+    if mobile is None:
+        return None
+
+    jti = payload.get("jti")
+    if jti and await is_token_revoked(jti):
+        return None
 
+    if "uid" in payload and "roles" in payload:
+        return Principal(
+            id=payload["uid"],
+            mobile=mobile,
+            roles=tuple(payload["roles"]),
+            jti=jti,
+            expires_at=float(payload["exp"]),
+        )
+
+    # Tokens issued before the claims were added: load the user once, then cache
     user = await get_user_by_mobile(mobile)
     if user is None:
-        raise credentials_exception
+        return None
+    return Principal(
+        id=user.id,
+        mobile=mobile,
+        roles=tuple(sorted({profile.role for profile in user.profiles})),
+        jti=jti,
+        expires_at=float(payload["exp"]),
+    )
 
-    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Return the authenticated principal (user id and roles) from the JWT.
+    No database access for current tokens; recently verified tokens skip
+    decoding altogether. Raises 401 if the token is invalid, expired or revoked.
+    """
+    now = time.time()
+    cached = _verified_tokens.get(token)
+    if cached is not None and now < cached[1]:
+        _verified_tokens.move_to_end(token)
+        return cached[0]
+
+    principal = await _resolve_principal(token)
+    if principal is None:
+        forget_token(token)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    _verified_tokens[token] = (principal, min(now + settings.AUTH_TOKEN_CACHE_SECONDS, principal.expires_at))
+    _verified_tokens.move_to_end(token)
+    while len(_verified_tokens) > settings.AUTH_TOKEN_CACHE_SIZE:
+        _verified_tokens.popitem(last=False)
+
+    return principal
 
 
 def require_role(*allowed_roles: str):
     """
     Dependency factory to restrict access based on user role.
     """
-    def role_checker(current_user=Depends(get_current_user)):
-        user_role = next(
-            (profile.role for profile in current_user.profiles if profile.role in allowed_roles),
-            None
-        )
-        if not user_role:
+    def role_checker(current_user: Principal = Depends(get_current_user)):
+        if not any(role in allowed_roles for role in current_user.roles):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Access denied — insufficient role permissions"
@@ -57,4 +116,4 @@ def require_role(*allowed_roles: str):
 # Pre-defined role-based dependencies
 require_passenger = require_role("passenger", "operator", "admin")
 require_operator = require_role("operator", "admin")
-require_admin = require_role("admin")
\ No newline at end of file
+require_admin = require_role("admin")
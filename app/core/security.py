@@ -1,13 +1,30 @@
 # app/core/security.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from uuid import uuid4
 from re import DEBUG
+from fastapi import HTTPException, status
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
 FIXED_HASH_FOR_123456 = "$2b$12$3fZ6x9y8v7c5b4n3m2lk1e9r8t7y6u5i4o3p2a1s.d.f.g.h.j.k.l/"
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min = max = default, so a hash made with any other cost is flagged for rehashing on login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+# bcrypt takes ~250 ms at cost 12 and releases the GIL, so it runs on a few dedicated
+# threads instead of stalling the event loop (and every booking on it)
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
 
 ACCESS_TOKEN_EXPIRE_HOURS = 8 
 
@@ -15,8 +32,10 @@ DEBUG = True
 
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS)
+    # jti identifies this token on the revocation denylist
+    to_encode.update({"exp": expire, "iat": now, "jti": uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -34,4 +53,44 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         try:
             return pwd_context.verify(plain_password, hashed_password)
         except:
-            return False
\ No newline at end of file
+            return False
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Like verify_password; also returns a new hash when the stored one uses an outdated cost."""
+    if DEBUG:
+        if plain_password == "123456" and hashed_password == FIXED_HASH_FOR_123456:
+            return True, None
+        try:
+            return pwd_context.verify_and_update(plain_password, hashed_password)
+        except:
+            return False, None
+
+
+async def _run_hashing(func, *args):
+    """
+    Run a bcrypt call on the hashing pool. Fails fast with 503 when
+    PASSWORD_HASH_MAX_PENDING calls are already queued or running.
+    """
+    global _hash_pending
+    if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins right now, please retry in a moment.",
+            headers={"Retry-After": "1"},
+        )
+
+    _hash_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(get_password_hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password off the event loop: (valid, new hash or None)."""
+    return await _run_hashing(verify_and_update_password, plain_password, hashed_password)
@@ -1,9 +1,16 @@
 # app/crud/user.py
+from decimal import Decimal
+from typing import Iterable, List
+
 from sqlalchemy import text, select
 from sqlalchemy.orm import selectinload
 
 from app.db.session import AsyncSessionLocal
 from app.models.user import User
+from app.services.user_queries import REGISTER_USERS
+from app.services.wallet_service import WALLET_BUCKETS
+
+INITIAL_WALLET_BALANCE = 10_000_000
 
 
 async def get_user_by_mobile(mobile: str) -> User | None:
@@ -19,39 +26,39 @@ async def get_user_by_mobile(mobile: str) -> User | None:
         return result.scalar_one_or_none()
 
 
-async def create_user_db(mobile: str, password_hash: str, role: str = "passenger") -> None:
+async def register_users(mobiles: Iterable[str], password_hash: str, role: str = "passenger") -> List[str]:
     """
-    Create a new user with profile and wallet.
-    - Default password: 123456 (hashed)
+    Create users (with profile and wallet) for the mobiles not registered yet,
+    in a single statement. Returns the mobiles that were created.
     - Initial wallet balance: 10,000,000 IRR
     - Default full name: "User <last 4 digits>"
     """
+    mobiles = list(mobiles)
+    if not mobiles:
+        return []
+
     async with AsyncSessionLocal() as db:
         async with db.begin():
-            # Insert user and get ID
-            user_result = await db.execute(
-                text("INSERT INTO users (mobile, password_hash) VALUES (:m, :p) RETURNING id"),
-                {"m": mobile, "p": password_hash}
-            )
-            user_id = user_result.scalar_one()
+            result = await db.execute(REGISTER_USERS, {
+                "mobiles": mobiles,
+                "password_hash": password_hash,
+                "role": role,
+                "amount": Decimal(INITIAL_WALLET_BALANCE),
+                "buckets": WALLET_BUCKETS,
+                "kind": "registration"
+            })
+            return [row.mobile for row in result.fetchall()]
 
-            # Create profile
-            display_name = f"User {mobile[-4:]}"
-            await db.execute(
-                text("""
-                    INSERT INTO profiles (user_id, role, full_name)
-                    VALUES (:uid, :role, :name)
-                """),
-                {"uid": user_id, "role": role, "name": display_name}
-            )
 
-            # Create wallet with initial balance
+async def create_user_db(mobile: str, password_hash: str, role: str = "passenger") -> bool:
+    """Register one user. Returns False when the mobile is already taken."""
+    return bool(await register_users([mobile], password_hash, role))
+
+
+async def update_password_hash(user_id: int, password_hash: str) -> None:
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
             await db.execute(
-                text("""
-                    INSERT INTO wallets (user_id, balance)
-                    VALUES (:uid, 10000000)
-                """),
-                {"uid": user_id}
+                text("UPDATE users SET password_hash = :p WHERE id = :uid"),
+                {"p": password_hash, "uid": user_id}
             )
-
-        await db.commit()
\ No newline at end of file
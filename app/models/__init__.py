@@ -1,10 +1,17 @@
 from .user import User
 from .profile import Profile
 from .wallet import Wallet
+from .wallet_bucket import WalletBucket
+from .wallet_transaction import WalletTransaction
 from .route import Route
 from .bus import Bus
 from .trip import Trip
 from .seat import Seat
 from .booking import Booking
+from .refund_outbox import RefundOutbox
+from .route_day_fare import RouteDayFare
 
-__all__ = ["User", "Profile", "Wallet", "Route", "Bus", "Trip", "Seat", "Booking"]
\ No newline at end of file
+__all__ = [
+    "User", "Profile", "Wallet", "WalletBucket", "WalletTransaction",
+    "Route", "Bus", "Trip", "Seat", "Booking", "RefundOutbox", "RouteDayFare",
+]
\ No newline at end of file
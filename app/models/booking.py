@@ -9,7 +9,7 @@ class Booking(Base):
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False)
+    trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False, index=True)
     seat_id = Column(Integer, ForeignKey("seats.id"), nullable=False)
     price_paid = Column(Numeric(10, 2), nullable=False)
     status = Column(String(20), default="confirmed")  # confirmed, cancelled
@@ -0,0 +1,15 @@
+# app/models/refund_outbox.py
+from .base_imports import Base, Column, Integer, DateTime, ForeignKey, func, text, Index
+
+class RefundOutbox(Base):
+    """Cancellations waiting for the refund worker (one row per booking)."""
+    __tablename__ = "refund_outbox"
+
+    id = Column(Integer, primary_key=True)
+    booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index('ix_refund_outbox_pending', id, postgresql_where=text('processed_at IS NULL')),
+    )
\ No newline at end of file
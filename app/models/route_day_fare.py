@@ -0,0 +1,17 @@
+# app/models/route_day_fare.py
+from .base_imports import Base, Column, Integer, ForeignKey, DateTime, Numeric, text
+from sqlalchemy import Date
+
+class RouteDayFare(Base):
+    """
+    Precomputed fare calendar: cheapest bookable price and free seats of one
+    route on one (UTC) day. Refreshed by app/workers/fare_calendar.py.
+    """
+    __tablename__ = "route_day_fares"
+
+    route_id = Column(Integer, ForeignKey("routes.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    min_price = Column(Numeric(10, 2), nullable=True)  # NULL when every trip of the day is sold out
+    seats_available = Column(Integer, nullable=False, server_default=text("0"))
+    trips = Column(Integer, nullable=False, server_default=text("0"))
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
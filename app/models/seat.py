@@ -1,5 +1,5 @@
 # app/models/seat.py
-from .base_imports import Base, Column, Integer, ForeignKey, Boolean, UniqueConstraint, relationship
+from .base_imports import Base, Column, Integer, ForeignKey, Boolean, DateTime, UniqueConstraint, relationship
 
 class Seat(Base):
     __tablename__ = "seats"
@@ -9,6 +9,10 @@ class Seat(Base):
     seat_number = Column(Integer, nullable=False)
     is_reserved = Column(Boolean, default=False, index=True)
 
+    # Set while the seat is held (cart) and not yet paid; is_reserved is true during the hold
+    held_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    held_until = Column(DateTime(timezone=True), nullable=True)
+
     trip = relationship("Trip", back_populates="seats")
     booking = relationship("Booking", back_populates="seat", uselist=False)
 
@@ -1,5 +1,5 @@
 # app/models/trip.py
-from .base_imports import Base, Column, Integer, ForeignKey, DateTime, Numeric, relationship
+from .base_imports import Base, Column, Integer, ForeignKey, DateTime, Numeric, relationship, text
 
 class Trip(Base):
     __tablename__ = "trips"
@@ -10,6 +10,9 @@ class Trip(Base):
     departure_time = Column(DateTime(timezone=True), nullable=False, index=True)
     arrival_time = Column(DateTime(timezone=True), nullable=False)
     price = Column(Numeric(10, 2), nullable=False)
+    cancelled_at = Column(DateTime(timezone=True), nullable=True)  # set when an admin cancels the whole trip
+    # Free seats (not reserved, not held); kept in step with seats.is_reserved by every booking path
+    seats_available = Column(Integer, nullable=False, server_default=text("0"))
 
     route = relationship("Route", back_populates="trips")
     bus = relationship("Bus", back_populates="trips")
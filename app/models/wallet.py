@@ -1,10 +1,13 @@
 # app/models/wallet.py
-from .base_imports import Base, Column, Integer, ForeignKey, Numeric, relationship
+from .base_imports import Base, Column, Integer, ForeignKey, Numeric, DateTime, relationship
 
 class Wallet(Base):
     __tablename__ = "wallets"
 
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # Materialized snapshot of SUM(wallet_buckets.balance); refreshed by the wallet snapshot worker
     balance = Column(Numeric(14, 2), default=0.0, nullable=False)
+    snapshot_at = Column(DateTime(timezone=True), nullable=True)
 
-    user = relationship("User", back_populates="wallet")
\ No newline at end of file
+    user = relationship("User", back_populates="wallet")
+    buckets = relationship("WalletBucket", back_populates="wallet")
\ No newline at end of file
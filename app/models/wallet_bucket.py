@@ -0,0 +1,18 @@
+# app/models/wallet_bucket.py
+from .base_imports import Base, Column, Integer, ForeignKey, Numeric, text, relationship
+from sqlalchemy import SmallInteger, CheckConstraint
+
+class WalletBucket(Base):
+    """
+    A wallet's spendable money, split over a few rows so concurrent debits of
+    one user lock different rows instead of queueing on a single one.
+    """
+    __tablename__ = "wallet_buckets"
+
+    user_id = Column(Integer, ForeignKey("wallets.user_id"), primary_key=True)
+    bucket = Column(SmallInteger, primary_key=True)
+    balance = Column(Numeric(14, 2), nullable=False, server_default=text("0"))
+
+    wallet = relationship("Wallet", back_populates="buckets")
+
+    __table_args__ = (CheckConstraint("balance >= 0", name="ck_wallet_buckets_non_negative"),)
\ No newline at end of file
@@ -0,0 +1,19 @@
+# app/models/wallet_transaction.py
+from .base_imports import Base, Column, Integer, String, DateTime, ForeignKey, Numeric, func, Index
+from sqlalchemy import BigInteger
+
+class WalletTransaction(Base):
+    """Append-only wallet ledger: one row per debit (negative) or credit (positive)."""
+    __tablename__ = "wallet_transactions"
+
+    id = Column(BigInteger, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    amount = Column(Numeric(14, 2), nullable=False)
+    kind = Column(String(30), nullable=False)  # registration, top_up, reservation, refund, trip_cancellation
+    reference = Column(String(50))  # e.g. "booking:42", "trip:7"
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index('ix_wallet_transactions_user_id', user_id, id),
+        Index('ix_wallet_transactions_created_at', created_at),
+    )
\ No newline at end of file
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Annotated, List, Literal
 
 class BusCreate(BaseModel):
     plate_number: str
@@ -39,3 +40,8 @@ class TripResponse(BaseModel):
 class ChargeWalletRequest(BaseModel):
     mobile: str = Field(..., pattern=r"^09\d{9}$", description="Iranian mobile number starting with 09")
     amount: int = Field(..., gt=0, description="Amount in IRR to add")
+
+
+class BulkRegisterRequest(BaseModel):
+    mobiles: List[Annotated[str, Field(pattern=r"^09\d{9}$")]] = Field(..., min_length=1, max_length=10_000)
+    role: Literal["passenger", "operator"] = "passenger"
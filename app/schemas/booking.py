@@ -1,12 +1,47 @@
 # app/schemas/booking.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator, model_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+MAX_GROUP_SEATS = 10
+SEATS_PER_ROW = 4  # 2 + 2 layout: seats 1 and 4 of each row are window seats
 
 class ReserveRequest(BaseModel):
     trip_id: int
     seat_number: int
 
+class GroupReserveRequest(BaseModel):
+    trip_id: int
+    seat_numbers: List[int] = Field(..., min_length=1, max_length=MAX_GROUP_SEATS)
+
+    @field_validator("seat_numbers")
+    @classmethod
+    def seats_must_be_unique(cls, seat_numbers: List[int]) -> List[int]:
+        if len(set(seat_numbers)) != len(seat_numbers):
+            raise ValueError("Seat numbers must be unique.")
+        return seat_numbers
+
+class HoldRequest(GroupReserveRequest):
+    pass
+
+class ConfirmHoldRequest(GroupReserveRequest):
+    pass
+
+class WaitlistRequest(BaseModel):
+    trip_id: int
+
+class AutoReserveRequest(BaseModel):
+    trip_id: int
+    seat_count: int = Field(1, ge=1, le=MAX_GROUP_SEATS)
+    window: bool = Field(False, description="Prefer window seats")
+    adjacent: bool = Field(False, description="Prefer seats next to each other in the same row")
+
+    @model_validator(mode="after")
+    def adjacent_fits_in_a_row(self):
+        if self.adjacent and self.seat_count > SEATS_PER_ROW:
+            raise ValueError(f"At most {SEATS_PER_ROW} adjacent seats can be requested.")
+        return self
+
 class BookingResponse(BaseModel):
     id: int
     trip_id: int
@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+
+class TripSearchFilters(BaseModel):
+    origin: Optional[str] = None
+    destination: Optional[str] = None
+    departure_from: Optional[datetime] = None
+    departure_to: Optional[datetime] = None
+    min_seats: Optional[int] = None
+    min_price: Optional[int] = None
+    max_price: Optional[int] = None
+    # Only trips departing after this moment; None includes departed trips
+    not_before: Optional[datetime] = None
+
+    def cache_key(self) -> str:
+        """Compact, stable representation of the non-route filters for cache keys."""
+        parts = [
+            self.departure_from.isoformat() if self.departure_from else "",
+            self.departure_to.isoformat() if self.departure_to else "",
+            str(self.min_seats or ""),
+            str(self.min_price or ""),
+            str(self.max_price or ""),
+            self.not_before.isoformat() if self.not_before else "all",
+        ]
+        return "|".join(parts)
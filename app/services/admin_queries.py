@@ -25,10 +25,10 @@ CHECK_ROUTE = text("SELECT 1 FROM routes WHERE id = :rid")
 CHECK_BUS = text("SELECT 1 FROM buses WHERE id = :bid")
 
 
-# Create new trip
+# Create new trip (every seat starts free)
 CREATE_TRIP = text("""
-    INSERT INTO trips (route_id, bus_id, departure_time, arrival_time, price)
-    VALUES (:r, :b, :d, :a, :p) RETURNING id
+    INSERT INTO trips (route_id, bus_id, departure_time, arrival_time, price, seats_available)
+    VALUES (:r, :b, :d, :a, :p, :seats) RETURNING id
 """)
 
 
@@ -51,13 +51,77 @@ LIST_BUSES = text("SELECT id, plate_number, capacity, is_vip FROM buses ORDER BY
 GET_USER_BY_MOBILE = text("SELECT id FROM users WHERE mobile = :m")
 
 
-# Charge wallet
-CHARGE_WALLET = text("""
-    UPDATE wallets SET balance = balance + :amount 
-    WHERE user_id = :uid
+# Lock a trip before cancelling it. FOR UPDATE conflicts with the KEY SHARE lock
+# every booking takes on its trip, so in-flight bookings finish first.
+LOCK_TRIP_FOR_CANCELLATION = text("""
+    SELECT departure_time, cancelled_at
+    FROM trips
+    WHERE id = :tid
+    FOR UPDATE
 """)
 
 
-# Get wallet balance
-GET_WALLET_BALANCE = text("SELECT balance FROM wallets WHERE user_id = :uid")
-
+# Mark trip as cancelled
+MARK_TRIP_CANCELLED = text("UPDATE trips SET cancelled_at = NOW() WHERE id = :tid")
+
+
+# Cancel every booking of a trip, refund each affected wallet once (into its least
+# funded bucket, with one ledger row per booking) and free all seats
+CANCEL_TRIP_BOOKINGS = text("""
+    WITH cancelled AS (
+        UPDATE bookings
+        SET status = 'cancelled'
+        WHERE trip_id = :tid AND status IS DISTINCT FROM 'cancelled'
+        RETURNING id, user_id, price_paid
+    ),
+    totals AS (
+        SELECT user_id, SUM(price_paid) AS amount
+        FROM cancelled
+        GROUP BY user_id
+    ),
+    target AS (
+        SELECT DISTINCT ON (b.user_id) b.user_id, b.bucket
+        FROM wallet_buckets b
+        JOIN totals t ON t.user_id = b.user_id
+        ORDER BY b.user_id, b.balance
+    ),
+    -- Lock in (user_id, bucket) order so concurrent batches over overlapping users
+    -- queue behind each other instead of deadlocking
+    locked AS MATERIALIZED (
+        SELECT b.user_id, b.bucket
+        FROM wallet_buckets b
+        JOIN target g ON g.user_id = b.user_id AND g.bucket = b.bucket
+        ORDER BY b.user_id, b.bucket
+        FOR UPDATE OF b
+    ),
+    refunds AS (
+        UPDATE wallet_buckets b
+        SET balance = b.balance + t.amount
+        FROM totals t
+        JOIN locked g ON g.user_id = t.user_id
+        WHERE b.user_id = g.user_id AND b.bucket = g.bucket
+        RETURNING b.user_id
+    ),
+    ledger AS (
+        INSERT INTO wallet_transactions (user_id, amount, kind, reference)
+        SELECT user_id, price_paid, 'trip_cancellation', 'booking:' || id
+        FROM cancelled
+    ),
+    released AS (
+        UPDATE seats
+        SET is_reserved = false, held_by = NULL, held_until = NULL
+        WHERE trip_id = :tid AND is_reserved = true
+        RETURNING id
+    ),
+    counter AS (
+        UPDATE trips
+        SET seats_available = seats_available + (SELECT COUNT(*) FROM released)
+        WHERE id = :tid
+    )
+    SELECT
+        (SELECT COUNT(*) FROM cancelled) AS bookings_cancelled,
+        (SELECT COALESCE(SUM(price_paid), 0) FROM cancelled) AS total_refunded,
+        (SELECT COUNT(*) FROM refunds) AS wallets_credited,
+        (SELECT COUNT(*) FROM released) AS seats_released,
+        (SELECT ARRAY_AGG(user_id) FROM totals) AS user_ids
+""")
@@ -1,8 +1,17 @@
 # app/services/auth_service.py
+import time
+from typing import List
+
 from fastapi import HTTPException, status
 
-from app.crud.user import get_user_by_mobile, create_user_db
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.config import settings
+from app.crud.user import get_user_by_mobile, create_user_db, register_users, update_password_hash
+from app.core.redis import redis_client as redis
+from app.core.security import hash_password_async, verify_password_async, create_access_token
+
+
+def _denylist_key(jti: str) -> str:
+    return f"revoked_token:{jti}"
 
 
 async def register_user(mobile: str, role: str = "passenger"):
@@ -10,18 +19,16 @@ async def register_user(mobile: str, role: str = "passenger"):
     Register a new user with the given mobile number.
     Default password is '123456' (hashed). Wallet starts with 10,000,000 IRR.
     """
-    existing_user = await get_user_by_mobile(mobile)
-    if existing_user:
+    # Fixed default password: 123456 (securely hashed)
+    password_hash = await hash_password_async("123456")
+
+    # One statement; a taken mobile (even by a concurrent request) creates nothing
+    if not await create_user_db(mobile=mobile, password_hash=password_hash, role=role):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="This mobile number is already registered."
         )
 
-    # Fixed default password: 123456 (securely hashed)
-    password_hash = get_password_hash("123456")
-
-    await create_user_db(mobile=mobile, password_hash=password_hash, role=role)
-
     return {
         "message": "User registered successfully",
         "mobile": mobile,
@@ -31,20 +38,67 @@ async def register_user(mobile: str, role: str = "passenger"):
     }
 
 
+async def register_users_bulk(mobiles: List[str], role: str = "passenger"):
+    """
+    Register a partner's customer list. Mobiles that are already registered are
+    skipped. The default password is hashed once for the whole list, and users
+    are inserted BULK_REGISTER_CHUNK_SIZE per statement (one transaction each,
+    so a failed request can simply be retried).
+    """
+    mobiles = list(dict.fromkeys(mobiles))
+    password_hash = await hash_password_async("123456")
+
+    created = set()
+    chunk = settings.BULK_REGISTER_CHUNK_SIZE
+    for start in range(0, len(mobiles), chunk):
+        created.update(await register_users(mobiles[start:start + chunk], password_hash, role))
+
+    return {
+        "requested": len(mobiles),
+        "created": len(created),
+        "already_registered": [mobile for mobile in mobiles if mobile not in created],
+        "role": role,
+        "initial_wallet_balance": 10_000_000
+    }
+
+
 async def login_user(mobile: str, password: str):
     """
     Authenticate user and return JWT access token.
     """
     user = await get_user_by_mobile(mobile)
-    if not user or not verify_password(password, user.password_hash):
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await verify_password_async(password, user.password_hash)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid mobile number or password"
         )
 
-    access_token = create_access_token(data={"sub": mobile})
+    # Stored with an outdated bcrypt cost: upgrade it now that we have the plain password
+    if new_hash:
+        await update_password_hash(user.id, new_hash)
+
+    # The principal travels in the token, so authenticated requests don't load the user again
+    access_token = create_access_token(data={
+        "sub": mobile,
+        "uid": user.id,
+        "roles": sorted({profile.role for profile in user.profiles}),
+    })
 
     return {
         "access_token": access_token,
         "token_type": "bearer",
-    }
\ No newline at end of file
+    }
+
+
+async def revoke_token(jti: str, expires_at: float) -> None:
+    """Put a token on the denylist until it would have expired anyway."""
+    ttl = int(expires_at - time.time()) + 1
+    if ttl > 0:
+        await redis.set(_denylist_key(jti), 1, ex=ttl)
+
+
+async def is_token_revoked(jti: str) -> bool:
+    return bool(await redis.exists(_denylist_key(jti)))
@@ -0,0 +1,59 @@
+# app/services/booking_cache.py
+"""
+Versioned cache for a user's booking history (/booking/my-bookings).
+Every path that creates or cancels bookings bumps the owner's version, so the
+version alone identifies the current list and doubles as its ETag.
+"""
+import time
+from typing import Any, Dict, Iterable
+
+from app.db.session import AsyncSessionLocal
+from app.services.booking_queries import GET_USER_BOOKINGS
+from app.services.cache import TwoTierCache
+from app.services.version_counters import bump_versions, read_version
+
+# `can_cancel` flips when a trip departs without any write, so the list is also
+# keyed by a time window of this length
+USER_BOOKINGS_WINDOW_SECONDS = 60
+user_bookings_cache = TwoTierCache("my-bookings", ttl=USER_BOOKINGS_WINDOW_SECONDS)
+
+
+def _version_key(user_id: int) -> str:
+    return f"bookings_ver:{user_id}"
+
+
+async def user_bookings_version(user_id: int) -> str:
+    """Identity of the user's current booking list: version counter + time window."""
+    version = await read_version(_version_key(user_id))
+    return f"{version}.{int(time.time() // USER_BOOKINGS_WINDOW_SECONDS)}"
+
+
+async def bump_user_bookings_versions(user_ids: Iterable[int]) -> None:
+    await bump_versions(_version_key(user_id) for user_id in set(user_ids))
+
+
+async def get_user_bookings(user_id: int, version: str) -> Dict[str, Any]:
+    """Confirmed and cancelled bookings of the user, newest first."""
+    async def _load():
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(GET_USER_BOOKINGS, {"user_id": user_id})).fetchall()
+
+        bookings = [
+            {
+                "id": row[0],
+                "origin": row[1],
+                "destination": row[2],
+                "departure_time": row[3].isoformat() if row[3] else None,
+                "seat_number": row[4],
+                "price_paid": row[5],
+                "status": row[6] or "pending",
+                "can_cancel": bool(row[7])
+            }
+            for row in rows
+        ]
+        return {
+            "bookings": bookings,
+            "total": len(bookings)
+        }
+
+    return await user_bookings_cache.get_or_load(f"my-bookings:{user_id}:v{version}", _load)
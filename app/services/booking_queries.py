@@ -38,22 +38,302 @@ GET_BOOKING_FOR_CANCELLATION = text("""
 """)
 
 
-# Query to refund money to wallet
-REFUND_TO_WALLET = text("""
-    UPDATE wallets SET balance = balance + :amount WHERE user_id = :uid
+# Queue a cancellation for the refund worker (no-op if already queued)
+ENQUEUE_REFUND = text("""
+    INSERT INTO refund_outbox (booking_id) VALUES (:bid)
+    ON CONFLICT (booking_id) DO NOTHING
 """)
 
 
-# Query to mark booking as cancelled
-MARK_BOOKING_CANCELLED = text("""
-    UPDATE bookings SET status = 'cancelled' WHERE id = :bid
+# Refund worker: claim a batch of pending cancellations
+CLAIM_REFUND_BATCH = text("""
+    SELECT id, booking_id
+    FROM refund_outbox
+    WHERE processed_at IS NULL
+    ORDER BY id
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
 """)
 
 
-# Query to release seat
-RELEASE_SEAT = text("""
-    UPDATE seats 
-    SET is_reserved = false 
-    WHERE id = (SELECT seat_id FROM bookings WHERE id = :bid)
+# Refund worker: cancel the batch's bookings. Already cancelled bookings are
+# skipped, which makes re-delivered outbox rows harmless.
+CANCEL_BOOKINGS_BATCH = text("""
+    UPDATE bookings
+    SET status = 'cancelled'
+    WHERE id = ANY(CAST(:booking_ids AS integer[]))
+      AND status IS DISTINCT FROM 'cancelled'
+    RETURNING id, user_id, seat_id, price_paid
 """)
 
+
+# Refund worker: free the seats of the cancelled bookings
+RELEASE_SEATS_BATCH = text("""
+    UPDATE seats
+    SET is_reserved = false
+    WHERE id = ANY(CAST(:seat_ids AS integer[])) AND is_reserved = true
+    RETURNING trip_id, seat_number
+""")
+
+
+# Move trips.seats_available by a per-trip delta (batch workers touching many trips).
+# Trip rows are locked in id order so concurrent workers can't deadlock each other.
+ADJUST_SEATS_AVAILABLE = text("""
+    WITH delta AS (
+        SELECT trip_id, SUM(delta) AS delta
+        FROM unnest(CAST(:trip_ids AS integer[]), CAST(:deltas AS integer[])) AS d(trip_id, delta)
+        GROUP BY trip_id
+    ),
+    locked AS (
+        SELECT t.id
+        FROM trips t
+        JOIN delta d ON d.trip_id = t.id
+        ORDER BY t.id
+        FOR NO KEY UPDATE OF t
+    )
+    UPDATE trips t
+    SET seats_available = t.seats_available + d.delta
+    FROM delta d
+    WHERE t.id = d.trip_id AND t.id IN (SELECT id FROM locked)
+""")
+
+
+# Refund worker: mark the batch as done
+MARK_REFUNDS_PROCESSED = text("""
+    UPDATE refund_outbox SET processed_at = NOW() WHERE id = ANY(CAST(:ids AS integer[]))
+""")
+
+
+# Single round-trip reservation: checks seat and departure, then debits one
+# wallet bucket, reserves the seat, inserts the booking and its ledger row.
+# Writes only happen when status = 'ok'; otherwise status names the failed check.
+# 'wallet_slow_path' means no free bucket covers the price: the seat stays locked
+# and the caller debits through wallet_service instead.
+RESERVE_SEAT_SINGLE_STATEMENT = text("""
+    WITH target AS (
+        SELECT s.id AS seat_id, s.is_reserved, t.price, t.departure_time, t.cancelled_at
+        FROM seats s
+        JOIN trips t ON t.id = s.trip_id
+        WHERE s.trip_id = :trip_id AND s.seat_number = :seat_number
+        FOR UPDATE OF s FOR KEY SHARE OF t
+    ),
+    bucket AS (
+        SELECT bucket FROM wallet_buckets
+        WHERE user_id = :user_id AND balance >= (SELECT price FROM target)
+        ORDER BY random()
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ),
+    checks AS (
+        SELECT CASE
+            WHEN NOT EXISTS (SELECT 1 FROM target)
+                 OR (SELECT is_reserved FROM target) THEN 'seat_unavailable'
+            WHEN (SELECT cancelled_at FROM target) IS NOT NULL THEN 'trip_cancelled'
+            WHEN (SELECT departure_time FROM target) <= NOW() THEN 'departed'
+            WHEN NOT EXISTS (SELECT 1 FROM bucket) THEN 'wallet_slow_path'
+            ELSE 'ok'
+        END AS status
+    ),
+    debit AS (
+        UPDATE wallet_buckets SET balance = balance - (SELECT price FROM target)
+        WHERE user_id = :user_id AND bucket = (SELECT bucket FROM bucket)
+          AND (SELECT status FROM checks) = 'ok'
+        RETURNING user_id
+    ),
+    ledger AS (
+        INSERT INTO wallet_transactions (user_id, amount, kind, reference)
+        SELECT user_id, -(SELECT price FROM target), 'reservation', :reference
+        FROM debit
+    ),
+    reserve AS (
+        UPDATE seats SET is_reserved = true
+        WHERE id = (SELECT seat_id FROM target) AND (SELECT status FROM checks) = 'ok'
+        RETURNING id
+    ),
+    counter AS (
+        UPDATE trips SET seats_available = seats_available - 1
+        WHERE id = :trip_id AND EXISTS (SELECT 1 FROM reserve)
+    ),
+    booking AS (
+        INSERT INTO bookings (user_id, trip_id, seat_id, price_paid, booking_date, status)
+        SELECT :user_id, :trip_id, seat_id, price, :date, 'confirmed'
+        FROM target
+        WHERE (SELECT status FROM checks) = 'ok'
+        RETURNING id
+    )
+    SELECT
+        c.status,
+        (SELECT id FROM booking) AS booking_id,
+        (SELECT seat_id FROM target) AS seat_id,
+        (SELECT price FROM target) AS price,
+        CASE WHEN c.status = 'seat_unavailable' THEN ARRAY(
+            SELECT seat_number FROM seats
+            WHERE trip_id = :trip_id AND is_reserved = false
+            ORDER BY seat_number
+            LIMIT 20
+        ) END AS available_seats
+    FROM checks c
+""")
+
+
+# Group booking: lock the requested seats in a consistent (seat number) order.
+# Like every seat lookup below, the trip row is KEY SHARE locked (the same lock the
+# bookings.trip_id foreign key takes anyway), so an admin trip cancellation waits
+# for in-flight bookings and later ones see cancelled_at.
+LOCK_GROUP_SEATS = text("""
+    SELECT s.id AS seat_id, s.seat_number, s.is_reserved, t.price, t.departure_time, t.cancelled_at
+    FROM seats s
+    JOIN trips t ON t.id = s.trip_id
+    WHERE s.trip_id = :trip_id AND s.seat_number = ANY(CAST(:seat_numbers AS integer[]))
+    ORDER BY s.seat_number
+    FOR UPDATE OF s FOR KEY SHARE OF t
+""")
+
+
+# Mark every seat of the group as reserved (turning any hold into a booking).
+# Held seats already count as taken, so only previously free ones move the trip counter.
+RESERVE_SEATS = text("""
+    WITH reserved AS (
+        UPDATE seats s
+        SET is_reserved = true, held_by = NULL, held_until = NULL
+        FROM seats old
+        WHERE s.id = ANY(CAST(:seat_ids AS integer[])) AND old.id = s.id
+        RETURNING s.trip_id, old.is_reserved AS was_reserved
+    )
+    UPDATE trips t
+    SET seats_available = t.seats_available - n.newly_reserved
+    FROM (
+        SELECT trip_id, COUNT(*) FILTER (WHERE NOT was_reserved) AS newly_reserved
+        FROM reserved
+        GROUP BY trip_id
+    ) n
+    WHERE t.id = n.trip_id AND n.newly_reserved > 0
+""")
+
+
+# Insert all bookings of the group in one statement
+INSERT_GROUP_BOOKINGS = text("""
+    INSERT INTO bookings (user_id, trip_id, seat_id, price_paid, booking_date, status)
+    SELECT :uid, :tid, seat_id, :price, :date, 'confirmed'
+    FROM unnest(CAST(:seat_ids AS integer[])) AS seat_id
+    RETURNING id, seat_id
+""")
+
+
+# Auto-assignment: free seat numbers of a trip (no locks, used to plan adjacent blocks)
+GET_FREE_SEAT_NUMBERS = text("""
+    SELECT seat_number
+    FROM seats
+    WHERE trip_id = :trip_id AND is_reserved = false
+    ORDER BY seat_number
+""")
+
+
+# Auto-assignment: lock specific seats, skipping any another buyer holds
+LOCK_SEATS_SKIP_LOCKED = text("""
+    SELECT s.id AS seat_id, s.seat_number, t.price, t.departure_time, t.cancelled_at
+    FROM seats s
+    JOIN trips t ON t.id = s.trip_id
+    WHERE s.trip_id = :trip_id
+      AND s.seat_number = ANY(CAST(:seat_numbers AS integer[]))
+      AND s.is_reserved = false
+    ORDER BY s.seat_number
+    FOR UPDATE OF s SKIP LOCKED FOR KEY SHARE OF t
+""")
+
+
+# Auto-assignment: lock the best free seats, skipping rows other buyers hold.
+# Served by the ix_seats_trip_available partial index.
+PICK_FREE_SEATS_SKIP_LOCKED = text("""
+    SELECT s.id AS seat_id, s.seat_number, t.price, t.departure_time, t.cancelled_at
+    FROM seats s
+    JOIN trips t ON t.id = s.trip_id
+    WHERE s.trip_id = :trip_id AND s.is_reserved = false
+    ORDER BY (:window AND s.seat_number % :per_row IN (0, 1)) DESC, s.seat_number
+    LIMIT :count
+    FOR UPDATE OF s SKIP LOCKED FOR KEY SHARE OF t
+""")
+
+
+# Hold: mark already locked free seats as held by the user until :until
+HOLD_SEATS = text("""
+    WITH held AS (
+        UPDATE seats
+        SET is_reserved = true, held_by = :uid, held_until = :until
+        WHERE id = ANY(CAST(:seat_ids AS integer[])) AND is_reserved = false
+        RETURNING trip_id
+    )
+    UPDATE trips t
+    SET seats_available = t.seats_available - n.held
+    FROM (SELECT trip_id, COUNT(*) AS held FROM held GROUP BY trip_id) n
+    WHERE t.id = n.trip_id
+""")
+
+
+# Confirm: lock the user's unexpired holds in seat order
+LOCK_HELD_SEATS = text("""
+    SELECT s.id AS seat_id, s.seat_number, t.price, t.departure_time, t.cancelled_at
+    FROM seats s
+    JOIN trips t ON t.id = s.trip_id
+    WHERE s.trip_id = :trip_id
+      AND s.seat_number = ANY(CAST(:seat_numbers AS integer[]))
+      AND s.held_by = :uid
+      AND s.held_until > NOW()
+    ORDER BY s.seat_number
+    FOR UPDATE OF s FOR KEY SHARE OF t
+""")
+
+
+# Sweeper: free one batch of expired holds (uses the ix_seats_held_until partial index).
+# SKIP LOCKED lets several sweepers run side by side and never waits on a confirm in progress.
+RELEASE_EXPIRED_HOLDS = text("""
+    WITH expired AS (
+        SELECT id
+        FROM seats
+        WHERE held_until < NOW()
+        ORDER BY held_until
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE seats s
+    SET is_reserved = false, held_by = NULL, held_until = NULL
+    FROM expired
+    WHERE s.id = expired.id
+    RETURNING s.trip_id, s.seat_number
+""")
+
+
+# Waitlist: is the trip still bookable, and how many seats are free right now?
+GET_TRIP_FOR_WAITLIST = text("""
+    SELECT departure_time, cancelled_at, seats_available AS free_seats
+    FROM trips
+    WHERE id = :trip_id
+""")
+
+
+# Waitlist promotion: hold freed seats for the next waiting users (seat_numbers[i] -> user_ids[i]).
+# Seats taken again in the meantime are skipped. The trip row is locked (NO KEY UPDATE,
+# since its seat counter changes too), so a trip cancellation can't slip in between.
+PROMOTE_WAITLIST_HOLDS = text("""
+    WITH trip AS (
+        SELECT id FROM trips
+        WHERE id = :trip_id AND cancelled_at IS NULL AND departure_time > NOW()
+        FOR NO KEY UPDATE
+    ),
+    promoted AS (
+        UPDATE seats s
+        SET is_reserved = true, held_by = p.user_id, held_until = :until
+        FROM unnest(CAST(:seat_numbers AS integer[]), CAST(:user_ids AS integer[])) AS p(seat_number, user_id),
+             trip
+        WHERE s.trip_id = trip.id
+          AND s.seat_number = p.seat_number
+          AND s.is_reserved = false
+        RETURNING s.seat_number, s.held_by
+    ),
+    counter AS (
+        UPDATE trips
+        SET seats_available = seats_available - (SELECT COUNT(*) FROM promoted)
+        WHERE id = (SELECT id FROM trip) AND EXISTS (SELECT 1 FROM promoted)
+    )
+    SELECT seat_number, held_by FROM promoted
+""")
@@ -1,11 +1,61 @@
 # app/services/booking_service.py
 from fastapi import HTTPException, status
 from sqlalchemy import text
-from datetime import date, datetime, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta, timezone
+from collections import defaultdict
+from typing import Awaitable, Callable, List, Optional
 
+from app.core.config import settings
 from app.db.session import AsyncSessionLocal
-from app.services.rate_limit import check_daily_limit, increment_daily_limit
-from app.services.seat_lock import acquire_seat_lock, release_seat_lock
+from app.services.booking_queries import (
+    RESERVE_SEAT_SINGLE_STATEMENT,
+    LOCK_GROUP_SEATS,
+    RESERVE_SEATS,
+    INSERT_GROUP_BOOKINGS,
+    GET_FREE_SEAT_NUMBERS,
+    LOCK_SEATS_SKIP_LOCKED,
+    PICK_FREE_SEATS_SKIP_LOCKED,
+    HOLD_SEATS,
+    LOCK_HELD_SEATS,
+    RELEASE_EXPIRED_HOLDS,
+    ADJUST_SEATS_AVAILABLE
+)
+from app.schemas.booking import SEATS_PER_ROW
+from app.services.rate_limit import check_daily_limit, daily_booking_quota
+from app.services.seat_lock import (
+    acquire_seat_lock,
+    release_seat_lock,
+    acquire_seat_locks,
+    release_seat_locks
+)
+from app.services.seat_inventory import CLAIM_OK, claim_seats, release_seats, mark_seats_taken
+from app.services.booking_cache import bump_user_bookings_versions
+from app.services.trip_cache import bump_seat_map_versions
+from app.services.trip_events import trips_changed
+from app.services.waitlist import offer_released_seats
+from app.services.wallet_service import debit_wallet
+
+# How many adjacent blocks to try before falling back to any free seats
+MAX_ADJACENT_ATTEMPTS = 5
+
+TRIP_CANCELLED_MESSAGE = "This trip has been cancelled. Booking is no longer available."
+
+
+class SeatUnavailableError(HTTPException):
+    """Raised when a requested seat does not exist or is already taken."""
+
+    def __init__(self, available_seats: List[int], unavailable_seats: Optional[List[int]] = None):
+        detail = {
+            "message": "This seat is no longer available.",
+            "available_seats": available_seats,
+            "tip": "Please select one of the available seats."
+        }
+        if unavailable_seats is not None:
+            detail["message"] = "Some of the requested seats are no longer available."
+            detail["unavailable_seats"] = unavailable_seats
+        super().__init__(status_code=400, detail=detail)
+        self.unavailable_seats = unavailable_seats
 
 
 async def reserve_seat(user_id: int, trip_id: int, seat_number: int) -> dict:
@@ -13,119 +63,507 @@ async def reserve_seat(user_id: int, trip_id: int, seat_number: int) -> dict:
     Atomically reserve a specific seat for a trip.
     Features:
     - Redis-based daily booking limit
-    - Redis distributed lock for seat concurrency safety
+    - Redis distributed lock (or seat bitmap) for seat concurrency safety
     - Database row-level locking (FOR UPDATE)
     - Wallet balance check and deduction
     - Returns helpful available seats on conflict
     """
-    # 1. Check daily booking limit (Redis)
-    await check_daily_limit(user_id)
+    # Reserve one booking of the daily limit (Redis); handed back if the booking fails
+    async with daily_booking_quota(user_id):
+        if settings.SEAT_INVENTORY_ENABLED:
+            result = await _reserve_with_inventory(user_id, trip_id, seat_number)
+        else:
+            result = await _reserve_with_lock(user_id, trip_id, seat_number)
 
-    # 2. Acquire distributed lock for this specific seat
-    lock_key, lock_value = await acquire_seat_lock(trip_id, seat_number)
+    await bump_user_bookings_versions([user_id])
+    await trips_changed([trip_id])
 
-    try:
+    return {
+        "message": "Seat successfully reserved!",
+        "booking_id": result["booking_id"],
+        "trip_id": trip_id,
+        "seat_number": seat_number,
+        "price_paid": result["price_paid"]
+    }
+
+
+async def reserve_group_seats(user_id: int, trip_id: int, seat_numbers: List[int]) -> dict:
+    """
+    Reserve several seats of one trip for the same user, all-or-nothing.
+    Seats are locked in ascending order, the wallet is debited once and all
+    bookings are inserted in a single statement. Each seat counts against the
+    daily booking limit.
+    """
+    seat_numbers = sorted(seat_numbers)
+    async with daily_booking_quota(user_id, seats=len(seat_numbers)):
+        if settings.SEAT_INVENTORY_ENABLED:
+            bookings, price = await _with_claimed_seats(
+                trip_id, seat_numbers, lambda: _write_group_booking(user_id, trip_id, seat_numbers)
+            )
+        else:
+            locks = await acquire_seat_locks(trip_id, seat_numbers)
+            try:
+                bookings, price = await _write_group_booking(user_id, trip_id, seat_numbers)
+            finally:
+                await release_seat_locks(locks)
+
+    await bump_user_bookings_versions([user_id])
+    await trips_changed([trip_id])
+
+    return {
+        "message": f"{len(bookings)} seats successfully reserved!",
+        "trip_id": trip_id,
+        "bookings": bookings,
+        "price_per_seat": price,
+        "total_paid": price * len(bookings)
+    }
+
+
+async def reserve_best_available(
+    user_id: int,
+    trip_id: int,
+    seat_count: int = 1,
+    window: bool = False,
+    adjacent: bool = False
+) -> dict:
+    """
+    Let the server pick seats for the user.
+    Free seats are locked with FOR UPDATE SKIP LOCKED, so concurrent buyers
+    never queue on the same row — each one simply gets the next free seat.
+    Window and adjacency are preferences: if they can't be met the best
+    remaining free seats are booked and `preferences_met` is False.
+    """
+    async with daily_booking_quota(user_id, seats=seat_count):
         async with AsyncSessionLocal() as db:
             async with db.begin():
-                # 3. Fetch seat status and trip price (with row lock)
-                seat_result = await db.execute(text("""
-                    SELECT s.id AS seat_id, s.is_reserved, t.price, t.departure_time
-                    FROM seats s
-                    JOIN trips t ON t.id = s.trip_id
-                    WHERE s.trip_id = :trip_id AND s.seat_number = :seat_number
-                    FOR UPDATE
-                """), {"trip_id": trip_id, "seat_number": seat_number})
-
-                seat_row = seat_result.fetchone()
-
-                # 4. Seat not found or already reserved → return available seats
-                if not seat_row or seat_row.is_reserved:
-                    available_result = await db.execute(text("""
-                        SELECT seat_number
-                        FROM seats
-                        WHERE trip_id = :trip_id AND is_reserved = false
-                        ORDER BY seat_number
-                        LIMIT 20
-                    """), {"trip_id": trip_id})
-
-                    available_seats = [row.seat_number for row in available_result.fetchall()]
+                seat_rows = None
+                if adjacent and seat_count > 1:
+                    seat_rows = await _lock_adjacent_block(db, trip_id, seat_count, window)
+
+                preferences_met = seat_rows is not None
+                if seat_rows is None:
+                    seat_rows = (await db.execute(PICK_FREE_SEATS_SKIP_LOCKED, {
+                        "trip_id": trip_id,
+                        "count": seat_count,
+                        "window": window,
+                        "per_row": SEATS_PER_ROW
+                    })).fetchall()
+                    preferences_met = not adjacent or seat_count == 1
+                    if window:
+                        preferences_met = preferences_met and all(
+                            _is_window_seat(row.seat_number) for row in seat_rows
+                        )
 
+                if len(seat_rows) < seat_count:
                     raise HTTPException(
                         status_code=400,
                         detail={
-                            "message": "This seat is no longer available.",
-                            "available_seats": available_seats,
-                            "tip": "Please select one of the available seats."
+                            "message": "Not enough free seats left on this trip.",
+                            "requested": seat_count,
+                            "available": len(seat_rows)
                         }
                     )
 
-                seat_id = seat_row.seat_id
-                price = seat_row.price
-                departure_time = seat_row.departure_time
+                bookings, price = await _book_locked_seats(db, user_id, trip_id, seat_rows)
 
-                if departure_time <= datetime.now(timezone.utc):
-                    raise HTTPException(
-                        status_code=400,
-                        detail="This trip has already departed. Booking is no longer available."
-                    )
+    seat_numbers = [booking["seat_number"] for booking in bookings]
+    if settings.SEAT_INVENTORY_ENABLED:
+        await mark_seats_taken(trip_id, seat_numbers)
+
+    await bump_user_bookings_versions([user_id])
+    await trips_changed([trip_id])
+
+    return {
+        "message": f"{len(bookings)} seat(s) successfully reserved!",
+        "trip_id": trip_id,
+        "seat_numbers": seat_numbers,
+        "bookings": bookings,
+        "preferences_met": preferences_met,
+        "price_per_seat": price,
+        "total_paid": price * len(bookings)
+    }
+
+
+def _is_window_seat(seat_number: int) -> bool:
+    return seat_number % SEATS_PER_ROW in (0, 1)
+
+
+def _adjacent_blocks(free_seats: List[int], seat_count: int, window: bool) -> List[List[int]]:
+    """
+    Consecutive free seat numbers within one row, front rows first.
+    Blocks that don't straddle the aisle are preferred, and with `window`
+    blocks containing a window seat are tried first.
+    """
+    free = set(free_seats)
+    aisle = SEATS_PER_ROW // 2
+    blocks = []
+    for first in free_seats:
+        block = list(range(first, first + seat_count))
+        same_row = (block[0] - 1) // SEATS_PER_ROW == (block[-1] - 1) // SEATS_PER_ROW
+        if same_row and all(seat in free for seat in block):
+            blocks.append(block)
 
-                # 5. Check wallet balance (with lock)
-                wallet_result = await db.execute(text("""
-                    SELECT balance FROM wallets WHERE user_id = :user_id FOR UPDATE
-                """), {"user_id": user_id})
+    def preference(block: List[int]) -> tuple:
+        straddles_aisle = (block[0] - 1) % SEATS_PER_ROW < aisle <= (block[-1] - 1) % SEATS_PER_ROW
+        has_window = any(_is_window_seat(seat) for seat in block)
+        return (window and not has_window, straddles_aisle)
 
-                wallet_row = wallet_result.fetchone()
-                if not wallet_row:
-                    raise HTTPException(status_code=404, detail="Wallet not found.")
+    # sort() is stable, so front rows still come first within each group
+    blocks.sort(key=preference)
+    return blocks
 
-                if wallet_row.balance < price:
+
+async def _lock_adjacent_block(db: AsyncSession, trip_id: int, seat_count: int, window: bool):
+    free_result = await db.execute(GET_FREE_SEAT_NUMBERS, {"trip_id": trip_id})
+    free_seats = [row.seat_number for row in free_result.fetchall()]
+
+    for block in _adjacent_blocks(free_seats, seat_count, window)[:MAX_ADJACENT_ATTEMPTS]:
+        rows = (await db.execute(
+            LOCK_SEATS_SKIP_LOCKED, {"trip_id": trip_id, "seat_numbers": block}
+        )).fetchall()
+        if len(rows) == seat_count:
+            return rows
+        # Someone else holds part of this block; any rows we did lock stay
+        # ours until commit and may still be picked by the fallback query.
+    return None
+
+
+async def hold_seats(user_id: int, trip_id: int, seat_numbers: List[int]) -> dict:
+    """
+    Put seats in the user's cart for SEAT_HOLD_MINUTES without charging the wallet.
+    Held seats count as taken for everyone else; confirm_hold turns them into
+    bookings, and the hold sweeper frees them once the hold expires.
+    """
+    seat_numbers = sorted(seat_numbers)
+    await check_daily_limit(user_id, seats=len(seat_numbers))
+
+    async def _write_hold():
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                seat_rows = await _lock_free_seats(db, trip_id, seat_numbers)
+
+                _ensure_trip_bookable(seat_rows[0])
+
+                held_until = datetime.now(timezone.utc) + timedelta(minutes=settings.SEAT_HOLD_MINUTES)
+                await db.execute(HOLD_SEATS, {
+                    "uid": user_id,
+                    "until": held_until,
+                    "seat_ids": [row.seat_id for row in seat_rows]
+                })
+                return held_until, seat_rows[0].price
+
+    if settings.SEAT_INVENTORY_ENABLED:
+        held_until, price = await _with_claimed_seats(trip_id, seat_numbers, _write_hold)
+    else:
+        held_until, price = await _write_hold()
+
+    await trips_changed([trip_id])
+
+    return {
+        "message": f"{len(seat_numbers)} seat(s) held. Confirm before the hold expires.",
+        "trip_id": trip_id,
+        "seat_numbers": seat_numbers,
+        "held_until": held_until.isoformat(),
+        "price_per_seat": price,
+        "total_price": price * len(seat_numbers)
+    }
+
+
+async def confirm_hold(user_id: int, trip_id: int, seat_numbers: List[int]) -> dict:
+    """
+    Pay for seats held by the user and turn the hold into bookings.
+    Fails with 410 if any of the holds has expired or was never made.
+    """
+    seat_numbers = sorted(seat_numbers)
+    async with daily_booking_quota(user_id, seats=len(seat_numbers)):
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                seat_rows = (await db.execute(LOCK_HELD_SEATS, {
+                    "trip_id": trip_id,
+                    "seat_numbers": seat_numbers,
+                    "uid": user_id
+                })).fetchall()
+
+                if len(seat_rows) != len(seat_numbers):
+                    held = {row.seat_number for row in seat_rows}
                     raise HTTPException(
-                        status_code=400,
+                        status_code=status.HTTP_410_GONE,
                         detail={
-                            "message": "Insufficient wallet balance.",
-                            "required": price,
-                            "current_balance": wallet_row.balance
+                            "message": "Your hold on these seats has expired or does not exist.",
+                            "missing_seats": [n for n in seat_numbers if n not in held]
                         }
                     )
 
-                # 6. Deduct payment
-                await db.execute(text("""
-                    UPDATE wallets SET balance = balance - :price WHERE user_id = :user_id
-                """), {"price": price, "user_id": user_id})
-
-                # 7. Reserve the seat
-                await db.execute(text("""
-                    UPDATE seats SET is_reserved = true WHERE id = :seat_id
-                """), {"seat_id": seat_id})
-
-                # 8. Create booking record
-                booking_result = await db.execute(text("""
-                    INSERT INTO bookings (
-                        user_id, trip_id, seat_id, price_paid, booking_date, status
-                    ) VALUES (:user_id, :trip_id, :seat_id, :price, :date, 'confirmed')
-                    RETURNING id
-                """), {
-                    "user_id": user_id,
-                    "trip_id": trip_id,
-                    "seat_id": seat_id,
-                    "price": price,
-                    "date": date.today()
-                })
+                bookings, price = await _book_locked_seats(db, user_id, trip_id, seat_rows)
 
-                booking_id = booking_result.scalar_one()
+    await bump_user_bookings_versions([user_id])
+    # Free-seat counts are unchanged (held seats were already taken); only the seat map moves
+    await bump_seat_map_versions([trip_id])
 
-        # 9. Increment daily booking counter (only on full success)
-        await increment_daily_limit(user_id)
+    return {
+        "message": f"{len(bookings)} seat(s) successfully reserved!",
+        "trip_id": trip_id,
+        "bookings": bookings,
+        "price_per_seat": price,
+        "total_paid": price * len(bookings)
+    }
 
-        # 10. Success response
-        return {
-            "message": "Seat successfully reserved!",
-            "booking_id": booking_id,
-            "trip_id": trip_id,
-            "seat_number": seat_number,
-            "price_paid": price
-        }
 
+async def release_expired_holds(batch_size: int) -> int:
+    """
+    Free every expired hold, one set-based UPDATE per batch of `batch_size` seats.
+    Each batch commits on its own so locks are short; freed seats are offered to
+    the trip's waitlist first. Returns the number of seats freed.
+    """
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                rows = (await db.execute(RELEASE_EXPIRED_HOLDS, {"batch_size": batch_size})).fetchall()
+                if rows:
+                    await db.execute(ADJUST_SEATS_AVAILABLE, {
+                        "trip_ids": [row.trip_id for row in rows],
+                        "deltas": [1] * len(rows)
+                    })
+
+        total += len(rows)
+        seats_by_trip = defaultdict(list)
+        for row in rows:
+            seats_by_trip[row.trip_id].append(row.seat_number)
+        for trip_id, trip_seats in seats_by_trip.items():
+            await offer_released_seats(trip_id, trip_seats)
+        await trips_changed(seats_by_trip)
+
+        if len(rows) < batch_size:
+            return total
+
+
+async def _with_claimed_seats(trip_id: int, seat_numbers: List[int], write: Callable[[], Awaitable]):
+    """
+    Claim seats in the Redis bitmap, then run the Postgres write.
+    Losers are rejected without touching Postgres; if the write fails for any
+    reason other than the seat being taken, the bits are handed back.
+    """
+    claim_status, available_seats = await claim_seats(trip_id, seat_numbers)
+    if claim_status != CLAIM_OK:
+        raise SeatUnavailableError(available_seats)
+
+    try:
+        return await write()
+    except SeatUnavailableError as exc:
+        # Postgres says these seats are taken (or don't exist), so their bits stay set;
+        # the rest of the claim was never booked and is handed back
+        if exc.unavailable_seats is not None:
+            unbooked = sorted(set(seat_numbers) - set(exc.unavailable_seats))
+            if unbooked:
+                await release_seats(trip_id, unbooked)
+        raise
+    except Exception:
+        # Payment or trip checks failed: hand the seats back
+        await release_seats(trip_id, seat_numbers)
+        raise
+
+
+async def _lock_free_seats(db: AsyncSession, trip_id: int, seat_numbers: List[int]):
+    """Lock the requested seats in seat order; raise if any is missing or taken."""
+    seat_result = await db.execute(
+        LOCK_GROUP_SEATS, {"trip_id": trip_id, "seat_numbers": seat_numbers}
+    )
+    seat_rows = seat_result.fetchall()
+
+    free_rows = [row for row in seat_rows if not row.is_reserved]
+    if len(free_rows) != len(seat_numbers):
+        free_numbers = {row.seat_number for row in free_rows}
+        raise SeatUnavailableError(
+            await get_available_seat_numbers(db, trip_id),
+            unavailable_seats=[n for n in seat_numbers if n not in free_numbers]
+        )
+    return seat_rows
+
+
+async def _write_group_booking(user_id: int, trip_id: int, seat_numbers: List[int]):
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            seat_rows = await _lock_free_seats(db, trip_id, seat_numbers)
+            return await _book_locked_seats(db, user_id, trip_id, seat_rows)
+
+
+async def _book_locked_seats(db: AsyncSession, user_id: int, trip_id: int, seat_rows) -> tuple:
+    """
+    Charge the wallet once and book already locked, free seats.
+    `seat_rows` need seat_id, seat_number, price, departure_time and cancelled_at.
+    Returns (bookings sorted by seat number, price per seat).
+    """
+    price = seat_rows[0].price
+    _ensure_trip_bookable(seat_rows[0])
+
+    await debit_wallet(db, user_id, price * len(seat_rows), "reservation", f"trip:{trip_id}")
+
+    seat_ids = [row.seat_id for row in seat_rows]
+    await db.execute(RESERVE_SEATS, {"seat_ids": seat_ids})
+    booking_result = await db.execute(INSERT_GROUP_BOOKINGS, {
+        "uid": user_id,
+        "tid": trip_id,
+        "price": price,
+        "date": date.today(),
+        "seat_ids": seat_ids
+    })
+
+    seat_number_by_id = {row.seat_id: row.seat_number for row in seat_rows}
+    bookings = sorted(
+        (
+            {"booking_id": row.id, "seat_number": seat_number_by_id[row.seat_id]}
+            for row in booking_result.fetchall()
+        ),
+        key=lambda booking: booking["seat_number"]
+    )
+    return bookings, price
+
+
+async def _reserve_with_lock(user_id: int, trip_id: int, seat_number: int) -> dict:
+    # Acquire distributed lock for this specific seat
+    lock_key, lock_value = await acquire_seat_lock(trip_id, seat_number)
+
+    try:
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                return await _write_booking(db, user_id, trip_id, seat_number)
     finally:
         # Always release the Redis lock
-        await release_seat_lock(lock_key, lock_value)
\ No newline at end of file
+        await release_seat_lock(lock_key, lock_value)
+
+
+async def _reserve_with_inventory(user_id: int, trip_id: int, seat_number: int) -> dict:
+    async def _write():
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                return await _write_booking(db, user_id, trip_id, seat_number)
+
+    return await _with_claimed_seats(trip_id, [seat_number], _write)
+
+
+async def _write_booking(db: AsyncSession, user_id: int, trip_id: int, seat_number: int) -> dict:
+    """
+    Check seat, trip and wallet, then debit the wallet, reserve the seat and
+    insert the booking. Must run inside a transaction.
+    """
+    if settings.RESERVATION_MODE == "single_statement":
+        return await _write_booking_single_statement(db, user_id, trip_id, seat_number)
+    return await _write_booking_classic(db, user_id, trip_id, seat_number)
+
+
+async def _write_booking_classic(db: AsyncSession, user_id: int, trip_id: int, seat_number: int) -> dict:
+    # Fetch seat status and trip price (with row lock)
+    seat_result = await db.execute(text("""
+        SELECT s.id AS seat_id, s.is_reserved, t.price, t.departure_time, t.cancelled_at
+        FROM seats s
+        JOIN trips t ON t.id = s.trip_id
+        WHERE s.trip_id = :trip_id AND s.seat_number = :seat_number
+        FOR UPDATE OF s FOR KEY SHARE OF t
+    """), {"trip_id": trip_id, "seat_number": seat_number})
+
+    seat_row = seat_result.fetchone()
+
+    # Seat not found or already reserved → return available seats
+    if not seat_row or seat_row.is_reserved:
+        raise SeatUnavailableError(await get_available_seat_numbers(db, trip_id))
+
+    seat_id = seat_row.seat_id
+    price = seat_row.price
+
+    _ensure_trip_bookable(seat_row)
+
+    # Deduct payment
+    await debit_wallet(db, user_id, price, "reservation", f"trip:{trip_id}")
+
+    # Reserve the seat and take it off the trip's free-seat counter
+    await db.execute(text("""
+        WITH reserve AS (
+            UPDATE seats SET is_reserved = true WHERE id = :seat_id RETURNING trip_id
+        )
+        UPDATE trips SET seats_available = seats_available - 1
+        WHERE id = (SELECT trip_id FROM reserve)
+    """), {"seat_id": seat_id})
+
+    # Create booking record
+    booking_result = await db.execute(text("""
+        INSERT INTO bookings (
+            user_id, trip_id, seat_id, price_paid, booking_date, status
+        ) VALUES (:user_id, :trip_id, :seat_id, :price, :date, 'confirmed')
+        RETURNING id
+    """), {
+        "user_id": user_id,
+        "trip_id": trip_id,
+        "seat_id": seat_id,
+        "price": price,
+        "date": date.today()
+    })
+
+    return {"booking_id": booking_result.scalar_one(), "price_paid": price}
+
+
+async def _write_booking_single_statement(
+    db: AsyncSession, user_id: int, trip_id: int, seat_number: int
+) -> dict:
+    """Same checks and writes as the classic path, in one CTE round trip."""
+    reference = f"trip:{trip_id}"
+    result = await db.execute(RESERVE_SEAT_SINGLE_STATEMENT, {
+        "user_id": user_id,
+        "trip_id": trip_id,
+        "seat_number": seat_number,
+        "reference": reference,
+        "date": date.today()
+    })
+    row = result.fetchone()
+
+    if row.status == "seat_unavailable":
+        raise SeatUnavailableError(list(row.available_seats or []))
+
+    if row.status == "trip_cancelled":
+        raise HTTPException(status_code=400, detail=TRIP_CANCELLED_MESSAGE)
+
+    if row.status == "departed":
+        raise HTTPException(
+            status_code=400,
+            detail="This trip has already departed. Booking is no longer available."
+        )
+
+    if row.status == "wallet_slow_path":
+        # The seat is locked by the statement above; finish with the regular ledger debit
+        await debit_wallet(db, user_id, row.price, "reservation", reference)
+        await db.execute(RESERVE_SEATS, {"seat_ids": [row.seat_id]})
+        booking_result = await db.execute(INSERT_GROUP_BOOKINGS, {
+            "uid": user_id,
+            "tid": trip_id,
+            "price": row.price,
+            "date": date.today(),
+            "seat_ids": [row.seat_id]
+        })
+        return {"booking_id": booking_result.fetchone().id, "price_paid": row.price}
+
+    return {"booking_id": row.booking_id, "price_paid": row.price}
+
+
+def _ensure_trip_bookable(seat_row) -> None:
+    """Reject bookings on cancelled or departed trips (row needs departure_time and cancelled_at)."""
+    if seat_row.cancelled_at is not None:
+        raise HTTPException(status_code=400, detail=TRIP_CANCELLED_MESSAGE)
+
+    if seat_row.departure_time <= datetime.now(timezone.utc):
+        raise HTTPException(
+            status_code=400,
+            detail="This trip has already departed. Booking is no longer available."
+        )
+
+
+async def get_available_seat_numbers(db: AsyncSession, trip_id: int, limit: int = 20) -> List[int]:
+    """Return up to `limit` free seat numbers for a trip, lowest first."""
+    available_result = await db.execute(text("""
+        SELECT seat_number
+        FROM seats
+        WHERE trip_id = :trip_id AND is_reserved = false
+        ORDER BY seat_number
+        LIMIT :limit
+    """), {"trip_id": trip_id, "limit": limit})
+
+    return [row.seat_number for row in available_result.fetchall()]
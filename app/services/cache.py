@@ -0,0 +1,115 @@
+# app/services/cache.py
+"""
+Two-tier read cache: a small in-process LRU in front of Redis.
+Hot keys are served from process memory without a Redis round trip, and
+concurrent misses for the same key share one loader instead of all running
+the same heavy query (single-flight). Optionally, an expired local entry is
+served once more while it is refreshed in the background
+(stale-while-revalidate).
+Each entry also carries a strong ETag, hashed once from its JSON when the
+entry is filled, for resources that have no version counter of their own.
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from app.core.conditional import make_etag
+from app.core.config import settings
+from app.core.redis import redis_client as redis
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+class TwoTierCache:
+    """
+    `ttl` is how long values live in Redis; the local copy lives for at most
+    L1_CACHE_TTL_SECONDS so processes never drift far apart. With
+    `stale_seconds`, an expired local entry is still served for that long
+    while one background task reloads it. Values must be JSON-serializable;
+    None is never cached.
+    """
+
+    def __init__(self, name: str, ttl: int, stale_seconds: int = 0, max_entries: Optional[int] = None):
+        self.name = name
+        self.ttl = ttl
+        self.local_ttl = min(settings.L1_CACHE_TTL_SECONDS, ttl)
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries or settings.L1_CACHE_MAX_ENTRIES
+        # key -> (value, etag, fresh_until, stale_until)
+        self._entries: "OrderedDict[str, Tuple[Any, str, float, float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    async def get_or_load(self, key: str, loader: Loader) -> Any:
+        value, _ = await self.get_or_load_with_etag(key, loader)
+        return value
+
+    async def get_or_load_with_etag(self, key: str, loader: Loader) -> Tuple[Any, Optional[str]]:
+        """Same as get_or_load, plus the entry's ETag (None when nothing was cached)."""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, etag, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self._entries.move_to_end(key)
+                return value, etag
+            if now < stale_until:
+                # Serve the old value once more; one task refreshes it
+                if key not in self._inflight:
+                    task = self._start_load(key, loader)
+                    self._background.add(task)
+                    task.add_done_callback(self._finish_background)
+                return value, etag
+            del self._entries[key]
+
+        task = self._inflight.get(key) or self._start_load(key, loader)
+        # shield: a cancelled caller must not cancel the load other callers wait on
+        return await asyncio.shield(task)
+
+    def invalidate_local(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def _start_load(self, key: str, loader: Loader) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key, loader))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    def _finish_background(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Background refresh of {self.name} cache failed: {task.exception()!r}")
+
+    async def _load(self, key: str, loader: Loader) -> Tuple[Any, Optional[str]]:
+        try:
+            payload = await redis.get(key)
+        except Exception:
+            payload = None
+
+        if payload is not None:
+            value = json.loads(payload)
+        else:
+            value = await loader()
+            if value is None:
+                return None, None
+            payload = json.dumps(value, default=str)
+            # Keep exactly what Redis would return, so both tiers agree
+            value = json.loads(payload)
+            try:
+                await redis.set(key, payload, ex=self.ttl)
+            except Exception:
+                pass
+
+        etag = make_etag(payload)
+        self._remember(key, value, etag)
+        return value, etag
+
+    def _remember(self, key: str, value: Any, etag: str) -> None:
+        now = time.monotonic()
+        fresh_until = now + self.local_ttl
+        self._entries[key] = (value, etag, fresh_until, fresh_until + self.stale_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,328 @@
+# app/services/connection_search.py
+"""
+Connection (multi-leg) search over an in-memory index of upcoming trips.
+Each process keeps every open trip of the next CONNECTION_INDEX_HORIZON_DAYS
+grouped by origin city and sorted by departure, so finding the onward legs of
+an arrival is a binary search instead of a recursive SQL query. The index is
+topped up with newly created trips every CONNECTION_INDEX_REFRESH_SECONDS and
+rebuilt every CONNECTION_INDEX_FULL_RELOAD_SECONDS; seat counts and
+cancellations of the returned legs are re-checked against the database on
+every search.
+"""
+import asyncio
+import heapq
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Literal, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+
+# Candidates checked against the database per requested result, to make up for
+# legs that sold out since the index was loaded
+CANDIDATES_PER_RESULT = 3
+
+LOAD_UPCOMING_TRIPS = text("""
+    SELECT t.id, r.origin, r.destination, t.departure_time, t.arrival_time, t.price, t.seats_available
+    FROM trips t
+    JOIN routes r ON r.id = t.route_id
+    WHERE t.cancelled_at IS NULL
+      AND t.departure_time > NOW()
+      AND t.departure_time < NOW() + make_interval(days => :horizon_days)
+      AND t.id > :after_id
+""")
+
+CHECK_LEG_TRIPS = text("""
+    SELECT id, seats_available
+    FROM trips
+    WHERE id = ANY(CAST(:trip_ids AS integer[]))
+      AND cancelled_at IS NULL
+      AND departure_time > NOW()
+""")
+
+
+class Leg(NamedTuple):
+    departure: float  # epoch seconds; first so legs sort by departure
+    trip_id: int
+    origin: str
+    destination: str
+    arrival: float
+    price: int
+
+
+class ConnectionIndex:
+    def __init__(self):
+        self._legs: Dict[str, List[Leg]] = {}
+        # destination city -> origin cities with a direct trip to it
+        self._feeders: Dict[str, Set[str]] = defaultdict(set)
+        # Kept apart from the legs so fresh counts can be recorded without re-sorting
+        self._seats: Dict[int, int] = {}
+        self._max_trip_id = 0
+        # None until the first load, whatever the monotonic clock reads at startup
+        self._refreshed_at: Optional[float] = None
+        self._reloaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self, now: float) -> bool:
+        return (
+            self._refreshed_at is not None
+            and now - self._refreshed_at < settings.CONNECTION_INDEX_REFRESH_SECONDS
+        )
+
+    async def ensure_fresh(self) -> None:
+        if self._is_fresh(time.monotonic()):
+            return
+
+        async with self._lock:
+            now = time.monotonic()
+            if self._is_fresh(now):
+                return
+            if self._reloaded_at is None or now - self._reloaded_at >= settings.CONNECTION_INDEX_FULL_RELOAD_SECONDS:
+                await self._reload()
+                self._reloaded_at = now
+            else:
+                await self._add_new_trips()
+            self._refreshed_at = now
+
+    async def _fetch(self, after_id: int):
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(LOAD_UPCOMING_TRIPS, {
+                "horizon_days": settings.CONNECTION_INDEX_HORIZON_DAYS,
+                "after_id": after_id,
+            })).fetchall()
+
+    async def _reload(self) -> None:
+        rows = await self._fetch(after_id=0)
+        legs: Dict[str, List[Leg]] = defaultdict(list)
+        feeders: Dict[str, Set[str]] = defaultdict(set)
+        seats: Dict[int, int] = {}
+        for row in rows:
+            legs[row.origin].append(_leg(row))
+            feeders[row.destination].add(row.origin)
+            seats[row.id] = row.seats_available
+        for city_legs in legs.values():
+            city_legs.sort()
+
+        self._legs, self._feeders, self._seats = dict(legs), feeders, seats
+        self._max_trip_id = max(seats, default=0)
+
+    async def _add_new_trips(self) -> None:
+        # Trip ids only grow, so new trips are exactly the rows above the last id seen
+        rows = await self._fetch(after_id=self._max_trip_id)
+        for row in rows:
+            insort(self._legs.setdefault(row.origin, []), _leg(row))
+            self._feeders[row.destination].add(row.origin)
+            self._seats[row.id] = row.seats_available
+            self._max_trip_id = max(self._max_trip_id, row.id)
+
+        # Drop legs that have departed
+        cutoff = datetime.now(timezone.utc).timestamp()
+        for city, city_legs in self._legs.items():
+            gone = bisect_left(city_legs, (cutoff,))
+            for leg in city_legs[:gone]:
+                self._seats.pop(leg.trip_id, None)
+            if gone:
+                self._legs[city] = city_legs[gone:]
+
+    def seats(self, trip_id: int) -> int:
+        return self._seats.get(trip_id, 0)
+
+    def update_seats(self, seats_by_trip: Dict[int, int]) -> None:
+        """Record fresh seat counts seen while validating results."""
+        for trip_id in self._seats.keys() & seats_by_trip.keys():
+            self._seats[trip_id] = seats_by_trip[trip_id]
+
+    def departures(self, city: str, earliest: float, latest: float):
+        city_legs = self._legs.get(city, [])
+        for i in range(bisect_left(city_legs, (earliest,)), len(city_legs)):
+            leg = city_legs[i]
+            if leg.departure > latest:
+                break
+            yield leg
+
+    def feeders(self, city: str) -> Set[str]:
+        return self._feeders.get(city, set())
+
+
+connection_index = ConnectionIndex()
+
+
+def _leg(row) -> Leg:
+    return Leg(
+        departure=row.departure_time.timestamp(),
+        trip_id=row.id,
+        origin=row.origin,
+        destination=row.destination,
+        arrival=row.arrival_time.timestamp(),
+        price=int(row.price),
+    )
+
+
+def _total_price(path: Tuple[Leg, ...]) -> int:
+    return sum(leg.price for leg in path)
+
+
+# Rank keys; a partial path never ranks after any of its extensions (prices add up,
+# arrivals only get later), which is what lets the search prune on them
+def _cheapest_first(path: Tuple[Leg, ...]) -> tuple:
+    return (_total_price(path), path[-1].arrival, len(path))
+
+
+def _earliest_arrival_first(path: Tuple[Leg, ...]) -> tuple:
+    return (path[-1].arrival, _total_price(path), len(path))
+
+
+RANKINGS: Dict[str, Callable[[Tuple[Leg, ...]], tuple]] = {
+    "cheapest": _cheapest_first,
+    "earliest_arrival": _earliest_arrival_first,
+}
+
+
+def _find_itineraries(
+    origin: str,
+    destination: str,
+    departure_from: float,
+    departure_to: float,
+    max_legs: int,
+    min_layover: float,
+    max_layover: float,
+    seats: int,
+    rank: Callable[[Tuple[Leg, ...]], tuple],
+    keep: int,
+) -> List[Tuple[Leg, ...]]:
+    """
+    The `keep` best itineraries by `rank`, best first. Only that many are held
+    at a time, and once they are found a partial path that already ranks worse
+    than all of them is not extended any further.
+    """
+    index = connection_index
+    # Cities from which the destination is one direct trip away; a leg that still needs
+    # exactly one more trip must end in one of them
+    last_hop = index.feeders(destination)
+    # Max-heap of the best itineraries so far, via negated rank keys; the counter
+    # breaks ties so legs are never compared
+    best: List[Tuple[tuple, int, Tuple[Leg, ...]]] = []
+    counter = 0
+
+    def worse_than_all_kept(path: Tuple[Leg, ...]) -> bool:
+        return len(best) == keep and rank(path) >= tuple(-x for x in best[0][0])
+
+    def usable(leg: Leg, visited: Set[str], legs_left: int) -> bool:
+        # legs_left counts this leg too
+        if index.seats(leg.trip_id) < seats or leg.destination in visited:
+            return False
+        if leg.destination == destination:
+            return True
+        if legs_left == 1:
+            return False
+        return legs_left > 2 or leg.destination in last_hop
+
+    def extend(path: Tuple[Leg, ...], visited: Set[str]) -> None:
+        nonlocal counter
+        if worse_than_all_kept(path):
+            return
+
+        last = path[-1]
+        if last.destination == destination:
+            counter += 1
+            entry = (tuple(-x for x in rank(path)), counter, path)
+            if len(best) < keep:
+                heapq.heappush(best, entry)
+            else:
+                heapq.heapreplace(best, entry)
+            return
+
+        legs_left = max_legs - len(path)
+        for leg in index.departures(last.destination, last.arrival + min_layover, last.arrival + max_layover):
+            if usable(leg, visited, legs_left):
+                extend(path + (leg,), visited | {leg.destination})
+
+    for leg in index.departures(origin, departure_from, departure_to):
+        if usable(leg, {origin}, max_legs):
+            extend((leg,), {origin, leg.destination})
+
+    return [path for _, _, path in sorted(best, reverse=True)]
+
+
+def _itinerary_item(path: Tuple[Leg, ...], seats_by_trip: Dict[int, int]) -> Dict[str, Any]:
+    return {
+        "total_price": _total_price(path),
+        "departure": datetime.fromtimestamp(path[0].departure, tz=timezone.utc),
+        "arrival": datetime.fromtimestamp(path[-1].arrival, tz=timezone.utc),
+        "duration_minutes": int((path[-1].arrival - path[0].departure) // 60),
+        "legs": [
+            {
+                "trip_id": leg.trip_id,
+                "origin": leg.origin,
+                "destination": leg.destination,
+                "departure": datetime.fromtimestamp(leg.departure, tz=timezone.utc),
+                "arrival": datetime.fromtimestamp(leg.arrival, tz=timezone.utc),
+                "price": leg.price,
+                "available_seats": seats_by_trip[leg.trip_id],
+            }
+            for leg in path
+        ],
+    }
+
+
+async def search_connections(
+    origin: str,
+    destination: str,
+    departure_from: datetime,
+    departure_to: datetime,
+    max_legs: int,
+    min_layover_minutes: int,
+    max_layover_minutes: int,
+    sort: Literal["cheapest", "earliest_arrival"],
+    seats: int = 1,
+    limit: int = 20,
+) -> Dict[str, Any]:
+    """
+    Itineraries of up to max_legs trips from origin to destination whose first
+    leg departs in [departure_from, departure_to]. Every leg leaves at least
+    min_layover_minutes (and at most max_layover_minutes) after the previous
+    one arrives. Ranked by total price or by arrival time.
+    """
+    await connection_index.ensure_fresh()
+
+    candidates = _find_itineraries(
+        origin,
+        destination,
+        departure_from.timestamp(),
+        departure_to.timestamp(),
+        max_legs,
+        min_layover_minutes * 60,
+        max_layover_minutes * 60,
+        seats,
+        rank=RANKINGS[sort],
+        keep=limit * CANDIDATES_PER_RESULT,
+    )
+
+    # The index can be a little behind: confirm every leg is still open with enough seats
+    trip_ids = list({leg.trip_id for path in candidates for leg in path})
+    seats_by_trip: Dict[int, int] = {}
+    if trip_ids:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(CHECK_LEG_TRIPS, {"trip_ids": trip_ids})).fetchall()
+        seats_by_trip = {row.id: row.seats_available for row in rows}
+        # Trips missing from the result were cancelled or have departed
+        connection_index.update_seats({trip_id: seats_by_trip.get(trip_id, 0) for trip_id in trip_ids})
+
+    items = []
+    for path in candidates:
+        if all(seats_by_trip.get(leg.trip_id, 0) >= seats for leg in path):
+            items.append(_itinerary_item(path, seats_by_trip))
+            if len(items) == limit:
+                break
+
+    return {
+        "origin": origin,
+        "destination": destination,
+        "sort": sort,
+        "max_legs": max_legs,
+        "items": items,
+    }
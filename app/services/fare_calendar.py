@@ -0,0 +1,191 @@
+# app/services/fare_calendar.py
+"""
+Fare calendar: per route and (UTC) day, the cheapest bookable price and the
+free seats, read from the precomputed route_day_fares table.
+Booking paths only mark the touched trips as dirty in Redis; the fare calendar
+worker recomputes those route-days in batches, so a booking never waits on the
+summary and a calendar request never aggregates trips or seats.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import text
+
+from app.core.redis import redis_client as redis
+from app.db.session import AsyncSessionLocal
+from app.services.cache import TwoTierCache
+
+DIRTY_TRIPS_KEY = "fare_calendar:dirty_trips"
+
+# The summary itself trails bookings by a refresh interval, so a short cache adds little lag
+FARE_CALENDAR_CACHE_SECONDS = 60
+fare_calendar_cache = TwoTierCache("fare-calendar", ttl=FARE_CALENDAR_CACHE_SECONDS)
+
+# Recompute the given route-days from trips (served by ix_trips_route_departure).
+# Only trips that have not departed yet count, so today's row describes the buses still
+# to leave; sold-out trips don't count towards the minimum price. Days with no open
+# trips left are removed.
+_REFRESH_FARE_DAYS = """
+    WITH touched AS (
+        {touched}
+    ),
+    summary AS (
+        SELECT d.route_id,
+               d.day,
+               MIN(t.price) FILTER (WHERE t.seats_available > 0) AS min_price,
+               COALESCE(SUM(t.seats_available), 0) AS seats_available,
+               COUNT(t.id) AS trips
+        FROM touched d
+        LEFT JOIN trips t
+               ON t.route_id = d.route_id
+              AND t.cancelled_at IS NULL
+              AND t.departure_time > NOW()
+              AND t.departure_time >= d.day::timestamp AT TIME ZONE 'UTC'
+              AND t.departure_time < (d.day + 1)::timestamp AT TIME ZONE 'UTC'
+        GROUP BY d.route_id, d.day
+    ),
+    emptied AS (
+        DELETE FROM route_day_fares f
+        USING summary s
+        WHERE f.route_id = s.route_id AND f.day = s.day AND s.trips = 0
+        RETURNING f.route_id
+    ),
+    upserted AS (
+        INSERT INTO route_day_fares (route_id, day, min_price, seats_available, trips, updated_at)
+        SELECT route_id, day, min_price, seats_available, trips, NOW()
+        FROM summary
+        WHERE trips > 0
+        ON CONFLICT (route_id, day) DO UPDATE
+        SET min_price = EXCLUDED.min_price,
+            seats_available = EXCLUDED.seats_available,
+            trips = EXCLUDED.trips,
+            updated_at = EXCLUDED.updated_at
+        RETURNING route_id
+    )
+    SELECT (SELECT COUNT(*) FROM upserted) + (SELECT COUNT(*) FROM emptied)
+"""
+
+REFRESH_TRIP_FARE_DAYS = text(_REFRESH_FARE_DAYS.format(touched="""
+        SELECT DISTINCT route_id, (departure_time AT TIME ZONE 'UTC')::date AS day
+        FROM trips
+        WHERE id = ANY(CAST(:trip_ids AS integer[]))
+"""))
+
+# Every route-day from :since on, including summary rows whose trips are gone
+REBUILD_FARE_DAYS = text(_REFRESH_FARE_DAYS.format(touched="""
+        SELECT route_id, (departure_time AT TIME ZONE 'UTC')::date AS day
+        FROM trips
+        WHERE departure_time >= CAST(:since AS date)::timestamp AT TIME ZONE 'UTC'
+          AND cancelled_at IS NULL
+        UNION
+        SELECT route_id, day
+        FROM route_day_fares
+        WHERE day >= :since
+"""))
+
+# Today's route-days, whose trips depart without any event marking them dirty
+REFRESH_TODAY_FARE_DAYS = text(_REFRESH_FARE_DAYS.format(touched="""
+        SELECT route_id, day
+        FROM route_day_fares
+        WHERE day = :today
+"""))
+
+GET_FARE_CALENDAR = text("""
+    SELECT f.day,
+           MIN(f.min_price) AS min_price,
+           SUM(f.seats_available) AS seats_available,
+           SUM(f.trips) AS trips
+    FROM route_day_fares f
+    JOIN routes r ON r.id = f.route_id
+    WHERE r.origin = :origin
+      AND r.destination = :destination
+      AND f.day BETWEEN :start_date AND :end_date
+    GROUP BY f.day
+    ORDER BY f.day
+""")
+
+
+async def mark_fare_days_dirty(trip_ids: Iterable[int]) -> None:
+    """Queue these trips' route-days for the fare calendar worker."""
+    trip_ids = [str(trip_id) for trip_id in set(trip_ids)]
+    if trip_ids:
+        await redis.sadd(DIRTY_TRIPS_KEY, *trip_ids)
+
+
+async def refresh_dirty_fare_days(batch_size: int) -> int:
+    """
+    Recompute the route-days of up to batch_size dirty trips.
+    Returns how many trips were taken off the dirty set.
+    """
+    trip_ids = await redis.spop(DIRTY_TRIPS_KEY, batch_size)
+    if not trip_ids:
+        return 0
+
+    try:
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                await db.execute(REFRESH_TRIP_FARE_DAYS, {"trip_ids": [int(t) for t in trip_ids]})
+    except Exception:
+        # Put them back so the next run retries
+        await redis.sadd(DIRTY_TRIPS_KEY, *trip_ids)
+        raise
+
+    return len(trip_ids)
+
+
+async def refresh_todays_fare_days() -> int:
+    """Drop trips that have departed since the last run from today's summary rows."""
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            result = await db.execute(REFRESH_TODAY_FARE_DAYS, {"today": datetime.now(timezone.utc).date()})
+            return result.scalar() or 0
+
+
+async def rebuild_fare_calendar(since: Optional[date] = None) -> int:
+    """
+    Recompute every route-day from `since` (default: today, UTC) on. Heals
+    anything an incremental refresh missed. Returns the number of rows written.
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            result = await db.execute(REBUILD_FARE_DAYS, {"since": since or datetime.now(timezone.utc).date()})
+            return result.scalar() or 0
+
+
+async def get_fare_calendar(origin: str, destination: str, start_date: date, end_date: date) -> Dict[str, Any]:
+    """One entry per day in [start_date, end_date]; days without trips have no price."""
+    cache_key = f"fare-calendar:{origin}:{destination}:{start_date}:{end_date}"
+
+    async def _load():
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(GET_FARE_CALENDAR, {
+                "origin": origin,
+                "destination": destination,
+                "start_date": start_date,
+                "end_date": end_date,
+            })).fetchall()
+        by_day = {row.day: row for row in rows}
+
+        days = []
+        day = start_date
+        while day <= end_date:
+            row = by_day.get(day)
+            days.append({
+                "date": str(day),
+                "min_price": int(row.min_price) if row and row.min_price is not None else None,
+                "available_seats": int(row.seats_available) if row else 0,
+                "trips": int(row.trips) if row else 0,
+            })
+            day += timedelta(days=1)
+
+        priced = [d for d in days if d["min_price"] is not None]
+        return {
+            "origin": origin,
+            "destination": destination,
+            "start_date": str(start_date),
+            "end_date": str(end_date),
+            "cheapest_date": min(priced, key=lambda d: d["min_price"])["date"] if priced else None,
+            "days": days,
+        }
+
+    return await fare_calendar_cache.get_or_load(cache_key, _load)
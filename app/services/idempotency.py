@@ -0,0 +1,121 @@
+# app/services/idempotency.py
+"""
+Idempotency-Key support for write endpoints.
+The first response for a key is stored in Redis; replays are answered from a
+single GET, and concurrent duplicates wait for the in-flight result instead of
+competing for seat locks.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+
+from app.core.redis import redis_client as redis
+
+RESULT_TTL_SECONDS = 86_400
+PENDING_TTL_SECONDS = 30
+WAIT_TIMEOUT_SECONDS = 10
+WAIT_POLL_SECONDS = 0.05
+
+# Transient outcomes are not stored, so a retry gets a fresh attempt
+RETRYABLE_STATUS_CODES = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+_PENDING = "pending"
+
+
+def _fingerprint(request_body: Any) -> str:
+    payload = json.dumps(jsonable_encoder(request_body), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(entry: dict, fingerprint: str, response: Optional[Response]):
+    if entry["fingerprint"] != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="This Idempotency-Key was already used with a different request."
+        )
+    if response is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+    if entry["status_code"] >= 400:
+        raise HTTPException(status_code=entry["status_code"], detail=entry["body"])
+    return entry["body"]
+
+
+async def _wait_for_result(key: str, fingerprint: str, response: Optional[Response]):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + WAIT_TIMEOUT_SECONDS
+    while loop.time() < deadline:
+        await asyncio.sleep(WAIT_POLL_SECONDS)
+        cached = await redis.get(key)
+        if cached is None:
+            # The first attempt failed transiently and gave the key up
+            return None
+        if cached != _PENDING:
+            return _replay(json.loads(cached), fingerprint, response)
+
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="A request with this Idempotency-Key is still being processed."
+    )
+
+
+async def run_idempotent(
+    scope: str,
+    user_id: int,
+    idempotency_key: Optional[str],
+    request_body: Any,
+    handler: Callable[[], Awaitable[Any]],
+    response: Optional[Response] = None,
+):
+    """
+    Run `handler` at most once per (user, scope, Idempotency-Key).
+    Without a key the handler simply runs. Successful responses and final
+    4xx errors are stored for 24 hours; 409/429 and unexpected errors are not.
+    """
+    if not idempotency_key:
+        return await handler()
+
+    key = f"idem:{user_id}:{scope}:{idempotency_key}"
+    fingerprint = _fingerprint(request_body)
+
+    while True:
+        # Replays are answered from this single GET
+        cached = await redis.get(key)
+        if cached is not None and cached != _PENDING:
+            return _replay(json.loads(cached), fingerprint, response)
+
+        if cached is None and await redis.set(key, _PENDING, nx=True, ex=PENDING_TTL_SECONDS):
+            break
+
+        # Another request with the same key is in flight
+        result = await _wait_for_result(key, fingerprint, response)
+        if result is not None:
+            return result
+
+    try:
+        body = await handler()
+    except HTTPException as exc:
+        if exc.status_code in RETRYABLE_STATUS_CODES or exc.status_code >= 500:
+            await redis.delete(key)
+        else:
+            await _store(key, fingerprint, exc.status_code, exc.detail)
+        raise
+    except Exception:
+        await redis.delete(key)
+        raise
+
+    # On replay the endpoint's own success status code applies again
+    await _store(key, fingerprint, status.HTTP_200_OK, body)
+    return body
+
+
+async def _store(key: str, fingerprint: str, status_code: int, body: Any) -> None:
+    entry = {
+        "fingerprint": fingerprint,
+        "status_code": status_code,
+        "body": jsonable_encoder(body),
+    }
+    await redis.set(key, json.dumps(entry), ex=RESULT_TTL_SECONDS)
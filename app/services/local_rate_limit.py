@@ -0,0 +1,100 @@
+# app/services/local_rate_limit.py
+"""
+In-process pre-limiter in front of the Redis rate limits.
+Each worker counts the requests it forwards to Redis, per identifier, in a
+count-min sketch (fixed memory, never undercounts) over a sliding window
+approximated by the current and previous window. Once this worker alone has
+forwarded PRE_LIMITER_FACTOR times an identifier's limit within the window,
+Redis has seen more attempts than it can admit, so further requests are
+rejected without a Redis call. Locally rejected requests are not counted: as
+the window slides the identifier drops below the bound and is forwarded
+again, so a client retrying steadily still gets its `limit` per window from
+Redis, while Redis sees at most about PRE_LIMITER_FACTOR x limit attempts
+per window from each worker however hard an identifier is hammered.
+"""
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+class SlidingCountMinSketch:
+    """Approximate per-key request counts over the last `window_seconds`."""
+
+    def __init__(self, window_seconds: float, width: int, depth: int):
+        self.window_seconds = window_seconds
+        self.width = width
+        self.depth = depth
+        self._window = 0
+        self._current = self._empty()
+        self._previous = self._empty()
+
+    def _empty(self) -> List[array]:
+        return [array("I", bytes(4 * self.width)) for _ in range(self.depth)]
+
+    def _rotate(self, now: float) -> float:
+        """Advance to the window containing `now`; returns how far into it we are (0..1)."""
+        window, offset = divmod(now, self.window_seconds)
+        window = int(window)
+        if window != self._window:
+            self._previous = self._current if window == self._window + 1 else self._empty()
+            self._current = self._empty()
+            self._window = window
+        return offset / self.window_seconds
+
+    def _cells(self, key: str) -> List[int]:
+        # Per-process salted hash is fine: the sketch never leaves the process
+        return [hash((row, key)) % self.width for row in range(self.depth)]
+
+    def estimate(self, key: str, now: Optional[float] = None) -> float:
+        """Estimated count of `key` in the sliding window; never below the true count."""
+        progress = self._rotate(time.monotonic() if now is None else now)
+        cells = self._cells(key)
+        current = min(self._current[row][cell] for row, cell in enumerate(cells))
+        previous = min(self._previous[row][cell] for row, cell in enumerate(cells))
+        return current + previous * (1 - progress)
+
+    def add(self, key: str, now: Optional[float] = None) -> float:
+        """Count one request for `key` and return its estimated count in the sliding window."""
+        progress = self._rotate(time.monotonic() if now is None else now)
+        cells = self._cells(key)
+
+        # Conservative update: raise only the counters at the minimum, which keeps
+        # the overestimate from colliding keys down
+        current = min(self._current[row][cell] for row, cell in enumerate(cells)) + 1
+        for row, cell in enumerate(cells):
+            if self._current[row][cell] < current:
+                self._current[row][cell] = current
+
+        previous = min(self._previous[row][cell] for row, cell in enumerate(cells))
+        return current + previous * (1 - progress)
+
+
+# One sketch per window length, created on first use
+_sketches: Dict[float, SlidingCountMinSketch] = {}
+
+
+def _sketch(window_seconds: float) -> SlidingCountMinSketch:
+    sketch = _sketches.get(window_seconds)
+    if sketch is None:
+        sketch = _sketches[window_seconds] = SlidingCountMinSketch(
+            window_seconds, settings.PRE_LIMITER_WIDTH, settings.PRE_LIMITER_DEPTH
+        )
+    return sketch
+
+
+def locally_rejected(limits: Iterable[Tuple[str, int, float]]) -> Optional[Tuple[int, float]]:
+    """
+    Return the (limit, window_seconds) of a clearly abused (key, limit,
+    window_seconds), or None after counting the request against every key as
+    forwarded to Redis.
+    """
+    limits = list(limits)
+    for key, limit, window_seconds in limits:
+        if _sketch(window_seconds).estimate(key) >= limit * settings.PRE_LIMITER_FACTOR:
+            return limit, window_seconds
+
+    for key, limit, window_seconds in limits:
+        _sketch(window_seconds).add(key)
+    return None
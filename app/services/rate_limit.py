@@ -1,43 +1,238 @@
 # app/services/rate_limit.py
+"""
+Redis rate limits.
+enforce_rate_limits() evaluates every limit of a request (e.g. per IP and per
+phone) in one atomic script call: either all of them admit the request and
+are charged, or none is. Each limit is a sliding-window log (at most `limit`
+requests in any `window_seconds`) or a token bucket (bursts up to `limit`,
+refilled at limit / window_seconds per second).
+"""
+import math
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Literal, NamedTuple
+from uuid import uuid4
 
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Response, status
 
+from app.core.config import settings
 from app.core.redis import redis_client as redis
+from app.services.local_rate_limit import locally_rejected
 
 
-async def check_daily_limit(user_id: int) -> None:
+DAILY_BOOKING_LIMIT = 20
+
+
+def _daily_limit_key(user_id: int) -> str:
+    return f"daily_limit:{user_id}:{datetime.now().date()}"
+
+
+def _daily_limit_exceeded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"You have reached the daily booking limit of {DAILY_BOOKING_LIMIT} reservations."
+    )
+
+
+async def check_daily_limit(user_id: int, seats: int = 1) -> None:
     """
-    Check if the user has reached the daily booking limit (20 bookings per day).
-    This function only checks — increment is performed separately after successful booking.
+    Check if booking `seats` more tickets would exceed the daily booking limit (20 bookings per day).
+    Read-only: used where nothing is booked yet (holds). Bookings go through daily_booking_quota.
     """
-    key = f"daily_limit:{user_id}:{datetime.now().date()}"
-    current = await redis.get(key)
+    current = await redis.get(_daily_limit_key(user_id))
 
     count = int(current) if current is not None else 0
 
-    if count >= 20:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="You have reached the daily booking limit of 20 reservations."
-        )
+    if count + seats > DAILY_BOOKING_LIMIT:
+        raise _daily_limit_exceeded()
+
 
+# KEYS[1] = counter; ARGV: seats, limit, ttl. Reserves the seats only if they fit
+# under the limit, and sets the 24-hour expiry on first use. Returns -1 when rejected.
+_RESERVE_DAILY_SCRIPT = redis.register_script("""
+local count = tonumber(redis.call('GET', KEYS[1]) or '0')
+local seats = tonumber(ARGV[1])
+if count + seats > tonumber(ARGV[2]) then
+    return -1
+end
+count = redis.call('INCRBY', KEYS[1], seats)
+if count == seats then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return count
+""")
 
-async def increment_daily_limit(user_id: int) -> None:
+
+@asynccontextmanager
+async def daily_booking_quota(user_id: int, seats: int = 1):
+    """
+    Reserve `seats` of the user's daily booking limit for the booking in the
+    `async with` body. Check and reservation are one atomic script call, so
+    concurrent bookings cannot overshoot the limit. If the body raises, the
+    reservation is handed back.
     """
-    Increment the user's daily booking counter.
-    Must be called only after a booking has been successfully confirmed in the database.
-    Sets a 24-hour expiry on first use.
+    key = _daily_limit_key(user_id)
+    if await _RESERVE_DAILY_SCRIPT(keys=[key], args=[seats, DAILY_BOOKING_LIMIT, 86_400]) < 0:
+        raise _daily_limit_exceeded()
+
+    try:
+        yield
+    except BaseException:
+        # Same key as the reservation, even if the day changed meanwhile
+        await redis.decrby(key, seats)
+        raise
+
+
+class RateLimit(NamedTuple):
+    identifier: str
+    limit: int
+    window_seconds: int = 60
+    algorithm: Literal["sliding_window", "token_bucket"] = "sliding_window"
+
+
+class RateLimitStatus(NamedTuple):
+    """Quota of the most constrained limit, for the RateLimit-* headers."""
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_seconds: int
+    retry_after_seconds: int
+
+
+# KEYS: one per limit. ARGV: nonce, then (algorithm, limit, window ms, cost) per limit.
+# Pass 1 computes every limit's state without writing; pass 2 charges them only
+# if all admit the request. Returns {allowed, limit, remaining, reset ms, retry ms}
+# of the limit with the fewest requests remaining.
+_RATE_LIMIT_SCRIPT = redis.register_script("""
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local nonce = ARGV[1]
+
+local states = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+    local base = 1 + (i - 1) * 4
+    local algorithm = ARGV[base + 1]
+    local limit = tonumber(ARGV[base + 2])
+    local window = tonumber(ARGV[base + 3])
+    local cost = tonumber(ARGV[base + 4])
+    local state = {algorithm = algorithm, limit = limit, window = window, cost = cost}
+
+    if algorithm == 'sliding_window' then
+        redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+        local count = redis.call('ZCARD', key)
+        state.ok = count + cost <= limit
+        state.remaining = limit - count - (state.ok and cost or 0)
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        state.reset = oldest[2] and (tonumber(oldest[2]) + window - now) or window
+        state.retry = 0
+        if not state.ok then
+            -- Wait until enough of the logged requests have left the window
+            local freeing = redis.call('ZRANGE', key, count + cost - limit - 1, count + cost - limit - 1, 'WITHSCORES')
+            state.retry = freeing[2] and (tonumber(freeing[2]) + window - now) or window
+        end
+    else
+        local rate = limit / window
+        local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+        local tokens = tonumber(bucket[1]) or limit
+        local ts = tonumber(bucket[2]) or now
+        tokens = math.min(limit, tokens + math.max(0, now - ts) * rate)
+        state.ok = tokens >= cost
+        state.tokens = state.ok and tokens - cost or tokens
+        state.remaining = math.floor(state.tokens)
+        state.reset = math.ceil((limit - state.tokens) / rate)
+        state.retry = state.ok and 0 or math.ceil((cost - tokens) / rate)
+    end
+
+    if not state.ok then allowed = 0 end
+    states[i] = state
+end
+
+local tightest = nil
+for i, key in ipairs(KEYS) do
+    local state = states[i]
+    if allowed == 1 then
+        if state.algorithm == 'sliding_window' then
+            for n = 1, state.cost do
+                redis.call('ZADD', key, now, now .. ':' .. nonce .. ':' .. n)
+            end
+        else
+            redis.call('HSET', key, 'tokens', tostring(state.tokens), 'ts', now)
+        end
+        redis.call('PEXPIRE', key, state.window)
+    end
+    -- Report the denying limit when rejected, the one closest to denying otherwise
+    if (allowed == 1 or not state.ok) and (tightest == nil or state.remaining < tightest.remaining
+            or (state.remaining == tightest.remaining and state.retry > tightest.retry)) then
+        tightest = state
+    end
+end
+
+return {allowed, tightest.limit, tightest.remaining, tightest.reset, tightest.retry}
+""")
+
+
+async def enforce_rate_limits(
+    *limits: RateLimit,
+    resource: str = "request",
+    cost: int = 1,
+    response: Response | None = None
+) -> RateLimitStatus:
     """
-    key = f"daily_limit:{user_id}:{datetime.now().date()}"
+    Charge `cost` against every limit atomically (one Redis round trip).
+    Sets RateLimit-Limit/-Remaining/-Reset on `response` when given.
 
-    current = await redis.get(key)
+    Identifiers this worker has already forwarded far more often than their
+    limit are rejected by the in-process pre-limiter without a Redis call.
 
-    if current is None:
-        # First booking today — initialize counter with 24h TTL
-        await redis.setex(key, 86_400, "1")
-    else:
-        await redis.incr(key)
+    Raises:
+        HTTPException 429 with RateLimit-* and Retry-After headers if any limit is exhausted
+    """
+    keys, args = [], [uuid4().hex]
+    for limit in limits:
+        keys.append(f"rate_limit:{limit.identifier}:{resource}:{limit.algorithm}")
+        args.extend([limit.algorithm, limit.limit, limit.window_seconds * 1000, cost])
+
+    if settings.PRE_LIMITER_ENABLED:
+        rejected = locally_rejected(
+            (key, limit.limit, limit.window_seconds) for key, limit in zip(keys, limits)
+        )
+        if rejected is not None:
+            limit, window_seconds = rejected
+            _raise_too_many(
+                RateLimitStatus(False, limit, 0, window_seconds, window_seconds), resource
+            )
+
+    allowed, limit, remaining, reset_ms, retry_ms = await _RATE_LIMIT_SCRIPT(keys=keys, args=args)
+    result = RateLimitStatus(
+        allowed=bool(allowed),
+        limit=int(limit),
+        remaining=max(0, int(remaining)),
+        reset_seconds=math.ceil(int(reset_ms) / 1000),
+        retry_after_seconds=math.ceil(int(retry_ms) / 1000),
+    )
+
+    if not result.allowed:
+        _raise_too_many(result, resource)
+    if response is not None:
+        response.headers.update(rate_limit_headers(result))
+    return result
+
+
+def _raise_too_many(result: RateLimitStatus, resource: str) -> None:
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Too many {resource}s. Please try again in {result.retry_after_seconds} seconds.",
+        headers={**rate_limit_headers(result), "Retry-After": str(result.retry_after_seconds)}
+    )
+
+
+def rate_limit_headers(result: RateLimitStatus) -> dict:
+    return {
+        "RateLimit-Limit": str(result.limit),
+        "RateLimit-Remaining": str(result.remaining),
+        "RateLimit-Reset": str(result.reset_seconds),
+    }
 
 
 async def check_rate_limit(
@@ -48,30 +243,10 @@ async def check_rate_limit(
     resource: str = "request"
 ) -> None:
     """
-    Generic sliding-window rate limiter (e.g., for login attempts, SMS, or API calls).
-
-    Args:
-        identifier: Unique identifier (e.g., IP address, mobile number)
-        limit: Maximum allowed requests in the time window
-        window_seconds: Time window in seconds (default: 60)
-        resource: Human-readable name of the resource being limited (for error message)
+    Sliding-window rate limiter for a single identifier (e.g., for login attempts,
+    SMS, or API calls). Use enforce_rate_limits() to check several at once.
 
     Raises:
         HTTPException 429 if limit exceeded
     """
-    key = f"rate_limit:{identifier}:{resource}"
-    current = await redis.get(key)
-
-    count = int(current) if current is not None else 0
-
-    if count >= limit:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"Too many {resource}s. Please try again in {window_seconds} seconds."
-        )
-
-    # Increment counter and set expiry on first request
-    if current is None:
-        await redis.setex(key, window_seconds, "1")
-    else:
-        await redis.incr(key)
\ No newline at end of file
+    await enforce_rate_limits(RateLimit(identifier, limit, window_seconds), resource=resource)
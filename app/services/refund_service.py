@@ -0,0 +1,79 @@
+# app/services/refund_service.py
+"""
+Refund pipeline behind booking cancellation.
+Cancellations are written to the refund_outbox table in the request's
+transaction; the refund worker drains it in batches, applying each batch with
+set-based statements in a single transaction. Delivery is at-least-once and
+applying a batch twice is a no-op.
+"""
+from collections import defaultdict
+
+from app.db.session import AsyncSessionLocal
+from app.services.booking_queries import (
+    CLAIM_REFUND_BATCH,
+    CANCEL_BOOKINGS_BATCH,
+    RELEASE_SEATS_BATCH,
+    ADJUST_SEATS_AVAILABLE,
+    MARK_REFUNDS_PROCESSED
+)
+from app.services.booking_cache import bump_user_bookings_versions
+from app.services.trip_events import trips_changed
+from app.services.waitlist import offer_released_seats
+from app.services.wallet_service import credit_wallets_batch
+
+
+async def process_refund_batch(batch_size: int) -> int:
+    """
+    Apply one batch of pending cancellations: cancel bookings, credit wallets,
+    free seats and mark the outbox rows processed — all in one transaction.
+    Returns the number of outbox rows handled.
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            batch = (await db.execute(CLAIM_REFUND_BATCH, {"batch_size": batch_size})).fetchall()
+            if not batch:
+                return 0
+
+            cancelled = (await db.execute(CANCEL_BOOKINGS_BATCH, {
+                "booking_ids": [row.booking_id for row in batch]
+            })).fetchall()
+
+            released = []
+            if cancelled:
+                # One ledger row per booking; a user's refunds land in one bucket
+                await credit_wallets_batch(
+                    db,
+                    [(row.user_id, row.price_paid, f"booking:{row.id}") for row in cancelled],
+                    "refund"
+                )
+                released = (await db.execute(RELEASE_SEATS_BATCH, {
+                    "seat_ids": [row.seat_id for row in cancelled]
+                })).fetchall()
+                if released:
+                    await db.execute(ADJUST_SEATS_AVAILABLE, {
+                        "trip_ids": [row.trip_id for row in released],
+                        "deltas": [1] * len(released)
+                    })
+
+            await db.execute(MARK_REFUNDS_PROCESSED, {"ids": [row.id for row in batch]})
+
+    # Waitlisted users get the freed seats first; the rest go back to the seat bitmap
+    seats_by_trip = defaultdict(list)
+    for row in released:
+        seats_by_trip[row.trip_id].append(row.seat_number)
+    for trip_id, seat_numbers in seats_by_trip.items():
+        await offer_released_seats(trip_id, seat_numbers)
+    await trips_changed(seats_by_trip)
+    await bump_user_bookings_versions(row.user_id for row in cancelled)
+
+    return len(batch)
+
+
+async def drain_refund_outbox(batch_size: int) -> int:
+    """Process batches until the outbox is empty. Returns the number of rows handled."""
+    total = 0
+    while True:
+        handled = await process_refund_batch(batch_size)
+        total += handled
+        if handled < batch_size:
+            return total
@@ -0,0 +1,172 @@
+# app/services/seat_inventory.py
+"""
+Redis-resident seat inventory.
+Keeps one bitmap per trip (bit N set = seat N taken), loaded lazily from the
+seats table. Seats are claimed by a single Lua script, so a losing request is
+rejected in one Redis round trip without touching Postgres.
+"""
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+from sqlalchemy import text
+
+from app.core.redis import redis_client as redis
+from app.db.session import AsyncSessionLocal
+
+# Claim results returned by the Lua script
+CLAIM_OK = 1
+CLAIM_TAKEN = 0
+CLAIM_NOT_LOADED = -1
+CLAIM_INVALID_SEAT = -2
+
+AVAILABLE_HINT_LIMIT = 20
+
+# Keep bitmaps around for a day after departure, then let Redis drop them
+INVENTORY_TTL_AFTER_DEPARTURE = 86_400
+
+
+# KEYS[1] = bitmap, KEYS[2] = size
+# ARGV[1] = hint limit, ARGV[2..] = seat numbers (claimed all-or-nothing)
+# Returns {status, available seats...}
+_CLAIM_SCRIPT = redis.register_script("""
+local size = redis.call('GET', KEYS[2])
+if not size then return {-1} end
+size = tonumber(size)
+
+local status = 1
+for i = 2, #ARGV do
+    local seat = tonumber(ARGV[i])
+    if seat < 1 or seat > size then
+        status = -2
+        break
+    end
+    if redis.call('GETBIT', KEYS[1], seat) == 1 then
+        status = 0
+    end
+end
+
+if status == 1 then
+    for i = 2, #ARGV do
+        redis.call('SETBIT', KEYS[1], tonumber(ARGV[i]), 1)
+    end
+    return {1}
+end
+
+local result = {status}
+local limit = tonumber(ARGV[1])
+for n = 1, size do
+    if #result > limit then break end
+    if redis.call('GETBIT', KEYS[1], n) == 0 then
+        table.insert(result, n)
+    end
+end
+return result
+""")
+
+
+# KEYS[1] = bitmap, KEYS[2] = size
+# ARGV[1] = ttl seconds, ARGV[2] = size, ARGV[3..] = reserved seat numbers
+_LOAD_SCRIPT = redis.register_script("""
+if redis.call('EXISTS', KEYS[2]) == 1 then return 0 end
+redis.call('DEL', KEYS[1])
+local size = tonumber(ARGV[2])
+redis.call('SETBIT', KEYS[1], size, 0)
+for i = 3, #ARGV do
+    redis.call('SETBIT', KEYS[1], tonumber(ARGV[i]), 1)
+end
+redis.call('SET', KEYS[2], size)
+local ttl = tonumber(ARGV[1])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+    redis.call('EXPIRE', KEYS[2], ttl)
+end
+return 1
+""")
+
+
+# KEYS[1] = bitmap, KEYS[2] = size
+# ARGV[1] = bit value, ARGV[2..] = seat numbers
+_SET_BITS_SCRIPT = redis.register_script("""
+if redis.call('EXISTS', KEYS[2]) == 0 then return 0 end
+local value = tonumber(ARGV[1])
+for i = 2, #ARGV do
+    redis.call('SETBIT', KEYS[1], tonumber(ARGV[i]), value)
+end
+return 1
+""")
+
+
+def _keys(trip_id: int) -> List[str]:
+    # Hash tag keeps both keys in the same slot on Redis Cluster
+    return [f"seatmap:{{{trip_id}}}", f"seatmap:{{{trip_id}}}:size"]
+
+
+async def load_trip_inventory(trip_id: int) -> bool:
+    """
+    Build the seat bitmap for a trip from the seats table.
+    Every seat of a cancelled trip is marked taken. Does nothing if the bitmap
+    is already loaded. Returns False if the trip has no seats.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(text("""
+            SELECT t.departure_time,
+                   MAX(s.seat_number) AS size,
+                   ARRAY_AGG(s.seat_number) FILTER (
+                       WHERE s.is_reserved OR t.cancelled_at IS NOT NULL
+                   ) AS reserved
+            FROM trips t
+            JOIN seats s ON s.trip_id = t.id
+            WHERE t.id = :trip_id
+            GROUP BY t.id
+        """), {"trip_id": trip_id})
+        row = result.fetchone()
+
+    if not row or not row.size:
+        return False
+
+    seconds_to_departure = (row.departure_time - datetime.now(timezone.utc)).total_seconds()
+    ttl = max(int(seconds_to_departure), 0) + INVENTORY_TTL_AFTER_DEPARTURE
+
+    await _LOAD_SCRIPT(keys=_keys(trip_id), args=[ttl, row.size, *(row.reserved or [])])
+    return True
+
+
+async def claim_seats(trip_id: int, seat_numbers: List[int]) -> Tuple[int, List[int]]:
+    """
+    Atomically claim seats in the trip bitmap (all-or-nothing).
+    Returns (status, available_seats); available_seats is only filled when the claim fails.
+    """
+    args = [AVAILABLE_HINT_LIMIT, *seat_numbers]
+    result = await _CLAIM_SCRIPT(keys=_keys(trip_id), args=args)
+
+    if int(result[0]) == CLAIM_NOT_LOADED:
+        if not await load_trip_inventory(trip_id):
+            return CLAIM_INVALID_SEAT, []
+        result = await _CLAIM_SCRIPT(keys=_keys(trip_id), args=args)
+
+    return int(result[0]), [int(seat) for seat in result[1:]]
+
+
+async def release_seats(trip_id: int, seat_numbers: List[int]) -> None:
+    """
+    Mark seats as free again (failed payment, cancellation).
+    A trip whose bitmap is not loaded is left alone; it will be rebuilt from Postgres.
+    """
+    if not seat_numbers:
+        return
+    await _SET_BITS_SCRIPT(keys=_keys(trip_id), args=[0, *seat_numbers])
+
+
+async def mark_seats_taken(trip_id: int, seat_numbers: List[int]) -> None:
+    """
+    Set seat bits for seats booked through a path that picks seats in Postgres
+    (auto-assignment), so the bitmap keeps matching the seats table.
+    """
+    if not seat_numbers:
+        return
+    await _SET_BITS_SCRIPT(keys=_keys(trip_id), args=[1, *seat_numbers])
+
+
+async def drop_trip_inventory(trip_id: int) -> None:
+    """Forget a trip bitmap so the next claim reloads it from the seats table."""
+    await redis.delete(*_keys(trip_id))
@@ -14,4 +14,23 @@ async def acquire_seat_lock(trip_id: int, seat_number: int, timeout: int = 10):
 async def release_seat_lock(lock_key: str, lock_value: str):
     current = await redis.get(lock_key)
     if current == lock_value:
-        await redis.delete(lock_key)
\ No newline at end of file
+        await redis.delete(lock_key)
+
+async def acquire_seat_locks(trip_id: int, seat_numbers: list[int], timeout: int = 10):
+    """
+    Lock several seats of one trip, always in ascending seat order so two
+    group bookings can't deadlock each other. All-or-nothing: on conflict the
+    locks taken so far are released and 409 is raised.
+    """
+    acquired = []
+    try:
+        for seat_number in sorted(seat_numbers):
+            acquired.append(await acquire_seat_lock(trip_id, seat_number, timeout))
+    except HTTPException:
+        await release_seat_locks(acquired)
+        raise
+    return acquired
+
+async def release_seat_locks(locks: list[tuple[str, str]]):
+    for lock_key, lock_value in locks:
+        await release_seat_lock(lock_key, lock_value)
@@ -0,0 +1,92 @@
+# app/services/trip_cache.py
+"""
+Versioned keys for the trip search cache.
+Every cached /trips/available page is namespaced by a version counter for its
+origin/destination filter. Anything that changes a trip's visibility or free
+seats bumps the counters of every filter that can show that trip, so old pages
+are simply never read again and expire on their own.
+Each trip also has its own seat-map version, used for the cached seat map and
+its ETag.
+"""
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.cache import TwoTierCache
+from app.services.version_counters import bump_versions, read_version
+
+# Versioned keys never go stale on a booking, so an expired local copy can safely
+# be served while it is refreshed
+trip_search_cache = TwoTierCache("trip-search", ttl=settings.TRIP_SEARCH_CACHE_SECONDS, stale_seconds=30)
+
+# A trip's route never changes, so lookups are memoized in-process
+_ROUTE_MEMO_SIZE = 10_000
+_route_by_trip: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+
+GET_TRIP_ROUTES = text("""
+    SELECT t.id, r.origin, r.destination
+    FROM trips t
+    JOIN routes r ON r.id = t.route_id
+    WHERE t.id = ANY(CAST(:trip_ids AS integer[]))
+""")
+
+
+def _version_key(origin: Optional[str], destination: Optional[str]) -> str:
+    return f"trips_ver:{origin or '*'}:{destination or '*'}"
+
+
+async def search_cache_namespace(origin: Optional[str], destination: Optional[str]) -> str:
+    """Key prefix for cached search results of this origin/destination filter."""
+    version = await read_version(_version_key(origin, destination))
+    return f"trips:v{version}:{origin or '*'}:{destination or '*'}"
+
+
+def _seat_map_version_key(trip_id: int) -> str:
+    return f"seat_map_ver:{trip_id}"
+
+
+async def seat_map_version(trip_id: int) -> int:
+    """Current seat-map version of a trip; changes whenever any of its seats does."""
+    return await read_version(_seat_map_version_key(trip_id))
+
+
+async def bump_seat_map_versions(trip_ids: Iterable[int]) -> None:
+    """Invalidate the cached seat maps (and ETags) of these trips."""
+    await bump_versions(_seat_map_version_key(trip_id) for trip_id in set(trip_ids))
+
+
+async def bump_route_versions(routes: Iterable[Tuple[str, str]]) -> None:
+    """Invalidate every cached search that can contain trips of these routes."""
+    keys = set()
+    for origin, destination in routes:
+        keys.update((
+            _version_key(origin, destination),
+            _version_key(origin, None),
+            _version_key(None, destination),
+            _version_key(None, None),
+        ))
+    await bump_versions(keys)
+
+
+async def bump_trip_versions(trip_ids: Iterable[int]) -> None:
+    """Same as bump_route_versions, for trips whose seats or status changed. Also bumps their seat maps."""
+    trip_ids = set(trip_ids)
+    await bump_seat_map_versions(trip_ids)
+    missing = [trip_id for trip_id in trip_ids if trip_id not in _route_by_trip]
+    if missing:
+        await _load_routes(missing)
+
+    await bump_route_versions({_route_by_trip[t] for t in trip_ids if t in _route_by_trip})
+
+
+async def _load_routes(trip_ids) -> None:
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(GET_TRIP_ROUTES, {"trip_ids": list(trip_ids)})).fetchall()
+
+    for row in rows:
+        _route_by_trip[row.id] = (row.origin, row.destination)
+    while len(_route_by_trip) > _ROUTE_MEMO_SIZE:
+        _route_by_trip.popitem(last=False)
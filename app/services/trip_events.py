@@ -0,0 +1,23 @@
+# app/services/trip_events.py
+"""
+One hook for everything derived from trips: call trips_changed() after
+committing any change to a trip's seats, price or status.
+"""
+from typing import Iterable
+
+from app.core.config import settings
+from app.services.fare_calendar import mark_fare_days_dirty
+from app.services.trip_cache import bump_trip_versions
+from app.services.trip_index import sync_trip_index
+
+
+async def trips_changed(trip_ids: Iterable[int]) -> None:
+    """Invalidate search pages and seat maps, queue fare-calendar days, update the trip index."""
+    trip_ids = set(trip_ids)
+    if not trip_ids:
+        return
+
+    await bump_trip_versions(trip_ids)
+    await mark_fare_days_dirty(trip_ids)
+    if settings.TRIP_INDEX_ENABLED:
+        await sync_trip_index(trip_ids)
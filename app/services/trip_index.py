@@ -0,0 +1,331 @@
+# app/services/trip_index.py
+"""
+Redis-resident trip search index (optional, TRIP_INDEX_ENABLED).
+Per origin/destination: a sorted set of upcoming trip ids scored by price, a
+hash with each trip's departure and price, and a hash with its free seats.
+Price-sorted search pages are read by one Lua script walking the sorted set,
+so Postgres is only needed to rebuild the index (app/workers/trip_index.py)
+and to re-read the trips touched by a booking or trip event.
+"""
+from decimal import Decimal
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Iterable, List, Literal, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.redis import redis_client as redis
+from app.db.session import AsyncSessionLocal
+from app.schemas.trip import TripSearchFilters
+
+ROUTES_KEY = "trip_idx:routes"
+READY_KEY = "trip_idx:ready"
+# Trips synced since the current rebuild started; re-applied once it finishes
+TOUCHED_KEY = "trip_idx:touched"
+# Every sync takes a ticket from this counter before reading Postgres
+SYNC_SEQ_KEY = "trip_idx:sync_seq"
+# How long a trip remembers the ticket of its last applied sync. Only syncs
+# racing each other need it, so it can be much shorter than the index itself.
+SYNC_GUARD_SECONDS = 3600
+
+# A search that has to look at more trips than this (very selective filters)
+# falls back to SQL instead of blocking Redis
+MAX_SCAN = 5000
+SCAN_BATCH = 200
+
+# Members are zero-padded ids so equal prices order by id, like (price, id) in SQL
+_ID_WIDTH = 10
+
+LOAD_INDEXED_TRIPS = text("""
+    SELECT t.id, r.origin, r.destination, t.price, t.departure_time, t.seats_available,
+           (t.cancelled_at IS NULL AND t.departure_time > NOW()) AS is_open
+    FROM trips t
+    JOIN routes r ON r.id = t.route_id
+    WHERE t.id = ANY(CAST(:trip_ids AS integer[]))
+""")
+
+LOAD_UPCOMING_TRIPS = text("""
+    SELECT t.id, r.origin, r.destination, t.price, t.departure_time, t.seats_available
+    FROM trips t
+    JOIN routes r ON r.id = t.route_id
+    WHERE t.cancelled_at IS NULL
+      AND t.departure_time > NOW()
+    ORDER BY r.origin, r.destination
+""")
+
+
+# KEYS[1] = sorted set, KEYS[2] = trip data hash, KEYS[3] = seats hash
+# ARGV: direction, cursor price, cursor id, departure_from, departure_to, not_before,
+#       min_seats, min_price, max_price, limit, max scan, batch
+# Empty strings mean "no bound". Returns {complete, id, departure, price, seats, ...}
+_SEARCH_SCRIPT = redis.register_script("""
+local asc = ARGV[1] == 'asc'
+local after_price = tonumber(ARGV[2])
+local after_id = tonumber(ARGV[3])
+local dep_from = tonumber(ARGV[4])
+local dep_to = tonumber(ARGV[5])
+local not_before = tonumber(ARGV[6])
+local min_seats = tonumber(ARGV[7]) or 0
+local limit = tonumber(ARGV[10])
+local max_scan = tonumber(ARGV[11])
+local batch = tonumber(ARGV[12])
+
+-- Start at the cursor price (or the price filter) instead of the top of the set
+local low = ARGV[8] ~= '' and ARGV[8] or '-inf'
+local high = ARGV[9] ~= '' and ARGV[9] or '+inf'
+if after_price then
+    if asc then low = ARGV[2] else high = ARGV[2] end
+end
+
+local result = {1}
+local found = 0
+local offset = 0
+while found < limit do
+    if offset >= max_scan then
+        result[1] = 0
+        break
+    end
+    local members
+    if asc then
+        members = redis.call('ZRANGE', KEYS[1], low, high, 'BYSCORE', 'LIMIT', offset, batch, 'WITHSCORES')
+    else
+        members = redis.call('ZRANGE', KEYS[1], high, low, 'BYSCORE', 'REV', 'LIMIT', offset, batch, 'WITHSCORES')
+    end
+    if #members == 0 then break end
+    offset = offset + batch
+
+    for i = 1, #members, 2 do
+        local id = tonumber(members[i])
+        local price = tonumber(members[i + 1])
+        local past_cursor = true
+        if after_price then
+            if asc then
+                past_cursor = price > after_price or (price == after_price and id > after_id)
+            else
+                past_cursor = price < after_price or (price == after_price and id < after_id)
+            end
+        end
+        if past_cursor then
+            local data = redis.call('HGET', KEYS[2], members[i])
+            local seats = tonumber(redis.call('HGET', KEYS[3], members[i]) or '0')
+            if data then
+                local sep = string.find(data, '|', 1, true)
+                local departure = string.sub(data, 1, sep - 1)
+                local departs_at = tonumber(departure)
+                if (not dep_from or departs_at >= dep_from)
+                    and (not dep_to or departs_at < dep_to)
+                    and (not not_before or departs_at > not_before)
+                    and seats >= min_seats then
+                    table.insert(result, id)
+                    table.insert(result, departure)
+                    table.insert(result, string.sub(data, sep + 1))
+                    table.insert(result, seats)
+                    found = found + 1
+                    if found == limit then break end
+                end
+            end
+        end
+    end
+end
+return result
+""")
+
+
+# KEYS[1] = sorted set, KEYS[2] = trip data hash, KEYS[3] = seats hash, KEYS[4] = guard
+# ARGV: ticket, guard ttl, member, 'open' or 'closed', price, trip data, seats
+# Applies the entry only if no sync with a later ticket has been applied yet, so a
+# sync that read Postgres before a newer one cannot overwrite it. Returns 1 if applied.
+_SYNC_SCRIPT = redis.register_script("""
+local ticket = tonumber(ARGV[1])
+if ticket <= tonumber(redis.call('GET', KEYS[4]) or '0') then
+    return 0
+end
+redis.call('SET', KEYS[4], ARGV[1], 'EX', ARGV[2])
+
+local member = ARGV[3]
+if ARGV[4] == 'open' then
+    redis.call('ZADD', KEYS[1], ARGV[5], member)
+    redis.call('HSET', KEYS[2], member, ARGV[6])
+    redis.call('HSET', KEYS[3], member, ARGV[7])
+else
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('HDEL', KEYS[2], member)
+    redis.call('HDEL', KEYS[3], member)
+end
+return 1
+""")
+
+
+class IndexedTrip(NamedTuple):
+    # Same attribute names as the SQL search rows
+    id: int
+    origin: str
+    destination: str
+    departure_time: datetime
+    price: Decimal
+    available_seats: int
+
+
+def _route_keys(origin: str, destination: str) -> List[str]:
+    # Hash tag keeps a route's keys in the same slot on Redis Cluster
+    base = f"trip_idx:{{{origin}:{destination}}}"
+    return [base, f"{base}:trips", f"{base}:seats"]
+
+
+def _member(trip_id: int) -> str:
+    return str(trip_id).zfill(_ID_WIDTH)
+
+
+def _trip_data(row) -> str:
+    return f"{row.departure_time.timestamp()}|{row.price}"
+
+
+def _epoch(value: Optional[datetime]) -> str:
+    return "" if value is None else str(value.timestamp())
+
+
+async def trip_index_ready() -> bool:
+    return bool(await redis.exists(READY_KEY))
+
+
+async def search_trip_index(
+    filters: TripSearchFilters,
+    sort: Literal["cheapest", "expensive"],
+    limit: int,
+    after: Optional[Tuple[Decimal, int]] = None,
+) -> Optional[List[IndexedTrip]]:
+    """
+    Up to `limit` trips of an origin/destination search, ordered like the SQL
+    keyset search; `after` is the (price, trip_id) of the previous page's last
+    row. Returns None when the search has to go to SQL instead (index not
+    built, no exact route, departed trips requested, or too many trips to scan).
+    """
+    # The index only holds upcoming trips, so include_departed searches go to SQL
+    if not (filters.origin and filters.destination) or filters.not_before is None:
+        return None
+    if not await trip_index_ready():
+        return None
+
+    last_price, last_id = after or ("", "")
+    result = await _SEARCH_SCRIPT(
+        keys=_route_keys(filters.origin, filters.destination),
+        args=[
+            "asc" if sort == "cheapest" else "desc",
+            str(last_price),
+            str(last_id),
+            _epoch(filters.departure_from),
+            _epoch(filters.departure_to),
+            _epoch(filters.not_before),
+            filters.min_seats or "",
+            "" if filters.min_price is None else filters.min_price,
+            "" if filters.max_price is None else filters.max_price,
+            limit,
+            MAX_SCAN,
+            SCAN_BATCH,
+        ],
+    )
+    if not int(result[0]):
+        return None
+
+    return [
+        IndexedTrip(
+            id=int(trip_id),
+            origin=filters.origin,
+            destination=filters.destination,
+            departure_time=datetime.fromtimestamp(float(departure), tz=timezone.utc),
+            price=Decimal(price),
+            available_seats=int(seats),
+        )
+        for trip_id, departure, price, seats in (result[i:i + 4] for i in range(1, len(result), 4))
+    ]
+
+
+def _queue_upsert(pipe, row, keys: List[str]) -> None:
+    zset, trips, seats = keys
+    member = _member(row.id)
+    pipe.zadd(zset, {member: float(row.price)})
+    pipe.hset(trips, member, _trip_data(row))
+    pipe.hset(seats, member, row.seats_available)
+
+
+async def sync_trip_index(trip_ids: Iterable[int]) -> None:
+    """
+    Re-read these trips and update their index entries: open trips are
+    (re)added with their current price and seats, cancelled or departed
+    trips are removed. Concurrent syncs of the same trip may finish in any
+    order; the ticket taken before reading Postgres keeps the newest read.
+    """
+    trip_ids = list(set(trip_ids))
+    if not trip_ids:
+        return
+
+    ticket = await redis.incr(SYNC_SEQ_KEY)
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(LOAD_INDEXED_TRIPS, {"trip_ids": trip_ids})).fetchall()
+
+    async with redis.pipeline(transaction=False) as pipe:
+        for row in rows:
+            keys = _route_keys(row.origin, row.destination)
+            member = _member(row.id)
+            if row.is_open:
+                args = ["open", float(row.price), _trip_data(row), row.seats_available]
+                pipe.sadd(ROUTES_KEY, f"{row.origin}:{row.destination}")
+            else:
+                args = ["closed", "", "", ""]
+            await _SYNC_SCRIPT(
+                keys=[*keys, f"{keys[0]}:synced:{member}"],
+                args=[ticket, SYNC_GUARD_SECONDS, member, *args],
+                client=pipe,
+            )
+        pipe.sadd(TOUCHED_KEY, *trip_ids)
+        pipe.expire(TOUCHED_KEY, settings.TRIP_INDEX_REBUILD_INTERVAL_SECONDS * 3)
+        await pipe.execute()
+
+
+async def rebuild_trip_index() -> int:
+    """
+    Rebuild the whole index from Postgres, one route at a time. Each route is
+    built under temporary keys and renamed into place, so searches never see a
+    half-built route. Trips synced while the rebuild ran would be overwritten
+    by the older snapshot, so they are synced again at the end. Returns the
+    number of indexed trips.
+    """
+    await redis.delete(TOUCHED_KEY)
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(LOAD_UPCOMING_TRIPS)).fetchall()
+
+    routes = set()
+    for (origin, destination), route_rows in groupby(rows, key=lambda r: (r.origin, r.destination)):
+        routes.add(f"{origin}:{destination}")
+        live_keys = _route_keys(origin, destination)
+        tmp_keys = [f"{key}:rebuild" for key in live_keys]
+
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(*tmp_keys)
+            for row in route_rows:
+                _queue_upsert(pipe, row, tmp_keys)
+            for tmp_key, live_key in zip(tmp_keys, live_keys):
+                pipe.rename(tmp_key, live_key)
+            await pipe.execute()
+
+    # Routes with no upcoming trips left
+    stale = [route for route in await redis.smembers(ROUTES_KEY) if route not in routes]
+    async with redis.pipeline(transaction=True) as pipe:
+        for route in stale:
+            origin, destination = route.split(":", 1)
+            pipe.delete(*_route_keys(origin, destination))
+        pipe.delete(ROUTES_KEY)
+        if routes:
+            pipe.sadd(ROUTES_KEY, *routes)
+        # Searches use the index only while rebuilds keep running
+        pipe.set(READY_KEY, 1, ex=settings.TRIP_INDEX_REBUILD_INTERVAL_SECONDS * 3)
+        await pipe.execute()
+
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.smembers(TOUCHED_KEY)
+        pipe.delete(TOUCHED_KEY)
+        touched, _ = await pipe.execute()
+    await sync_trip_index(int(trip_id) for trip_id in touched)
+
+    return len(rows)
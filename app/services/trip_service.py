@@ -1,26 +1,134 @@
-from typing import Optional, Literal, Dict, Any
+import base64
+import json
+from decimal import Decimal
+from typing import Optional, Literal, Dict, Any, List, Tuple
 
+from fastapi import HTTPException
 from sqlalchemy import text
 
+from app.core.config import settings
 from app.db.session import AsyncSessionLocal
+from app.schemas.booking import SEATS_PER_ROW
+from app.schemas.trip import TripSearchFilters
+from app.services.cache import TwoTierCache
+from app.services.trip_cache import search_cache_namespace, seat_map_version
+from app.services.trip_index import search_trip_index
+
+# Totals are only shown on request and may lag this much behind
+TRIP_COUNT_CACHE_SECONDS = 300
+trip_count_cache = TwoTierCache("trip-count", ttl=TRIP_COUNT_CACHE_SECONDS)
+
+# Seat maps are keyed by the trip's seat-map version, so entries never go stale
+SEAT_MAP_CACHE_SECONDS = 600
+seat_map_cache = TwoTierCache("seat-map", ttl=SEAT_MAP_CACHE_SECONDS)
+
+# A hold that has run out is no longer shown as held (it can no longer be
+# confirmed; the sweeper frees the seat shortly)
+GET_SEAT_MAP = text("""
+    SELECT t.cancelled_at, s.seat_number, s.is_reserved, COALESCE(s.held_until > NOW(), false) AS is_held
+    FROM trips t
+    LEFT JOIN seats s ON s.trip_id = t.id
+    WHERE t.id = :trip_id
+    ORDER BY s.seat_number
+""")
+
+
+# Recount free seats per trip and correct any drift in trips.seats_available.
+# The fix adds the difference instead of overwriting, so bookings committed while
+# this runs are not lost.
+RECONCILE_SEATS_AVAILABLE = text("""
+    WITH drift AS (
+        SELECT t.id,
+               t.seats_available AS recorded,
+               COUNT(s.id) FILTER (WHERE NOT s.is_reserved) AS actual
+        FROM trips t
+        LEFT JOIN seats s ON s.trip_id = t.id
+        GROUP BY t.id
+        HAVING t.seats_available <> COUNT(s.id) FILTER (WHERE NOT s.is_reserved)
+    )
+    UPDATE trips t
+    SET seats_available = t.seats_available + (d.actual - d.recorded)
+    FROM drift d
+    WHERE t.id = d.id
+    RETURNING t.id, d.recorded, d.actual
+""")
+
+
+def _search_filter(filters: TripSearchFilters) -> Tuple[str, Dict[str, Any]]:
+    """
+    WHERE clause for trip search. Route + departure range is served by the
+    ix_trips_route_departure index, so a one-day search only reads that day's trips.
+    """
+    base_filter = "WHERE t.cancelled_at IS NULL"
+    filter_params: Dict[str, Any] = {}
+
+    if filters.origin:
+        base_filter += " AND r.origin = :origin"
+        filter_params["origin"] = filters.origin
+    if filters.destination:
+        base_filter += " AND r.destination = :destination"
+        filter_params["destination"] = filters.destination
+    if filters.not_before:
+        base_filter += " AND t.departure_time > :not_before"
+        filter_params["not_before"] = filters.not_before
+    if filters.departure_from:
+        base_filter += " AND t.departure_time >= :departure_from"
+        filter_params["departure_from"] = filters.departure_from
+    if filters.departure_to:
+        base_filter += " AND t.departure_time < :departure_to"
+        filter_params["departure_to"] = filters.departure_to
+    if filters.min_seats:
+        base_filter += " AND t.seats_available >= :min_seats"
+        filter_params["min_seats"] = filters.min_seats
+    if filters.min_price is not None:
+        base_filter += " AND t.price >= :min_price"
+        filter_params["min_price"] = filters.min_price
+    if filters.max_price is not None:
+        base_filter += " AND t.price <= :max_price"
+        filter_params["max_price"] = filters.max_price
+
+    return base_filter, filter_params
+
+
+def _trip_item(t) -> Dict[str, Any]:
+    return {
+        "trip_id": t.id,
+        "origin": t.origin,
+        "destination": t.destination,
+        "departure": t.departure_time,
+        "price": int(t.price),
+        "available_seats": t.available_seats,
+    }
+
+
+def encode_trip_cursor(sort: str, price: Decimal, trip_id: int) -> str:
+    payload = json.dumps({"s": sort, "p": str(price), "i": trip_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_trip_cursor(cursor: str, sort: str) -> Tuple[Decimal, int]:
+    """Return (price, trip_id) of the last row of the previous page."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        price, trip_id = Decimal(payload["p"]), int(payload["i"])
+        cursor_sort = payload["s"]
+    except (ValueError, KeyError, TypeError, ArithmeticError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="This cursor was issued for a different sort order.")
+    return price, trip_id
 
 
 async def list_available_trips(
-    origin: Optional[str],
-    destination: Optional[str],
+    filters: TripSearchFilters,
     sort: Literal["cheapest", "expensive"],
     page: int,
     per_page: int,
 ) -> Dict[str, Any]:
-    base_filter = "WHERE 1=1"
-    filter_params: Dict[str, Any] = {}
-
-    if origin:
-        base_filter += " AND r.origin = :origin"
-        filter_params["origin"] = origin
-    if destination:
-        base_filter += " AND r.destination = :destination"
-        filter_params["destination"] = destination
+    """Legacy LIMIT/OFFSET pagination with an exact total. Prefer search_trips."""
+    base_filter, filter_params = _search_filter(filters)
 
     count_query = f"""
         SELECT COUNT(*)
@@ -35,14 +143,10 @@ async def list_available_trips(
                r.destination,
                t.departure_time,
                t.price,
-               b.capacity,
-               (b.capacity - COUNT(s.id) FILTER (WHERE s.is_reserved)) AS available_seats
+               t.seats_available AS available_seats
         FROM trips t
         JOIN routes r ON t.route_id = r.id
-        JOIN buses b ON t.bus_id = b.id
-        LEFT JOIN seats s ON s.trip_id = t.id AND s.is_reserved = true
         {base_filter}
-        GROUP BY t.id, r.origin, r.destination, b.capacity
         ORDER BY t.price {"ASC" if sort == "cheapest" else "DESC"}
         LIMIT :limit OFFSET :offset
     """
@@ -59,16 +163,154 @@ async def list_available_trips(
         "page": page,
         "per_page": per_page,
         "total": total,
-        "items": [
-            {
-                "trip_id": t.id,
-                "origin": t.origin,
-                "destination": t.destination,
-                "departure": t.departure_time,
-                "price": int(t.price),
-                "available_seats": t.available_seats,
-            }
-            for t in trips
-        ],
+        "items": [_trip_item(t) for t in trips],
     }
 
+
+async def search_trips(
+    filters: TripSearchFilters,
+    sort: Literal["cheapest", "expensive"],
+    per_page: int,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+) -> Dict[str, Any]:
+    """
+    Keyset pagination ordered by (price, id): each page seeks past the last row
+    of the previous one, so deep pages cost the same as the first.
+    The total is only computed on request and is cached for TRIP_COUNT_CACHE_SECONDS.
+    With TRIP_INDEX_ENABLED, origin/destination searches are served from the
+    Redis trip index when possible.
+    """
+    after = decode_trip_cursor(cursor, sort) if cursor else None
+
+    # One extra row tells us whether there is a next page
+    trips = None
+    if settings.TRIP_INDEX_ENABLED:
+        trips = await search_trip_index(filters, sort, per_page + 1, after)
+    if trips is None:
+        trips = await _search_trips_sql(filters, sort, per_page + 1, after)
+
+    next_cursor = None
+    if len(trips) > per_page:
+        trips = trips[:per_page]
+        next_cursor = encode_trip_cursor(sort, trips[-1].price, trips[-1].id)
+
+    response: Dict[str, Any] = {
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+        "items": [_trip_item(t) for t in trips],
+    }
+    if include_total:
+        response["total"] = await count_available_trips(filters)
+    return response
+
+
+async def _search_trips_sql(
+    filters: TripSearchFilters,
+    sort: Literal["cheapest", "expensive"],
+    limit: int,
+    after: Optional[Tuple[Decimal, int]],
+):
+    base_filter, filter_params = _search_filter(filters)
+    direction = "ASC" if sort == "cheapest" else "DESC"
+
+    params: Dict[str, Any] = {**filter_params, "limit": limit}
+    if after:
+        base_filter += f" AND (t.price, t.id) {'>' if sort == 'cheapest' else '<'} (:last_price, :last_id)"
+        params.update(last_price=after[0], last_id=after[1])
+
+    data_query = f"""
+        SELECT t.id,
+               r.origin,
+               r.destination,
+               t.departure_time,
+               t.price,
+               t.seats_available AS available_seats
+        FROM trips t
+        JOIN routes r ON t.route_id = r.id
+        {base_filter}
+        ORDER BY t.price {direction}, t.id {direction}
+        LIMIT :limit
+    """
+
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(text(data_query), params)).fetchall()
+
+
+async def count_available_trips(filters: TripSearchFilters) -> int:
+    """Number of trips matching the filters; cached, so it may lag by a few minutes."""
+    namespace = await search_cache_namespace(filters.origin, filters.destination)
+    cache_key = f"{namespace}:{filters.cache_key()}:count"
+
+    async def _load():
+        base_filter, filter_params = _search_filter(filters)
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(text(f"""
+                SELECT COUNT(*)
+                FROM trips t
+                JOIN routes r ON t.route_id = r.id
+                {base_filter}
+            """), filter_params)).scalar() or 0
+
+    return await trip_count_cache.get_or_load(cache_key, _load)
+
+
+def _seat_ranges(seat_numbers: List[int]) -> List[List[int]]:
+    """Sorted seat numbers as inclusive [first, last] runs, e.g. 1,2,3,7 -> [[1, 3], [7, 7]]."""
+    ranges: List[List[int]] = []
+    for number in seat_numbers:
+        if ranges and ranges[-1][1] == number - 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ranges
+
+
+async def get_seat_map(trip_id: int, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Occupancy of every seat of a trip as run-length ranges of free, held and
+    reserved seats. Returns None if the trip does not exist. `version` changes
+    whenever any seat of the trip does (see trip_cache.seat_map_version).
+    """
+    if version is None:
+        version = await seat_map_version(trip_id)
+
+    async def _load():
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(GET_SEAT_MAP, {"trip_id": trip_id})).fetchall()
+        if not rows:
+            return None
+
+        by_state: Dict[str, List[int]] = {"free": [], "held": [], "reserved": []}
+        for row in rows:
+            if row.seat_number is None:
+                continue
+            if not row.is_reserved:
+                by_state["free"].append(row.seat_number)
+            elif row.is_held:
+                by_state["held"].append(row.seat_number)
+            else:
+                by_state["reserved"].append(row.seat_number)
+
+        return {
+            "trip_id": trip_id,
+            "version": version,
+            "cancelled": rows[0].cancelled_at is not None,
+            "total_seats": sum(len(numbers) for numbers in by_state.values()),
+            "seats_per_row": SEATS_PER_ROW,
+            **{state: _seat_ranges(numbers) for state, numbers in by_state.items()},
+        }
+
+    return await seat_map_cache.get_or_load(f"seat-map:{trip_id}:v{version}", _load)
+
+
+async def reconcile_seats_available() -> List[Dict[str, int]]:
+    """
+    Check trips.seats_available against the seats table and fix any drift.
+    Returns the corrected trips as {trip_id, recorded, actual}.
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            rows = (await db.execute(RECONCILE_SEATS_AVAILABLE)).fetchall()
+
+    return [{"trip_id": row.id, "recorded": row.recorded, "actual": row.actual} for row in rows]
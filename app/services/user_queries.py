@@ -0,0 +1,33 @@
+# app/services/user_queries.py
+"""
+SQL queries for user registration.
+"""
+from sqlalchemy import text
+
+from app.services.wallet_queries import OPEN_WALLETS_CTES
+
+
+# Register every mobile in :mobiles that is not taken yet, in one statement:
+# user, profile and wallet (see OPEN_WALLETS_CTES).
+# Existing mobiles are skipped by ON CONFLICT, so concurrent registrations of the
+# same number cannot race. Returns the mobiles that were created.
+REGISTER_USERS = text(f"""
+    WITH requested AS (
+        SELECT DISTINCT mobile FROM unnest(CAST(:mobiles AS text[])) AS r(mobile)
+    ),
+    new_users AS (
+        INSERT INTO users (mobile, password_hash)
+        SELECT mobile, :password_hash FROM requested
+        ON CONFLICT (mobile) DO NOTHING
+        RETURNING id, mobile
+    ),
+    new_profiles AS (
+        INSERT INTO profiles (user_id, role, full_name)
+        SELECT id, :role, 'User ' || RIGHT(mobile, 4) FROM new_users
+    ),
+    wallet_owners AS (
+        SELECT id AS user_id FROM new_users
+    ),
+    {OPEN_WALLETS_CTES}
+    SELECT mobile FROM new_users
+""")
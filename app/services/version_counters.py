@@ -0,0 +1,36 @@
+# app/services/version_counters.py
+"""
+Redis version counters behind versioned cache keys and ETags.
+A counter that is missing (never set, evicted, Redis restarted) is seeded
+from the Redis clock in milliseconds before it is read or incremented, in
+the same script call. A lost counter therefore restarts above every value it
+had before and never hands out an old version (or ETag) again.
+"""
+from typing import Iterable
+
+from app.core.redis import redis_client as redis
+
+# KEYS[1] = counter; ARGV[1] = increment (0 to just read). Returns the new value
+_SEED_AND_INCR_SCRIPT = redis.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    local now = redis.call('TIME')
+    redis.call('SET', KEYS[1], string.format('%d', now[1] * 1000 + math.floor(now[2] / 1000)))
+end
+return redis.call('INCRBY', KEYS[1], ARGV[1])
+""")
+
+
+async def read_version(key: str) -> int:
+    return int(await _SEED_AND_INCR_SCRIPT(keys=[key], args=[0]))
+
+
+async def bump_versions(keys: Iterable[str]) -> None:
+    keys = set(keys)
+    if not keys:
+        return
+
+    # One script call per counter (keys may live on different cluster slots), one round trip
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            await _SEED_AND_INCR_SCRIPT(keys=[key], args=[1], client=pipe)
+        await pipe.execute()
@@ -0,0 +1,146 @@
+# app/services/waitlist.py
+"""
+Per-trip FIFO waitlist for sold-out trips.
+Waiting users live in a Redis sorted set scored by join time. Whenever seats
+are freed (refund worker, hold sweeper), the next users in line get a hold on
+them automatically, so demand is recorded once instead of polled.
+"""
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.redis import redis_client as redis
+from app.db.session import AsyncSessionLocal
+from app.services.booking_queries import GET_TRIP_FOR_WAITLIST, PROMOTE_WAITLIST_HOLDS
+from app.services.seat_inventory import release_seats
+
+
+def _key(trip_id: int) -> str:
+    return f"waitlist:{trip_id}"
+
+
+def _offer_key(trip_id: int, user_id: int) -> str:
+    return f"waitlist:{trip_id}:offer:{user_id}"
+
+
+async def join_waitlist(user_id: int, trip_id: int) -> dict:
+    """
+    Queue the user for a sold-out trip. Joining again keeps the original place.
+    Trips with free seats are refused with 409 — those should be booked directly.
+    """
+    async with AsyncSessionLocal() as db:
+        trip = (await db.execute(GET_TRIP_FOR_WAITLIST, {"trip_id": trip_id})).fetchone()
+
+    if not trip:
+        raise HTTPException(status_code=404, detail="Trip not found.")
+
+    if trip.cancelled_at is not None:
+        raise HTTPException(status_code=400, detail="This trip has been cancelled.")
+
+    seconds_to_departure = int((trip.departure_time - datetime.now(timezone.utc)).total_seconds())
+    if seconds_to_departure <= 0:
+        raise HTTPException(status_code=400, detail="This trip has already departed.")
+
+    if trip.free_seats:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "This trip still has free seats. Please book one directly.",
+                "free_seats": trip.free_seats
+            }
+        )
+
+    key = _key(trip_id)
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.zadd(key, {str(user_id): time.time()}, nx=True)
+        # The list is useless after departure
+        pipe.expire(key, seconds_to_departure)
+        pipe.zrank(key, str(user_id))
+        _, _, rank = await pipe.execute()
+
+    return {
+        "message": "You are on the waitlist. A seat will be held for you as soon as one is freed.",
+        "trip_id": trip_id,
+        "position": rank + 1
+    }
+
+
+async def get_waitlist_status(user_id: int, trip_id: int) -> dict:
+    """Either the user's place in line or the seat held for them after promotion."""
+    offer = await redis.get(_offer_key(trip_id, user_id))
+    if offer:
+        return {"trip_id": trip_id, "status": "promoted", **json.loads(offer)}
+
+    rank = await redis.zrank(_key(trip_id), str(user_id))
+    if rank is None:
+        raise HTTPException(status_code=404, detail="You are not on the waitlist for this trip.")
+
+    return {"trip_id": trip_id, "status": "waiting", "position": rank + 1}
+
+
+async def leave_waitlist(user_id: int, trip_id: int) -> None:
+    if not await redis.zrem(_key(trip_id), str(user_id)):
+        raise HTTPException(status_code=404, detail="You are not on the waitlist for this trip.")
+
+
+async def clear_waitlist(trip_id: int) -> None:
+    await redis.delete(_key(trip_id))
+
+
+async def promote_waitlist(trip_id: int, seat_numbers: List[int]) -> List[int]:
+    """
+    Hold freed seats for the next users in line, one seat each.
+    Users whose seat was taken in the meantime go back to their old place.
+    Returns the seat numbers that were handed to waiting users.
+    """
+    if not seat_numbers:
+        return []
+
+    key = _key(trip_id)
+    waiting = await redis.zpopmin(key, len(seat_numbers))
+    if not waiting:
+        return []
+
+    held_until = datetime.now(timezone.utc) + timedelta(minutes=settings.SEAT_HOLD_MINUTES)
+    try:
+        async with AsyncSessionLocal() as db:
+            async with db.begin():
+                rows = (await db.execute(PROMOTE_WAITLIST_HOLDS, {
+                    "trip_id": trip_id,
+                    "seat_numbers": seat_numbers[:len(waiting)],
+                    "user_ids": [int(member) for member, _ in waiting],
+                    "until": held_until
+                })).fetchall()
+    except Exception:
+        await redis.zadd(key, dict(waiting))
+        raise
+
+    promoted = {row.held_by: row.seat_number for row in rows}
+    missed = {member: score for member, score in waiting if int(member) not in promoted}
+    if missed:
+        await redis.zadd(key, missed)
+
+    ttl = settings.SEAT_HOLD_MINUTES * 60
+    for user_id, seat_number in promoted.items():
+        offer = {"seat_number": seat_number, "held_until": held_until.isoformat()}
+        await redis.set(_offer_key(trip_id, user_id), json.dumps(offer), ex=ttl)
+
+    return list(promoted.values())
+
+
+async def offer_released_seats(trip_id: int, seat_numbers: List[int]) -> None:
+    """
+    Called after seats are freed in Postgres: waiting users get them first,
+    the rest are handed back to the seat bitmap.
+    """
+    promoted: Optional[List[int]] = None
+    try:
+        promoted = await promote_waitlist(trip_id, seat_numbers)
+    finally:
+        if settings.SEAT_INVENTORY_ENABLED:
+            taken = set(promoted or [])
+            await release_seats(trip_id, [n for n in seat_numbers if n not in taken])
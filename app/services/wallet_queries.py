@@ -0,0 +1,199 @@
+# app/services/wallet_queries.py
+"""
+SQL queries for the wallet ledger.
+Money lives in wallet_buckets (a few rows per user); every movement is also
+appended to wallet_transactions. wallets.balance is only a materialized snapshot.
+"""
+from sqlalchemy import text
+
+
+# Fast debit: take the amount from one bucket that can cover it, skipping
+# buckets other transactions are debiting right now
+DEBIT_ANY_BUCKET = text("""
+    WITH pick AS (
+        SELECT bucket
+        FROM wallet_buckets
+        WHERE user_id = :uid AND balance >= :amount
+        ORDER BY random()
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ),
+    debit AS (
+        UPDATE wallet_buckets b
+        SET balance = b.balance - :amount
+        FROM pick
+        WHERE b.user_id = :uid AND b.bucket = pick.bucket
+        RETURNING b.user_id
+    )
+    INSERT INTO wallet_transactions (user_id, amount, kind, reference)
+    SELECT user_id, -CAST(:amount AS numeric), :kind, :reference FROM debit
+    RETURNING id
+""")
+
+
+# Slow debit: lock every bucket of the wallet (always in bucket order)
+LOCK_WALLET_BUCKETS = text("""
+    SELECT bucket, balance
+    FROM wallet_buckets
+    WHERE user_id = :uid
+    ORDER BY bucket
+    FOR UPDATE
+""")
+
+
+# Slow debit: rewrite all bucket balances at once after consolidating
+SET_BUCKET_BALANCES = text("""
+    UPDATE wallet_buckets b
+    SET balance = r.balance
+    FROM unnest(CAST(:buckets AS smallint[]), CAST(:balances AS numeric[])) AS r(bucket, balance)
+    WHERE b.user_id = :uid AND b.bucket = r.bucket
+""")
+
+
+# Append one ledger entry
+INSERT_WALLET_TRANSACTION = text("""
+    INSERT INTO wallet_transactions (user_id, amount, kind, reference)
+    VALUES (:uid, :amount, :kind, :reference)
+""")
+
+
+# Credit: add to the least funded bucket that nobody is holding
+CREDIT_BUCKET_SKIP_LOCKED = text("""
+    WITH pick AS (
+        SELECT bucket
+        FROM wallet_buckets
+        WHERE user_id = :uid
+        ORDER BY balance
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ),
+    credit AS (
+        UPDATE wallet_buckets b
+        SET balance = b.balance + :amount
+        FROM pick
+        WHERE b.user_id = :uid AND b.bucket = pick.bucket
+        RETURNING b.user_id
+    )
+    INSERT INTO wallet_transactions (user_id, amount, kind, reference)
+    SELECT user_id, :amount, :kind, :reference FROM credit
+    RETURNING id
+""")
+
+
+# Credit fallback when every bucket is locked: wait for bucket 0
+CREDIT_FIRST_BUCKET = text("""
+    WITH credit AS (
+        UPDATE wallet_buckets
+        SET balance = balance + :amount
+        WHERE user_id = :uid AND bucket = 0
+        RETURNING user_id
+    )
+    INSERT INTO wallet_transactions (user_id, amount, kind, reference)
+    SELECT user_id, :amount, :kind, :reference FROM credit
+    RETURNING id
+""")
+
+
+# Set-based credit for many wallets (refund batches): each user's total goes
+# to their least funded bucket, and one ledger row is written per credit
+CREDIT_WALLETS_BATCH = text("""
+    WITH credits AS (
+        SELECT *
+        FROM unnest(
+            CAST(:user_ids AS integer[]),
+            CAST(:amounts AS numeric[]),
+            CAST(:refs AS varchar[])
+        ) AS c(user_id, amount, reference)
+    ),
+    totals AS (
+        SELECT user_id, SUM(amount) AS amount FROM credits GROUP BY user_id
+    ),
+    target AS (
+        SELECT DISTINCT ON (b.user_id) b.user_id, b.bucket
+        FROM wallet_buckets b
+        JOIN totals t ON t.user_id = b.user_id
+        ORDER BY b.user_id, b.balance
+    ),
+    -- Lock in (user_id, bucket) order so concurrent batches over overlapping users
+    -- queue behind each other instead of deadlocking
+    locked AS MATERIALIZED (
+        SELECT b.user_id, b.bucket
+        FROM wallet_buckets b
+        JOIN target g ON g.user_id = b.user_id AND g.bucket = b.bucket
+        ORDER BY b.user_id, b.bucket
+        FOR UPDATE OF b
+    ),
+    applied AS (
+        UPDATE wallet_buckets b
+        SET balance = b.balance + t.amount
+        FROM totals t
+        JOIN locked g ON g.user_id = t.user_id
+        WHERE b.user_id = g.user_id AND b.bucket = g.bucket
+    )
+    INSERT INTO wallet_transactions (user_id, amount, kind, reference)
+    SELECT user_id, amount, :kind, reference FROM credits
+""")
+
+
+# Data-modifying CTEs that open a wallet for every user_id of a preceding CTE named
+# wallet_owners: snapshot row, :buckets buckets holding :amount (the rounding remainder
+# goes to bucket 0) and the opening ledger entry. Shared with user registration.
+OPEN_WALLETS_CTES = """
+    new_wallets AS (
+        INSERT INTO wallets (user_id, balance, snapshot_at)
+        SELECT user_id, :amount, NOW() FROM wallet_owners
+        RETURNING user_id
+    ),
+    new_buckets AS (
+        INSERT INTO wallet_buckets (user_id, bucket, balance)
+        SELECT w.user_id,
+               b.bucket,
+               CASE WHEN b.bucket = 0
+                    THEN CAST(:amount AS numeric) - TRUNC(CAST(:amount AS numeric) / n.buckets, 2) * (n.buckets - 1)
+                    ELSE TRUNC(CAST(:amount AS numeric) / n.buckets, 2)
+               END
+        FROM new_wallets w
+        CROSS JOIN (SELECT CAST(:buckets AS integer) AS buckets) n
+        CROSS JOIN generate_series(0, n.buckets - 1) AS b(bucket)
+    ),
+    opening_entries AS (
+        INSERT INTO wallet_transactions (user_id, amount, kind, reference)
+        SELECT user_id, :amount, :kind, NULL FROM new_wallets
+    )
+"""
+
+
+# Create wallet snapshot row, buckets and the opening ledger entry for a new user
+OPEN_WALLET = text(f"""
+    WITH wallet_owners AS (
+        SELECT CAST(:uid AS integer) AS user_id
+    ),
+    {OPEN_WALLETS_CTES}
+    SELECT COUNT(*) FROM new_wallets
+""")
+
+
+# Live balance (sum of buckets)
+GET_LIVE_BALANCE = text("""
+    SELECT SUM(balance) AS balance FROM wallet_buckets WHERE user_id = :uid
+""")
+
+
+# Snapshot refresh: rewrite wallets.balance for users with ledger activity since :since
+# (or every user when :since is NULL)
+REFRESH_WALLET_SNAPSHOTS = text("""
+    UPDATE wallets w
+    SET balance = s.total, snapshot_at = NOW()
+    FROM (
+        SELECT b.user_id, SUM(b.balance) AS total
+        FROM wallet_buckets b
+        WHERE CAST(:since AS timestamptz) IS NULL
+           OR b.user_id IN (
+               SELECT user_id FROM wallet_transactions WHERE created_at >= :since
+           )
+        GROUP BY b.user_id
+    ) s
+    WHERE w.user_id = s.user_id
+      AND w.balance IS DISTINCT FROM s.total
+    RETURNING w.user_id
+""")
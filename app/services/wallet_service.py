@@ -0,0 +1,141 @@
+# app/services/wallet_service.py
+"""
+Wallet ledger.
+Each wallet's money is split over WALLET_BUCKETS rows in wallet_buckets, and
+every debit or credit appends a row to wallet_transactions. A debit normally
+takes one bucket with SKIP LOCKED, so concurrent purchases by the same user
+lock different rows instead of queueing on one. wallets.balance is a snapshot
+refreshed in the background by the wallet snapshot worker.
+"""
+from datetime import datetime
+from decimal import Decimal, ROUND_DOWN
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.services.wallet_queries import (
+    DEBIT_ANY_BUCKET,
+    LOCK_WALLET_BUCKETS,
+    SET_BUCKET_BALANCES,
+    INSERT_WALLET_TRANSACTION,
+    CREDIT_BUCKET_SKIP_LOCKED,
+    CREDIT_FIRST_BUCKET,
+    CREDIT_WALLETS_BATCH,
+    OPEN_WALLET,
+    GET_LIVE_BALANCE,
+    REFRESH_WALLET_SNAPSHOTS
+)
+
+# Must match WALLET_BUCKETS in the 20251124_add_wallet_ledger migration
+WALLET_BUCKETS = 4
+
+_CENT = Decimal("0.01")
+
+
+def _spread(amount: Decimal, buckets: int) -> List[Decimal]:
+    """Split an amount evenly over the buckets; the rounding remainder goes to bucket 0."""
+    share = (amount / buckets).quantize(_CENT, rounding=ROUND_DOWN)
+    return [amount - share * (buckets - 1)] + [share] * (buckets - 1)
+
+
+async def debit_wallet(
+    db: AsyncSession, user_id: int, amount, kind: str, reference: Optional[str] = None
+) -> None:
+    """
+    Take `amount` from the user's wallet and record it in the ledger.
+    Must run inside a transaction. Raises 404 without a wallet and 400 when
+    the whole wallet cannot cover the amount.
+    """
+    amount = Decimal(amount)
+    params = {"uid": user_id, "amount": amount, "kind": kind, "reference": reference}
+
+    # Fast path: one bucket that nobody else holds covers the amount
+    if (await db.execute(DEBIT_ANY_BUCKET, params)).fetchone():
+        return
+
+    # Slow path: money is spread thin or the fitting buckets are busy.
+    # Lock the whole wallet and consolidate.
+    buckets = (await db.execute(LOCK_WALLET_BUCKETS, {"uid": user_id})).fetchall()
+    if not buckets:
+        raise HTTPException(status_code=404, detail="Wallet not found.")
+
+    current_balance = sum(row.balance for row in buckets)
+    if current_balance < amount:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": "Insufficient wallet balance.",
+                "required": amount,
+                "current_balance": current_balance
+            }
+        )
+
+    await db.execute(SET_BUCKET_BALANCES, {
+        "uid": user_id,
+        "buckets": [row.bucket for row in buckets],
+        "balances": _spread(current_balance - amount, len(buckets))
+    })
+    await db.execute(INSERT_WALLET_TRANSACTION, {**params, "amount": -amount})
+
+
+async def credit_wallet(
+    db: AsyncSession, user_id: int, amount, kind: str, reference: Optional[str] = None
+) -> None:
+    """
+    Add `amount` to the user's wallet and record it in the ledger.
+    Must run inside a transaction. Raises 404 without a wallet.
+    """
+    params = {"uid": user_id, "amount": Decimal(amount), "kind": kind, "reference": reference}
+
+    if (await db.execute(CREDIT_BUCKET_SKIP_LOCKED, params)).fetchone():
+        return
+
+    # Every bucket is busy (or the wallet does not exist): wait for bucket 0
+    if not (await db.execute(CREDIT_FIRST_BUCKET, params)).fetchone():
+        raise HTTPException(status_code=404, detail="Wallet not found.")
+
+
+async def credit_wallets_batch(
+    db: AsyncSession, credits: Iterable[Tuple[int, object, Optional[str]]], kind: str
+) -> None:
+    """
+    Credit many wallets in one statement. `credits` holds (user_id, amount, reference);
+    each credit gets its own ledger row. Must run inside a transaction.
+    """
+    credits = list(credits)
+    if not credits:
+        return
+    await db.execute(CREDIT_WALLETS_BATCH, {
+        "user_ids": [user_id for user_id, _, _ in credits],
+        "amounts": [Decimal(amount) for _, amount, _ in credits],
+        "refs": [reference for _, _, reference in credits],
+        "kind": kind
+    })
+
+
+async def open_wallet(db: AsyncSession, user_id: int, amount, kind: str = "registration") -> None:
+    """Create the wallet, its buckets and the opening ledger entry. Must run inside a transaction."""
+    await db.execute(OPEN_WALLET, {
+        "uid": user_id,
+        "amount": Decimal(amount),
+        "buckets": WALLET_BUCKETS,
+        "kind": kind
+    })
+
+
+async def get_wallet_balance(db: AsyncSession, user_id: int) -> Optional[Decimal]:
+    """Live balance (sum of buckets), or None when the user has no wallet."""
+    return (await db.execute(GET_LIVE_BALANCE, {"uid": user_id})).scalar()
+
+
+async def refresh_wallet_snapshots(since: Optional[datetime] = None) -> int:
+    """
+    Rewrite wallets.balance from the buckets for users with ledger activity
+    since `since` (every user when None). Returns the number of wallets changed.
+    """
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            result = await db.execute(REFRESH_WALLET_SNAPSHOTS, {"since": since})
+            return len(result.fetchall())
@@ -0,0 +1,37 @@
+# app/workers/fare_calendar.py
+"""
+Background process that keeps the route_day_fares summary up to date.
+Run with: python -m app.workers.fare_calendar
+"""
+import asyncio
+
+from app.core.config import settings
+from app.services.fare_calendar import rebuild_fare_calendar, refresh_dirty_fare_days, refresh_todays_fare_days
+
+
+async def run_fare_calendar():
+    print(
+        f"Fare calendar worker started (every {settings.FARE_CALENDAR_REFRESH_INTERVAL_SECONDS}s, "
+        f"full rebuild every {settings.FARE_CALENDAR_FULL_EVERY} runs)."
+    )
+    runs = 0
+    while True:
+        try:
+            if runs % settings.FARE_CALENDAR_FULL_EVERY == 0:
+                written = await rebuild_fare_calendar()
+                print(f"Rebuilt fare calendar ({written:,} route-days).")
+            else:
+                if runs % settings.FARE_CALENDAR_TODAY_EVERY == 0:
+                    await refresh_todays_fare_days()
+                # Drain the dirty set before sleeping again
+                while await refresh_dirty_fare_days(settings.FARE_CALENDAR_BATCH_SIZE) == settings.FARE_CALENDAR_BATCH_SIZE:
+                    pass
+            runs += 1
+        except Exception as exc:
+            print(f"Fare calendar refresh failed: {exc!r}")
+
+        await asyncio.sleep(settings.FARE_CALENDAR_REFRESH_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_fare_calendar())
@@ -0,0 +1,29 @@
+# app/workers/hold_sweeper.py
+"""
+Background process that releases expired seat holds in batches.
+Run with: python -m app.workers.hold_sweeper
+"""
+import asyncio
+
+from app.core.config import settings
+from app.services.booking_service import release_expired_holds
+
+
+async def run_hold_sweeper():
+    print(
+        f"Hold sweeper started (every {settings.HOLD_SWEEP_INTERVAL_SECONDS}s, "
+        f"batches of {settings.HOLD_SWEEP_BATCH_SIZE})."
+    )
+    while True:
+        try:
+            released = await release_expired_holds(settings.HOLD_SWEEP_BATCH_SIZE)
+            if released:
+                print(f"Released {released:,} expired seat holds.")
+        except Exception as exc:
+            print(f"Hold sweep failed: {exc!r}")
+
+        await asyncio.sleep(settings.HOLD_SWEEP_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_hold_sweeper())
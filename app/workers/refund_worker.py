@@ -0,0 +1,29 @@
+# app/workers/refund_worker.py
+"""
+Background process that applies queued cancellations and refunds in batches.
+Run with: python -m app.workers.refund_worker
+"""
+import asyncio
+
+from app.core.config import settings
+from app.services.refund_service import drain_refund_outbox
+
+
+async def run_refund_worker():
+    print(
+        f"Refund worker started (polling every {settings.REFUND_POLL_INTERVAL_SECONDS}s, "
+        f"batches of {settings.REFUND_BATCH_SIZE})."
+    )
+    while True:
+        try:
+            refunded = await drain_refund_outbox(settings.REFUND_BATCH_SIZE)
+            if refunded:
+                print(f"Processed {refunded:,} cancellations.")
+        except Exception as exc:
+            print(f"Refund batch failed, will retry: {exc!r}")
+
+        await asyncio.sleep(settings.REFUND_POLL_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_refund_worker())
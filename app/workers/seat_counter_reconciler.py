@@ -0,0 +1,29 @@
+# app/workers/seat_counter_reconciler.py
+"""
+Background process that checks trips.seats_available against the seats table.
+Run with: python -m app.workers.seat_counter_reconciler
+"""
+import asyncio
+
+from app.core.config import settings
+from app.services.trip_service import reconcile_seats_available
+
+
+async def run_seat_counter_reconciler():
+    print(f"Seat counter reconciler started (every {settings.SEAT_COUNTER_RECONCILE_INTERVAL_SECONDS}s).")
+    while True:
+        try:
+            corrected = await reconcile_seats_available()
+            for trip in corrected:
+                print(
+                    f"Trip {trip['trip_id']}: seats_available was {trip['recorded']}, "
+                    f"corrected to {trip['actual']}."
+                )
+        except Exception as exc:
+            print(f"Seat counter reconciliation failed: {exc!r}")
+
+        await asyncio.sleep(settings.SEAT_COUNTER_RECONCILE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_seat_counter_reconciler())
@@ -0,0 +1,26 @@
+# app/workers/trip_index.py
+"""
+Background process that rebuilds the Redis trip search index from Postgres.
+Only needed with TRIP_INDEX_ENABLED=true.
+Run with: python -m app.workers.trip_index
+"""
+import asyncio
+
+from app.core.config import settings
+from app.services.trip_index import rebuild_trip_index
+
+
+async def run_trip_index():
+    print(f"Trip index worker started (rebuild every {settings.TRIP_INDEX_REBUILD_INTERVAL_SECONDS}s).")
+    while True:
+        try:
+            indexed = await rebuild_trip_index()
+            print(f"Rebuilt trip index ({indexed:,} upcoming trips).")
+        except Exception as exc:
+            print(f"Trip index rebuild failed: {exc!r}")
+
+        await asyncio.sleep(settings.TRIP_INDEX_REBUILD_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_trip_index())
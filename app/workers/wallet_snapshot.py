@@ -0,0 +1,40 @@
+# app/workers/wallet_snapshot.py
+"""
+Background process that refreshes wallets.balance from the wallet buckets.
+Run with: python -m app.workers.wallet_snapshot
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.services.wallet_service import refresh_wallet_snapshots
+
+# Ledger rows carry their transaction's start time, so look back a little further
+# than the previous run to catch transactions that committed after it
+SINCE_MARGIN = timedelta(minutes=1)
+
+
+async def run_wallet_snapshot():
+    print(
+        f"Wallet snapshot worker started (every {settings.WALLET_SNAPSHOT_INTERVAL_SECONDS}s, "
+        f"full refresh every {settings.WALLET_SNAPSHOT_FULL_EVERY} runs)."
+    )
+    last_run = None
+    runs = 0
+    while True:
+        started = datetime.now(timezone.utc)
+        full = last_run is None or runs % settings.WALLET_SNAPSHOT_FULL_EVERY == 0
+        try:
+            changed = await refresh_wallet_snapshots(None if full else last_run - SINCE_MARGIN)
+            if changed:
+                print(f"Refreshed {changed:,} wallet snapshots{' (full)' if full else ''}.")
+            last_run = started
+            runs += 1
+        except Exception as exc:
+            print(f"Wallet snapshot refresh failed: {exc!r}")
+
+        await asyncio.sleep(settings.WALLET_SNAPSHOT_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_wallet_snapshot())
@@ -0,0 +1,37 @@
+"""Add seat hold columns for the hold/confirm flow
+
+Revision ID: b7c4e2a9d135
+Revises: a1b2c3d4e5f6
+Create Date: 2025-11-21 10:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "b7c4e2a9d135"
+down_revision: Union[str, None] = "a1b2c3d4e5f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("seats", sa.Column("held_by", sa.Integer(), nullable=True))
+    op.add_column("seats", sa.Column("held_until", sa.DateTime(timezone=True), nullable=True))
+    op.create_foreign_key("fk_seats_held_by_users", "seats", "users", ["held_by"], ["id"])
+    # Only held seats are indexed, so the expiry sweeper never scans the whole table
+    op.create_index(
+        "ix_seats_held_until",
+        "seats",
+        ["held_until"],
+        unique=False,
+        postgresql_where=sa.text("held_until IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_seats_held_until", table_name="seats")
+    op.drop_constraint("fk_seats_held_by_users", "seats", type_="foreignkey")
+    op.drop_column("seats", "held_until")
+    op.drop_column("seats", "held_by")
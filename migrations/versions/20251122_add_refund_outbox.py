@@ -0,0 +1,42 @@
+"""Add refund outbox table for the refund worker
+
+Revision ID: c3f81d6e0a27
+Revises: b7c4e2a9d135
+Create Date: 2025-11-22 09:30:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "c3f81d6e0a27"
+down_revision: Union[str, None] = "b7c4e2a9d135"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "refund_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("booking_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["booking_id"], ["bookings.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("booking_id"),
+    )
+    # The worker only ever scans pending rows
+    op.create_index(
+        "ix_refund_outbox_pending",
+        "refund_outbox",
+        ["id"],
+        unique=False,
+        postgresql_where=sa.text("processed_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_refund_outbox_pending", table_name="refund_outbox")
+    op.drop_table("refund_outbox")
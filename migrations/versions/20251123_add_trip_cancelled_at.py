@@ -0,0 +1,27 @@
+"""Add cancelled_at to trips for admin trip cancellation
+
+Revision ID: d9a0b5c1e442
+Revises: c3f81d6e0a27
+Create Date: 2025-11-23 14:10:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "d9a0b5c1e442"
+down_revision: Union[str, None] = "c3f81d6e0a27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("trips", sa.Column("cancelled_at", sa.DateTime(timezone=True), nullable=True))
+    # Bulk cancellation touches every booking of one trip
+    op.create_index("ix_bookings_trip_id", "bookings", ["trip_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bookings_trip_id", table_name="bookings")
+    op.drop_column("trips", "cancelled_at")
@@ -0,0 +1,82 @@
+"""Add wallet ledger and wallet buckets
+
+Revision ID: e5b27c9f8d10
+Revises: d9a0b5c1e442
+Create Date: 2025-11-24 08:20:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "e5b27c9f8d10"
+down_revision: Union[str, None] = "d9a0b5c1e442"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Must match WALLET_BUCKETS in app/services/wallet_service.py
+WALLET_BUCKETS = 4
+
+
+def upgrade() -> None:
+    op.add_column("wallets", sa.Column("snapshot_at", sa.DateTime(timezone=True), nullable=True))
+
+    op.create_table(
+        "wallet_buckets",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("bucket", sa.SmallInteger(), nullable=False),
+        sa.Column("balance", sa.Numeric(precision=14, scale=2), server_default=sa.text("0"), nullable=False),
+        sa.CheckConstraint("balance >= 0", name="ck_wallet_buckets_non_negative"),
+        sa.ForeignKeyConstraint(["user_id"], ["wallets.user_id"]),
+        sa.PrimaryKeyConstraint("user_id", "bucket"),
+    )
+
+    op.create_table(
+        "wallet_transactions",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column("kind", sa.String(length=30), nullable=False),
+        sa.Column("reference", sa.String(length=50), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_wallet_transactions_user_id", "wallet_transactions", ["user_id", "id"], unique=False)
+    op.create_index("ix_wallet_transactions_created_at", "wallet_transactions", ["created_at"], unique=False)
+
+    # Spread every existing balance evenly over the buckets (remainder in bucket 0)
+    op.execute(f"""
+        INSERT INTO wallet_buckets (user_id, bucket, balance)
+        SELECT w.user_id,
+               b.bucket,
+               CASE WHEN b.bucket = 0
+                    THEN w.balance - TRUNC(w.balance / {WALLET_BUCKETS}, 2) * {WALLET_BUCKETS - 1}
+                    ELSE TRUNC(w.balance / {WALLET_BUCKETS}, 2)
+               END
+        FROM wallets w
+        CROSS JOIN generate_series(0, {WALLET_BUCKETS - 1}) AS b(bucket)
+    """)
+    op.execute("""
+        INSERT INTO wallet_transactions (user_id, amount, kind, reference)
+        SELECT user_id, balance, 'opening_balance', NULL
+        FROM wallets
+        WHERE balance <> 0
+    """)
+    op.execute("UPDATE wallets SET snapshot_at = NOW()")
+
+
+def downgrade() -> None:
+    # Fold the buckets back into the single balance row
+    op.execute("""
+        UPDATE wallets w
+        SET balance = s.total
+        FROM (SELECT user_id, SUM(balance) AS total FROM wallet_buckets GROUP BY user_id) s
+        WHERE w.user_id = s.user_id
+    """)
+    op.drop_index("ix_wallet_transactions_created_at", table_name="wallet_transactions")
+    op.drop_index("ix_wallet_transactions_user_id", table_name="wallet_transactions")
+    op.drop_table("wallet_transactions")
+    op.drop_table("wallet_buckets")
+    op.drop_column("wallets", "snapshot_at")
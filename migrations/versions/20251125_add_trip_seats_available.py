@@ -0,0 +1,38 @@
+"""Add seats_available counter to trips
+
+Revision ID: f1a6c8e3b240
+Revises: e5b27c9f8d10
+Create Date: 2025-11-25 09:10:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "f1a6c8e3b240"
+down_revision: Union[str, None] = "e5b27c9f8d10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "trips",
+        sa.Column("seats_available", sa.Integer(), server_default=sa.text("0"), nullable=False),
+    )
+    op.execute("""
+        UPDATE trips t
+        SET seats_available = s.free
+        FROM (
+            SELECT trip_id, COUNT(*) AS free
+            FROM seats
+            WHERE is_reserved = false
+            GROUP BY trip_id
+        ) s
+        WHERE t.id = s.trip_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column("trips", "seats_available")
@@ -0,0 +1,32 @@
+"""Index open trips by (price, id) for keyset pagination
+
+Revision ID: 0b9d4e7a2c51
+Revises: f1a6c8e3b240
+Create Date: 2025-11-26 10:30:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "0b9d4e7a2c51"
+down_revision: Union[str, None] = "f1a6c8e3b240"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Trip search sorts open trips by price and seeks on (price, id); the id
+    # tie-breaker makes the order total
+    op.create_index(
+        "ix_trips_open_price_id",
+        "trips",
+        ["price", "id"],
+        unique=False,
+        postgresql_where=sa.text("cancelled_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_trips_open_price_id", table_name="trips")
@@ -0,0 +1,39 @@
+"""Add composite index for trip search by route and departure time
+
+Revision ID: 7c2e9f1b4a86
+Revises: 0b9d4e7a2c51
+Create Date: 2025-11-27 09:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "7c2e9f1b4a86"
+down_revision: Union[str, None] = "0b9d4e7a2c51"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # origin/destination -> route ids in one probe
+    op.create_index(
+        "ix_routes_origin_destination",
+        "routes",
+        ["origin", "destination"],
+        unique=False,
+    )
+    # route + departure range: a one-day search reads only that day's open trips
+    op.create_index(
+        "ix_trips_route_departure",
+        "trips",
+        ["route_id", "departure_time"],
+        unique=False,
+        postgresql_where=sa.text("cancelled_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_trips_route_departure", table_name="trips")
+    op.drop_index("ix_routes_origin_destination", table_name="routes")
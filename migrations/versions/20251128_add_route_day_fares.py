@@ -0,0 +1,48 @@
+"""Add route_day_fares summary for the fare calendar
+
+Revision ID: 3f8a1d6c9e27
+Revises: 7c2e9f1b4a86
+Create Date: 2025-11-28 09:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = "3f8a1d6c9e27"
+down_revision: Union[str, None] = "7c2e9f1b4a86"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "route_day_fares",
+        sa.Column("route_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("min_price", sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.Column("seats_available", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("trips", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.ForeignKeyConstraint(["route_id"], ["routes.id"]),
+        sa.PrimaryKeyConstraint("route_id", "day"),
+    )
+
+    # Same aggregation as app/services/fare_calendar.py, over every existing trip
+    op.execute("""
+        INSERT INTO route_day_fares (route_id, day, min_price, seats_available, trips)
+        SELECT route_id,
+               (departure_time AT TIME ZONE 'UTC')::date,
+               MIN(price) FILTER (WHERE seats_available > 0),
+               SUM(seats_available),
+               COUNT(*)
+        FROM trips
+        WHERE cancelled_at IS NULL
+          AND departure_time > NOW()
+        GROUP BY route_id, (departure_time AT TIME ZONE 'UTC')::date
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("route_day_fares")
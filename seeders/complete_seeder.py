@@ -3,7 +3,7 @@ import asyncio
 import os
 import sys
 import random
-from datetime import datetime, timedelta, timezone
+from datetime import date, datetime, timedelta, timezone
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
@@ -14,6 +14,9 @@ from app.db.base import Base
 from app.db.session import engine, AsyncSessionLocal
 from app.core.security import get_password_hash
 from app.models import *
+from app.services.fare_calendar import rebuild_fare_calendar
+from app.services.trip_service import reconcile_seats_available
+from app.services.wallet_service import open_wallet
 from sqlalchemy import text
 
 cities = [
@@ -37,23 +40,18 @@ async def seed_everything():
                 INSERT INTO profiles (user_id, role, full_name) 
                 VALUES ((SELECT id FROM users WHERE mobile='09990000001'), 'admin', 'Admin System')
             """))
-            await db.execute(text("""
-                INSERT INTO wallets (user_id, balance) 
-                VALUES ((SELECT id FROM users WHERE mobile='09990000001'), 999999999)
-            """))
+            admin_id = (await db.execute(text("SELECT id FROM users WHERE mobile='09990000001'"))).scalar_one()
+            await open_wallet(db, admin_id, 999999999)
 
             for i in range(25):
                 mobile = f"09{random.randint(10,99)}{random.randint(1000000,9999999)}"
-                await db.execute(text("INSERT INTO users (mobile, password_hash) VALUES (:m, :ph)"),
-                                 {"m": mobile, "ph": get_password_hash("123456")})
+                user_id = (await db.execute(text("INSERT INTO users (mobile, password_hash) VALUES (:m, :ph) RETURNING id"),
+                                            {"m": mobile, "ph": get_password_hash("123456")})).scalar_one()
                 await db.execute(text("""
                     INSERT INTO profiles (user_id, role, full_name) 
                     VALUES ((SELECT id FROM users WHERE mobile=:m), 'passenger', :n)
                 """), {"m": mobile, "n": f"User {mobile[-4:]}"})
-                await db.execute(text("""
-                    INSERT INTO wallets (user_id, balance) 
-                    VALUES ((SELECT id FROM users WHERE mobile=:m), 50000000)
-                """), {"m": mobile})
+                await open_wallet(db, user_id, 50000000)
 
             print("2. Creating 15 round-trip routes (30 routes total)...")
             route_ids = []
@@ -135,7 +133,11 @@ async def seed_everything():
             print(f"   Total seats created: {seat_counter:,}")
 
         await db.commit()
-        print(f"Seeding completed successfully! {seat_counter:,} seats ready for bookings.")
+
+    # Fill trips.seats_available from the seats created above
+    await reconcile_seats_available()
+    await rebuild_fare_calendar(since=date.min)
+    print(f"Seeding completed successfully! {seat_counter:,} seats ready for bookings.")
 
 if __name__ == "__main__":
     asyncio.run(seed_everything())
\ No newline at end of file
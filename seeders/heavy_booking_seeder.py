@@ -3,6 +3,8 @@ import random
 from datetime import date
 
 from app.db.session import AsyncSessionLocal
+from app.services.fare_calendar import rebuild_fare_calendar
+from app.services.trip_service import reconcile_seats_available
 from sqlalchemy import text
 
 
@@ -74,6 +76,11 @@ async def create_100k_bookings():
 
         await db.commit()
 
+        # Seats were reserved directly above; bring trips.seats_available in line
+        corrected = await reconcile_seats_available()
+        print(f"   Seat counters updated for {len(corrected):,} trips.")
+        await rebuild_fare_calendar(since=date.min)
+
         if count >= target:
             print(f"Success: Successfully created {count:,} bookings!")
         else:
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import cache
+from app.services.cache import TwoTierCache
+
+
+class DictRedis:
+    """Just the GET/SET the cache uses, kept in a dict."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = DictRedis()
+    monkeypatch.setattr(cache, "redis", fake)
+    return fake
+
+
+def _expire_locally(tiered: TwoTierCache, key: str, stale_for: float) -> None:
+    value, etag, _, _ = tiered._entries[key]
+    now = time.monotonic()
+    tiered._entries[key] = (value, etag, now - 1, now + stale_for)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load(redis):
+    tiered = TwoTierCache("test", ttl=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"n": calls}
+
+    results = await asyncio.gather(*[tiered.get_or_load("k", loader) for _ in range(20)])
+
+    assert calls == 1
+    assert results == [{"n": 1}] * 20
+    assert "k" in redis.data
+    assert tiered._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_value_from_redis_skips_the_loader(redis):
+    redis.data["k"] = '{"from": "redis"}'
+    tiered = TwoTierCache("test", ttl=60)
+
+    async def loader():
+        raise AssertionError("loader must not run")
+
+    assert await tiered.get_or_load("k", loader) == {"from": "redis"}
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_served_while_refreshing(redis):
+    tiered = TwoTierCache("test", ttl=60, stale_seconds=30)
+    version = 1
+
+    async def loader():
+        return {"v": version}
+
+    assert await tiered.get_or_load("k", loader) == {"v": 1}
+
+    version = 2
+    redis.data.clear()
+    _expire_locally(tiered, "k", stale_for=30)
+
+    # The old value comes back at once; one background task reloads it
+    assert await tiered.get_or_load("k", loader) == {"v": 1}
+    await asyncio.gather(*tiered._background)
+    assert await tiered.get_or_load("k", loader) == {"v": 2}
+
+
+@pytest.mark.asyncio
+async def test_entry_past_its_stale_window_is_reloaded(redis):
+    tiered = TwoTierCache("test", ttl=60, stale_seconds=30)
+    version = 1
+
+    async def loader():
+        return {"v": version}
+
+    await tiered.get_or_load("k", loader)
+    version = 2
+    redis.data.clear()
+    _expire_locally(tiered, "k", stale_for=-1)
+
+    assert await tiered.get_or_load("k", loader) == {"v": 2}
+
+
+@pytest.mark.asyncio
+async def test_failed_load_is_not_cached(redis):
+    tiered = TwoTierCache("test", ttl=60)
+
+    async def failing():
+        raise ValueError("database down")
+
+    with pytest.raises(ValueError):
+        await tiered.get_or_load("k", failing)
+    assert tiered._inflight == {}
+    assert "k" not in tiered._entries
+
+    async def loader():
+        return {"ok": True}
+
+    assert await tiered.get_or_load("k", loader) == {"ok": True}
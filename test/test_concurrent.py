@@ -9,6 +9,8 @@ TEST_USER_TOKEN = os.getenv("TEST_USER_TOKEN")
 TEST_TRIP_ID = os.getenv("TEST_TRIP_ID")
 TEST_SEAT_NUMBER = os.getenv("TEST_SEAT_NUMBER")
 PARALLEL_REQUESTS = int(os.getenv("TEST_CONCURRENT_REQUESTS", "2"))
+# Comma-separated seat numbers, e.g. "11,12,13"
+TEST_GROUP_SEATS = os.getenv("TEST_GROUP_SEATS")
 
 
 async def _try_reserve() -> Tuple[int, dict]:
@@ -43,4 +45,41 @@ async def test_concurrent_reservation_same_seat():
     conflicts = [res for res in results if res[0] in (400, 409)]
 
     assert len(successes) == 1, f"Expected exactly one success, got: {results}"
-    assert len(conflicts) == len(results) - 1, f"Expected remaining requests to conflict, got: {results}"
\ No newline at end of file
+    assert len(conflicts) == len(results) - 1, f"Expected remaining requests to conflict, got: {results}"
+
+
+async def _try_reserve_group(seat_numbers) -> Tuple[int, dict]:
+    payload = {"trip_id": int(TEST_TRIP_ID), "seat_numbers": seat_numbers}
+    headers = {"Authorization": f"Bearer {TEST_USER_TOKEN}"}
+
+    async with httpx.AsyncClient(base_url=API_BASE_URL, timeout=10) as client:
+        response = await client.post("/v1/booking/reserve-group", json=payload, headers=headers)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"raw": response.text}
+        return response.status_code, body
+
+
+@pytest.mark.asyncio
+async def test_concurrent_group_reservation_overlapping_seats():
+    """
+    Two group bookings sharing one seat: exactly one wins, and the loser
+    books nothing at all (all-or-nothing).
+    """
+    if not all([TEST_USER_TOKEN, TEST_TRIP_ID, TEST_GROUP_SEATS]):
+        pytest.skip("Set TEST_USER_TOKEN, TEST_TRIP_ID and TEST_GROUP_SEATS env vars to run this test.")
+
+    seats = [int(seat) for seat in TEST_GROUP_SEATS.split(",")]
+    # Reverse order on purpose: the server must lock in a consistent order anyway
+    results = await asyncio.gather(
+        _try_reserve_group(seats),
+        _try_reserve_group(list(reversed(seats))),
+    )
+
+    successes = [res for res in results if res[0] in (200, 201)]
+    conflicts = [res for res in results if res[0] in (400, 409)]
+
+    assert len(successes) == 1, f"Expected exactly one success, got: {results}"
+    assert len(conflicts) == 1, f"Expected the other group to conflict, got: {results}"
+    assert len(successes[0][1]["bookings"]) == len(seats)
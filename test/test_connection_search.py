@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import connection_search
+from app.services.connection_search import RANKINGS, ConnectionIndex, _find_itineraries
+
+START = datetime.now(timezone.utc) + timedelta(days=1)
+MINUTE = 60
+
+
+def _trip(trip_id, origin, destination, depart_hours, duration_hours, price=100, seats=10, start=START):
+    return SimpleNamespace(
+        id=trip_id,
+        origin=origin,
+        destination=destination,
+        departure_time=start + timedelta(hours=depart_hours),
+        arrival_time=start + timedelta(hours=depart_hours + duration_hours),
+        price=price,
+        seats_available=seats,
+    )
+
+
+async def _build_index(monkeypatch, rows):
+    index = ConnectionIndex()
+
+    async def fetch(after_id):
+        return [row for row in rows if row.id > after_id]
+
+    index._fetch = fetch
+    await index._reload()
+    monkeypatch.setattr(connection_search, "connection_index", index)
+    return index
+
+
+def _search(origin="A", destination="C", max_legs=3, min_layover=30, max_layover=720, seats=1,
+            sort="cheapest", keep=100, ordered=False):
+    paths = _find_itineraries(
+        origin,
+        destination,
+        START.timestamp() - MINUTE,
+        START.timestamp() + 24 * 3600,
+        max_legs,
+        min_layover * MINUTE,
+        max_layover * MINUTE,
+        seats,
+        rank=RANKINGS[sort],
+        keep=keep,
+    )
+    ids = [tuple(leg.trip_id for leg in path) for path in paths]
+    return ids if ordered else sorted(ids)
+
+
+@pytest.mark.asyncio
+async def test_direct_and_connecting_trips(monkeypatch):
+    await _build_index(monkeypatch, [
+        _trip(1, "A", "C", 0, 5),
+        _trip(2, "A", "B", 0, 2),
+        _trip(3, "B", "C", 3, 2),
+    ])
+
+    assert _search(max_legs=1) == [(1,)]
+    assert _search(max_legs=2) == [(1,), (2, 3)]
+
+
+@pytest.mark.asyncio
+async def test_layover_bounds(monkeypatch):
+    await _build_index(monkeypatch, [
+        _trip(1, "A", "B", 0, 2),
+        _trip(2, "B", "C", 2.25, 2),  # 15 min after arrival: too tight
+        _trip(3, "B", "C", 3, 2),     # 60 min: fine
+        _trip(4, "B", "C", 10, 2),    # 8 h: longer than allowed
+    ])
+
+    assert _search(max_legs=2, min_layover=30, max_layover=240) == [(1, 3)]
+
+
+@pytest.mark.asyncio
+async def test_cities_are_not_revisited(monkeypatch):
+    await _build_index(monkeypatch, [
+        _trip(1, "A", "B", 0, 1),
+        _trip(2, "B", "A", 2, 1),
+        _trip(3, "A", "C", 4, 1),
+    ])
+
+    # A -> B -> A -> C goes through A twice
+    assert _search(max_legs=3) == [(3,)]
+
+
+@pytest.mark.asyncio
+async def test_last_hop_pruning_keeps_longer_itineraries(monkeypatch):
+    await _build_index(monkeypatch, [
+        _trip(1, "A", "E", 0, 1),
+        _trip(2, "E", "F", 2, 1),
+        _trip(3, "F", "C", 4, 1),
+        _trip(4, "A", "G", 0, 1),  # G has no way on to C
+    ])
+
+    # E is not a direct feeder of C, so a two-leg search never expands it
+    assert _search(max_legs=2) == []
+    assert _search(max_legs=3) == [(1, 2, 3)]
+
+
+@pytest.mark.asyncio
+async def test_legs_without_enough_seats_are_skipped(monkeypatch):
+    await _build_index(monkeypatch, [
+        _trip(1, "A", "B", 0, 2, seats=5),
+        _trip(2, "B", "C", 3, 2, seats=1),
+        _trip(3, "B", "C", 4, 2, seats=3),
+    ])
+
+    assert _search(seats=2) == [(1, 3)]
+
+
+@pytest.mark.asyncio
+async def test_only_the_best_itineraries_are_kept(monkeypatch):
+    await _build_index(monkeypatch, [
+        _trip(1, "A", "C", 0, 6, price=500),
+        _trip(2, "A", "B", 0, 1, price=100),
+        _trip(3, "B", "C", 2, 1, price=100),
+        _trip(4, "B", "C", 3, 1, price=50),
+        _trip(5, "A", "C", 1, 1, price=400),
+    ])
+
+    assert _search(max_legs=2, keep=2, ordered=True) == [(2, 4), (2, 3)]
+    assert _search(max_legs=2, keep=2, sort="earliest_arrival", ordered=True) == [(5,), (2, 3)]
+
+
+@pytest.mark.asyncio
+async def test_first_search_loads_the_index_on_a_fresh_clock(monkeypatch):
+    index = ConnectionIndex()
+    loaded = []
+
+    async def reload():
+        loaded.append(True)
+
+    index._reload = reload
+    # A monotonic clock still below the refresh interval, as right after boot
+    monkeypatch.setattr(connection_search.time, "monotonic", lambda: 1.0)
+
+    await index.ensure_fresh()
+    await index.ensure_fresh()
+
+    assert loaded == [True]
+
+
+@pytest.mark.asyncio
+async def test_add_new_trips_appends_new_and_drops_departed_legs(monkeypatch):
+    now = datetime.now(timezone.utc)
+    rows = [
+        _trip(1, "A", "C", -2, 5, start=now),  # departed two hours ago
+        _trip(2, "A", "C", 1, 5, start=now),
+    ]
+    index = await _build_index(monkeypatch, rows)
+
+    rows.append(_trip(3, "A", "C", 2, 5, start=now))
+    await index._add_new_trips()
+
+    window = (now - timedelta(days=1)).timestamp(), (now + timedelta(days=1)).timestamp()
+    assert [leg.trip_id for leg in index.departures("A", *window)] == [2, 3]
+    assert index.seats(1) == 0
+    assert index.seats(3) == 10
+    assert index.feeders("C") == {"A"}
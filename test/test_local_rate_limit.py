@@ -0,0 +1,49 @@
+from app.core.config import settings
+from app.services import local_rate_limit
+from app.services.local_rate_limit import SlidingCountMinSketch, locally_rejected
+
+
+def test_sketch_counts_within_window():
+    sketch = SlidingCountMinSketch(window_seconds=60, width=1024, depth=4)
+    for second in range(5):
+        sketch.add("login_ip:1.2.3.4", now=second)
+
+    assert sketch.estimate("login_ip:1.2.3.4", now=10) == 5
+    assert sketch.estimate("login_ip:5.6.7.8", now=10) == 0
+
+
+def test_sketch_slides_previous_window_out():
+    sketch = SlidingCountMinSketch(window_seconds=60, width=1024, depth=4)
+    for _ in range(10):
+        sketch.add("k", now=30)
+
+    # Start of the next window: the whole previous count still applies
+    assert sketch.estimate("k", now=60) == 10
+    # Half way through it: half of the previous window is still inside the sliding window
+    assert sketch.estimate("k", now=90) == 5
+    # Two windows later nothing is left
+    assert sketch.estimate("k", now=150) == 0
+
+
+def test_sketch_never_undercounts_with_collisions():
+    # Far more keys than counters: estimates may be high but never below the true count
+    sketch = SlidingCountMinSketch(window_seconds=60, width=16, depth=3)
+    true_counts = {f"key:{i}": i % 7 + 1 for i in range(200)}
+    for key, count in true_counts.items():
+        for _ in range(count):
+            sketch.add(key, now=1)
+
+    for key, count in true_counts.items():
+        assert sketch.estimate(key, now=1) >= count
+
+
+def test_locally_rejected_counts_only_forwarded_requests(monkeypatch):
+    monkeypatch.setattr(local_rate_limit, "_sketches", {})
+    monkeypatch.setattr(settings, "PRE_LIMITER_FACTOR", 2.0)
+    limits = [("login_ip:6.6.6.6", 3, 3600)]
+
+    forwarded = sum(locally_rejected(limits) is None for _ in range(20))
+
+    # 2 x limit are forwarded to Redis, the rest is rejected locally and not counted
+    assert forwarded == 6
+    assert local_rate_limit._sketches[3600].estimate("login_ip:6.6.6.6") == 6
@@ -0,0 +1,35 @@
+import base64
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.trip_service import decode_trip_cursor, encode_trip_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_trip_cursor("cheapest", Decimal("1250000.50"), 42)
+
+    assert "=" not in cursor
+    assert decode_trip_cursor(cursor, "cheapest") == (Decimal("1250000.50"), 42)
+
+
+def test_cursor_for_other_sort_is_rejected():
+    cursor = encode_trip_cursor("cheapest", Decimal("100"), 7)
+
+    with pytest.raises(HTTPException) as exc:
+        decode_trip_cursor(cursor, "expensive")
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 at all!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(b'{"s": "cheapest", "p": "abc", "i": 1}').decode(),
+    base64.urlsafe_b64encode(b'{"s": "cheapest", "p": "10"}').decode(),
+])
+def test_malformed_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_trip_cursor(cursor, "cheapest")
+    assert exc.value.status_code == 400